@@ -0,0 +1,82 @@
+"""
+أدوات مشتركة لقياسات الأداء: خادم الرفع الوهمي في عملية منفصلة (فلا يُحتسب عمله من زمن
+حلقة الأحداث أو ذاكرة العميل المقاس) ومراقب تأخر حلقة الأحداث
+"""
+import time
+import asyncio
+import contextlib
+import multiprocessing
+
+from tests.fakes import FakeUploadServer
+
+
+def _serve(conn, options):
+    async def main():
+        server = await FakeUploadServer(keep_data=False, **options).start()
+        conn.send(server.upload_url)
+        # ينتظر حتى تُغلق العملية الأم الاتصال
+        await asyncio.get_running_loop().run_in_executor(None, conn.recv)
+
+    try:
+        asyncio.run(main())
+    except EOFError:
+        pass
+
+
+@contextlib.contextmanager
+def upload_server_process(**options):
+    """تشغيل FakeUploadServer في عملية منفصلة وإرجاع رابط الرفع"""
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.get_context('spawn').Process(target=_serve, args=(child, options), daemon=True)
+    process.start()
+    try:
+        yield parent.recv()
+    finally:
+        parent.close()
+        process.terminate()
+        process.join()
+
+
+def sparse_file(path, size):
+    """ملف متناثر بالحجم المطلوب دون كتابة بياناته على القرص"""
+    with open(path, 'wb') as f:
+        f.truncate(size)
+    return path
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+class LagMonitor:
+    """يقيس تأخر حلقة الأحداث: الفرق بين موعد الاستيقاظ المطلوب والفعلي كل interval"""
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(time.perf_counter() - started - self.interval)
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+    def summary(self):
+        return (
+            f"p50 {percentile(self.samples, 0.5) * 1e3:.2f}ms "
+            f"p99 {percentile(self.samples, 0.99) * 1e3:.2f}ms "
+            f"max {max(self.samples, default=0) * 1e3:.1f}ms"
+        )
+
+
+def megabytes(size):
+    return size / (1024 * 1024)
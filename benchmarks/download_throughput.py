@@ -0,0 +1,49 @@
+"""
+معدل التنزيل المتوازي مقابل عدد الاتصالات: ParallelDownloader يطلب الأجزاء من مرسلين
+وهميين لكل منهم زمن ذهاب وإياب وسرعة محدودة (كاتصال MTProto واحد)، ويكتبها في ملف على القرص.
+
+    python -m benchmarks.download_throughput --size-mb 64 --latency-ms 80 --sender-mbps 4
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+
+from benchmarks._common import megabytes
+from core.parallel_download import ParallelDownloader
+from tests.fakes import FakeFilePartSender, fake_client, fake_document, use_fake_senders
+
+
+async def run(data, path, connections, latency, bandwidth):
+    ParallelDownloader._global_slots = None
+    downloader = ParallelDownloader(fake_client(), connections=connections, part_size=1024 * 1024)
+    use_fake_senders(downloader, lambda: FakeFilePartSender(data, latency=latency, bandwidth=bandwidth))
+    started = time.perf_counter()
+    await downloader.download(fake_document(len(data)), path, len(data))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=64, help='حجم الملف')
+    parser.add_argument('--latency-ms', type=float, default=80, help='زمن كل طلب upload.getFile')
+    parser.add_argument('--sender-mbps', type=float, default=4, help='سرعة الاتصال الواحد (MB/s)')
+    parser.add_argument('--connections', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    data = os.urandom(args.size_mb * 1024 * 1024)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'video.mp4')
+        for connections in args.connections:
+            elapsed = asyncio.run(
+                run(data, path, connections, args.latency_ms / 1000, args.sender_mbps * 1024 * 1024)
+            )
+            with open(path, 'rb') as f:
+                assert f.read() == data, "الملف المنزل لا يطابق البيانات"
+            os.remove(path)
+            print(f"{connections} اتصال: {elapsed:.2f} ث ({megabytes(len(data)) / elapsed:.1f} MB/s)")
+
+
+if __name__ == '__main__':
+    main()
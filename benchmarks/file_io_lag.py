@@ -0,0 +1,64 @@
+"""
+تأخر حلقة الأحداث أثناء كتابة الملفات المنزلة: كتابة عدة ملفات متزامنة بأجزاء 1MB ثم fsync والحذف،
+مرة بعمليات متزامنة على حلقة الأحداث (كما كان التنزيل يكتب سابقاً) ومرة عبر core.file_io.
+
+    python -m benchmarks.file_io_lag --size-mb 300 --files 3
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+
+from benchmarks._common import LagMonitor
+from core import file_io
+
+PART = b'x' * (1024 * 1024)
+
+
+async def write_on_loop(path, parts):
+    with open(path, 'wb') as f:
+        for _ in range(parts):
+            f.write(PART)
+            await asyncio.sleep(0)
+        f.flush()
+        os.fsync(f.fileno())
+    os.remove(path)
+
+
+async def write_with_file_io(path, parts):
+    fd = await file_io.open_file(path)
+    try:
+        await file_io.preallocate(fd, parts * len(PART))
+        for index in range(parts):
+            await file_io.pwrite(fd, PART, index * len(PART))
+        await file_io.fsync(fd)
+    finally:
+        os.close(fd)
+    await asyncio.wrap_future(file_io.delete(path))
+
+
+async def run(write, directory, files, parts):
+    with LagMonitor() as lag:
+        started = time.perf_counter()
+        await asyncio.gather(*(write(os.path.join(directory, f'{write.__name__}{i}'), parts) for i in range(files)))
+        elapsed = time.perf_counter() - started
+    return elapsed, lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=300, help='حجم كل ملف')
+    parser.add_argument('--files', type=int, default=3, help='عدد الملفات المتزامنة')
+    parser.add_argument('--dir', default=None, help='مجلد الاختبار (يفضل على نفس قرص DOWNLOAD_DIR)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        for write in (write_on_loop, write_with_file_io):
+            elapsed, lag = asyncio.run(run(write, directory, args.files, args.size_mb))
+            print(f"{write.__name__}: {elapsed:.2f} ث، تأخر الحلقة {lag.summary()}")
+    file_io.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+تأخر حلقة الأحداث أثناء الرفع: عدة عمليات رفع متزامنة إلى خادم الرفع الوهمي بينما يُقاس
+تأخر الحلقة كل 1ms. الحلقة الحرة من أي عمل متزامن يبقى تأخرها بحدود أجزاء من المللي ثانية.
+
+    python -m benchmarks.upload_lag --size-mb 512 --uploads 4
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+
+from benchmarks._common import LagMonitor, megabytes, sparse_file, upload_server_process
+from core.resumable_upload import ResumableUploader
+
+BODY = {'snippet': {'title': 'benchmark'}, 'status': {'privacyStatus': 'private'}}
+
+
+async def token():
+    return 'token'
+
+
+async def run(upload_url, paths, chunk_size):
+    uploader = ResumableUploader(token, upload_url=upload_url, chunk_size=chunk_size)
+    try:
+        with LagMonitor() as lag:
+            started = time.perf_counter()
+            await asyncio.gather(*(uploader.upload_file(path, BODY) for path in paths))
+            elapsed = time.perf_counter() - started
+    finally:
+        await uploader.close()
+    return elapsed, lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=256, help='حجم كل ملف')
+    parser.add_argument('--uploads', type=int, default=4, help='عدد عمليات الرفع المتزامنة')
+    parser.add_argument('--chunk-mb', type=int, default=32, help='حجم جزء الرفع')
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    with tempfile.TemporaryDirectory() as directory, upload_server_process() as upload_url:
+        paths = [sparse_file(os.path.join(directory, f'video{i}.mp4'), size) for i in range(args.uploads)]
+        elapsed, lag = asyncio.run(run(upload_url, paths, args.chunk_mb * 1024 * 1024))
+
+    total = megabytes(size * args.uploads)
+    print(f"{args.uploads} رفع × {args.size_mb}MB في {elapsed:.2f} ث ({total / elapsed:.0f} MB/s)")
+    print(f"تأخر حلقة الأحداث: {lag.summary()}")
+
+
+if __name__ == '__main__':
+    main()
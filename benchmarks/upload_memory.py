@@ -0,0 +1,64 @@
+"""
+ذاكرة الرفع: رفع ملف متناثر كبير بأجزاء كبيرة إلى خادم الرفع الوهمي (في عملية منفصلة) مع قياس
+ذروة الذاكرة عبر tracemalloc وذروة RSS للعملية. الذروة يجب أن تبقى بحدود نافذة القراءة
+UPLOAD_BUFFER_SIZE مهما كبر حجم الجزء أو الملف.
+
+    python -m benchmarks.upload_memory --size-gb 4 --chunk-mb 256
+"""
+import os
+import time
+import asyncio
+import argparse
+import resource
+import tempfile
+import tracemalloc
+
+from benchmarks._common import megabytes, sparse_file, upload_server_process
+from config.config import UPLOAD_BUFFER_SIZE
+from core.resumable_upload import ResumableUploader
+
+BODY = {'snippet': {'title': 'benchmark'}, 'status': {'privacyStatus': 'private'}}
+
+
+async def token():
+    return 'token'
+
+
+async def run(upload_url, path, chunk_size):
+    uploader = ResumableUploader(token, upload_url=upload_url, chunk_size=chunk_size)
+    try:
+        started = time.perf_counter()
+        await uploader.upload_file(path, BODY)
+        return time.perf_counter() - started
+    finally:
+        await uploader.close()
+
+
+def peak_rss():
+    # ru_maxrss بالكيلوبايت على Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-gb', type=float, default=2, help='حجم الملف المتناثر')
+    parser.add_argument('--chunk-mb', type=int, default=256, help='حجم جزء الرفع')
+    args = parser.parse_args()
+
+    size = int(args.size_gb * 1024 ** 3)
+    with tempfile.TemporaryDirectory() as directory, upload_server_process() as upload_url:
+        path = sparse_file(os.path.join(directory, 'video.mp4'), size)
+        rss_before = peak_rss()
+        tracemalloc.start()
+        elapsed = asyncio.run(run(upload_url, path, args.chunk_mb * 1024 * 1024))
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rss_after = peak_rss()
+
+    print(f"رفع {args.size_gb:g}GB بأجزاء {args.chunk_mb}MB في {elapsed:.1f} ث ({megabytes(size) / elapsed:.0f} MB/s)")
+    print(f"ذروة tracemalloc: {megabytes(traced_peak):.1f}MB (نافذة القراءة {megabytes(UPLOAD_BUFFER_SIZE):.0f}MB)")
+    print(f"ذروة RSS: {megabytes(rss_after):.1f}MB (زيادة {megabytes(rss_after - rss_before):.1f}MB أثناء الرفع)")
+
+
+if __name__ == '__main__':
+    main()
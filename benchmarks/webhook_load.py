@@ -0,0 +1,72 @@
+"""
+اختبار حمل خادم webhook: إرسال تحديثات تيليجرام مصطنعة من عدة اتصالات متزامنة وقياس عدد
+التحديثات المستلمة والمعالجة في الثانية. المعالج يحاكي عملاً غير متزامن لكل تحديث،
+والمرسلون يعملون في نفس العملية فالنتيجة حد أدنى لما يتحمله الخادم وحده.
+
+    python -m benchmarks.webhook_load --updates 20000 --concurrency 64 --chats 500
+"""
+import time
+import asyncio
+import argparse
+from collections import Counter
+
+import aiohttp
+
+from core import webhook
+from core.webhook import SECRET_HEADER, WebhookServer
+from tests.fakes import FakeApplication, text_update
+
+
+async def run(args):
+    webhook.WEBHOOK_LISTEN = '127.0.0.1'
+    webhook.WEBHOOK_PORT = 0
+    webhook.WEBHOOK_URL = 'https://example.com'
+    webhook.WEBHOOK_QUEUE_SIZE = args.queue_size
+
+    async def handler(update):
+        await asyncio.sleep(args.handler_ms / 1000)
+
+    application = FakeApplication(handler)
+    server = WebhookServer(application, workers=args.workers)
+    await server.start()
+    host, port = server._runner.addresses[0][:2]
+    url = f'http://{host}:{port}{webhook.WEBHOOK_PATH}'
+    headers = {SECRET_HEADER: server.secret_token}
+
+    statuses = Counter()
+    next_id = iter(range(1, args.updates + 1))
+
+    async def sender(session):
+        for update_id in next_id:
+            update = text_update(update_id, update_id % args.chats)
+            async with session.post(url, json=update, headers=headers) as resp:
+                statuses[resp.status] += 1
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    started = time.perf_counter()
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(sender(session) for _ in range(args.concurrency)))
+    received = time.perf_counter() - started
+    await server.stop()
+    processed = time.perf_counter() - started
+    return statuses, received, processed, len(application.processed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=32, help='عدد الاتصالات المتزامنة')
+    parser.add_argument('--chats', type=int, default=200, help='عدد المحادثات المختلفة')
+    parser.add_argument('--workers', type=int, default=webhook.WEBHOOK_WORKERS, help='عمال المعالجة')
+    parser.add_argument('--queue-size', type=int, default=webhook.WEBHOOK_QUEUE_SIZE)
+    parser.add_argument('--handler-ms', type=float, default=1.0, help='زمن معالجة كل تحديث')
+    args = parser.parse_args()
+
+    statuses, received, processed, handled = asyncio.run(run(args))
+    print(f"الردود: {dict(statuses)}")
+    print(f"الاستلام: {args.updates / received:.0f} تحديث/ث")
+    print(f"المعالجة: {handled} تحديث في {processed:.2f} ث ({handled / processed:.0f} تحديث/ث)")
+
+
+if __name__ == '__main__':
+    main()
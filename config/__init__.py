@@ -12,11 +12,71 @@ from .config import (
     YOUTUBE_TOKEN_PICKLE,
     SCOPES,
     UPLOAD_CHUNK_SIZE,
+    UPLOAD_BUFFER_SIZE,
+    ENABLE_CHUNK_AUTOTUNE,
+    CHUNK_TARGET_SECONDS,
+    UPLOAD_CHUNK_MIN_SIZE,
+    UPLOAD_CHUNK_MAX_SIZE,
+    DOWNLOAD_PART_MIN_SIZE,
     MAX_UPLOAD_RETRIES,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    MAX_FLOOD_WAIT,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    YOUTUBE_UPLOAD_URL,
+    YOUTUBE_API_WORKERS,
+    UPLOAD_STATE_SUFFIX,
+    UPLOAD_SESSION_MAX_AGE,
+    PLAYLIST_CACHE_TTL,
+    PLAYLIST_CACHE_REFRESH_AFTER,
+    YOUTUBE_DAILY_QUOTA,
+    DEFAULT_YOUTUBE_CHANNEL,
+    YOUTUBE_CHANNELS_DIR,
+    YOUTUBE_CHANNEL_POLICY,
+    ENABLE_STREAMING_PIPELINE,
+    PIPELINE_CHUNK_SIZE,
+    PIPELINE_BUFFER_CHUNKS,
     CHUNK_SIZE,
     MAX_RETRIES,
     MAX_FILE_SIZE,
-    SESSION_NAME as TELEGRAM_SESSION_PATH,
+    MAX_BULK_MESSAGES,
+    ENABLE_PARALLEL_DOWNLOAD,
+    PARALLEL_DOWNLOAD_MIN_SIZE,
+    DOWNLOAD_PART_SIZE,
+    DOWNLOAD_CONNECTIONS_PER_FILE,
+    DOWNLOAD_GLOBAL_CONNECTIONS,
+    DOWNLOAD_WORKERS,
+    UPLOAD_WORKERS,
+    UPLOAD_QUEUE_SIZE,
+    PROGRESS_GLOBAL_EDITS_PER_SECOND,
+    PROGRESS_CHAT_EDITS_PER_MINUTE,
+    ENABLE_WEBHOOK,
+    WEBHOOK_URL,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_WORKERS,
+    WEBHOOK_QUEUE_SIZE,
+    WEBHOOK_DRAIN_TIMEOUT,
+    NODE_ROLE,
+    NODE_ID,
+    JOB_LEASE_SECONDS,
+    JOB_HEARTBEAT_INTERVAL,
+    JOB_CLAIM_INTERVAL,
+    MIRROR_CHANNELS,
+    MIRROR_TITLE_TEMPLATE,
+    MIRROR_CATCHUP_INTERVAL,
+    MIRROR_CATCHUP_EMPTY_WINDOWS,
+    JOBS_DB_PATH,
+    JOBS_DB_BUSY_TIMEOUT,
+    JOB_PROGRESS_SAVE_INTERVAL,
+    MEDIA_CACHE_DIR,
+    MEDIA_CACHE_MAX_BYTES,
+    CONTENT_HASH_READ_SIZE,
+    FILE_IO_WORKERS,
+    TELEGRAM_SESSION_PATH,
     DATA_DIR,
     SESSIONS_DIR,
     CREDENTIALS_DIR,
@@ -42,11 +102,73 @@ __all__ = [
     'YOUTUBE_TOKEN_PICKLE',
     'SCOPES',
     'UPLOAD_CHUNK_SIZE',
+    'UPLOAD_BUFFER_SIZE',
+    'ENABLE_CHUNK_AUTOTUNE',
+    'CHUNK_TARGET_SECONDS',
+    'UPLOAD_CHUNK_MIN_SIZE',
+    'UPLOAD_CHUNK_MAX_SIZE',
+    'DOWNLOAD_PART_MIN_SIZE',
     'MAX_UPLOAD_RETRIES',
+    'RETRY_BASE_DELAY',
+    'RETRY_MAX_DELAY',
+    'MAX_FLOOD_WAIT',
+    'CIRCUIT_FAILURE_THRESHOLD',
+    'CIRCUIT_RESET_TIMEOUT',
+    'YOUTUBE_UPLOAD_URL',
+    'YOUTUBE_API_WORKERS',
+    'UPLOAD_STATE_SUFFIX',
+    'UPLOAD_SESSION_MAX_AGE',
+    'PLAYLIST_CACHE_TTL',
+    'PLAYLIST_CACHE_REFRESH_AFTER',
+    'YOUTUBE_DAILY_QUOTA',
+    'DEFAULT_YOUTUBE_CHANNEL',
+    'YOUTUBE_CHANNELS_DIR',
+    'YOUTUBE_CHANNEL_POLICY',
+    'ENABLE_STREAMING_PIPELINE',
+    'PIPELINE_CHUNK_SIZE',
+    'PIPELINE_BUFFER_CHUNKS',
     'CHUNK_SIZE',
     'MAX_RETRIES',
     'MAX_FILE_SIZE',
+    'MAX_BULK_MESSAGES',
+    'ENABLE_PARALLEL_DOWNLOAD',
+    'PARALLEL_DOWNLOAD_MIN_SIZE',
+    'DOWNLOAD_PART_SIZE',
+    'DOWNLOAD_CONNECTIONS_PER_FILE',
+    'DOWNLOAD_GLOBAL_CONNECTIONS',
+    'DOWNLOAD_WORKERS',
+    'UPLOAD_WORKERS',
+    'UPLOAD_QUEUE_SIZE',
+    'PROGRESS_GLOBAL_EDITS_PER_SECOND',
+    'PROGRESS_CHAT_EDITS_PER_MINUTE',
+    'ENABLE_WEBHOOK',
+    'WEBHOOK_URL',
+    'WEBHOOK_LISTEN',
+    'WEBHOOK_PORT',
+    'WEBHOOK_PATH',
+    'WEBHOOK_SECRET_TOKEN',
+    'WEBHOOK_WORKERS',
+    'WEBHOOK_QUEUE_SIZE',
+    'WEBHOOK_DRAIN_TIMEOUT',
+    'NODE_ROLE',
+    'NODE_ID',
+    'JOB_LEASE_SECONDS',
+    'JOB_HEARTBEAT_INTERVAL',
+    'JOB_CLAIM_INTERVAL',
+    'MIRROR_CHANNELS',
+    'MIRROR_TITLE_TEMPLATE',
+    'MIRROR_CATCHUP_INTERVAL',
+    'MIRROR_CATCHUP_EMPTY_WINDOWS',
+    'JOBS_DB_PATH',
+    'JOBS_DB_BUSY_TIMEOUT',
+    'JOB_PROGRESS_SAVE_INTERVAL',
+    'MEDIA_CACHE_DIR',
+    'MEDIA_CACHE_MAX_BYTES',
+    'CONTENT_HASH_READ_SIZE',
+    'FILE_IO_WORKERS',
     'TELEGRAM_SESSION_PATH',
+    'TELEGRAM_ENTITY_CACHE_PATH',
+    'TELEGRAM_ENTITY_CACHE_TTL',
     'ENABLE_SINGLE_INSTANCE',
     'LOCK_FILE_PATH',
     'LOCK_TIMEOUT_MINUTES',
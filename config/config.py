@@ -21,6 +21,8 @@ TELEGRAM_API_HASH = 'bb723be5e3d8196761e04d640337ee60'
 USE_MEMORY_SESSION = False
 SESSION_NAME = os.path.join(SESSIONS_DIR, 'bot_session.session')
 TELEGRAM_SESSION_PATH = os.path.join(SESSIONS_DIR, 'telethon.session')  # ملف جلسة Telethon
+TELEGRAM_ENTITY_CACHE_PATH = os.path.join(SESSIONS_DIR, 'entities.db')  # ذاكرة دائمة لمعرفات القنوات وaccess_hash
+TELEGRAM_ENTITY_CACHE_TTL = 24 * 3600  # مدة صلاحية الكيانات المخزنة قبل حلها من جديد (بالثواني)
 ADMIN_CHAT_ID = 123456789  # يجب تغيير هذا الرقم إلى معرف المحادثة الخاص بك
 
 # إعدادات يوتيوب
@@ -34,8 +36,84 @@ TEMP_DOWNLOAD_PATH = os.path.join(DATA_DIR, 'downloads')  # المسار الم
 CHUNK_SIZE = 50 * 1024 * 1024  # 50MB chunks for download
 MAX_RETRIES = 5
 MAX_FILE_SIZE = 4 * 1024 * 1024 * 1024  # 4GB (Telegram Premium)
-UPLOAD_CHUNK_SIZE = 256 * 1024 * 1024  # 256MB chunks for YouTube upload
+MAX_BULK_MESSAGES = 500  # أقصى عدد رسائل في طلب واحد (عدة روابط أو نطاق مثل t.me/chan/100-300)
+ENABLE_PARALLEL_DOWNLOAD = True  # تنزيل الملفات الكبيرة عبر عدة اتصالات متوازية
+PARALLEL_DOWNLOAD_MIN_SIZE = 20 * 1024 * 1024  # أقل حجم ملف لاستخدام التنزيل المتوازي
+DOWNLOAD_PART_SIZE = 1024 * 1024  # حجم جزء upload.getFile (يجب أن يقسم 1MB، والحجم الابتدائي عند الضبط التلقائي)
+DOWNLOAD_CONNECTIONS_PER_FILE = 4  # عدد الاتصالات المتوازية لكل ملف
+DOWNLOAD_GLOBAL_CONNECTIONS = 12  # الحد الأقصى لطلبات الأجزاء المتزامنة لجميع التنزيلات
+UPLOAD_CHUNK_SIZE = 256 * 1024 * 1024  # 256MB chunks for YouTube upload (الحجم الابتدائي عند الضبط التلقائي)
+UPLOAD_BUFFER_SIZE = 4 * 1024 * 1024  # نافذة القراءة أثناء بث كل جزء (تحدد ذاكرة الرفع)
+ENABLE_CHUNK_AUTOTUNE = True  # ضبط حجم أجزاء الرفع والتنزيل تلقائياً حسب معدل النقل والأخطاء
+CHUNK_TARGET_SECONDS = 15  # المدة المستهدفة لنقل كل جزء عند الضبط التلقائي
+UPLOAD_CHUNK_MIN_SIZE = 8 * 1024 * 1024  # أصغر حجم لجزء الرفع عند الضبط التلقائي
+UPLOAD_CHUNK_MAX_SIZE = 512 * 1024 * 1024  # أكبر حجم لجزء الرفع عند الضبط التلقائي
+DOWNLOAD_PART_MIN_SIZE = 64 * 1024  # أصغر حجم لجزء التنزيل عند الضبط التلقائي (الأكبر 1MB)
 MAX_UPLOAD_RETRIES = 10
+RETRY_BASE_DELAY = 1  # أقل تأخير قبل إعادة المحاولة (بالثواني)
+RETRY_MAX_DELAY = 60  # الحد الأقصى للتأخير بين المحاولات (بالثواني)
+MAX_FLOOD_WAIT = 15 * 60  # أطول FloodWait يُنتظر تلقائياً قبل اعتبار الخطأ نهائياً
+CIRCUIT_FAILURE_THRESHOLD = 5  # عدد الأخطاء المتتالية التي تفتح قاطع الدائرة لنقطة الاتصال
+CIRCUIT_RESET_TIMEOUT = 30  # مدة بقاء القاطع مفتوحاً قبل السماح بمحاولة اختبار (بالثواني)
+YOUTUBE_UPLOAD_URL = 'https://www.googleapis.com/upload/youtube/v3/videos'  # نقطة الرفع القابل للاستئناف
+YOUTUBE_API_WORKERS = 4  # عدد خيوط تنفيذ طلبات YouTube API (قوائم التشغيل وغيرها)
+UPLOAD_STATE_SUFFIX = '.upload.json'  # ملف حالة جلسة الرفع بجانب الملف المؤقت
+UPLOAD_SESSION_MAX_AGE = 6 * 24 * 3600  # تنتهي جلسات الرفع لدى يوتيوب بعد أسبوع تقريباً
+PLAYLIST_CACHE_TTL = 30 * 60  # مدة صلاحية قوائم التشغيل المخزنة مؤقتاً (بالثواني)
+PLAYLIST_CACHE_REFRESH_AFTER = 20 * 60  # بعد هذه المدة تُحدّث القوائم في الخلفية
+YOUTUBE_DAILY_QUOTA = 10000  # حصة YouTube Data API اليومية بالوحدات (تتجدد منتصف الليل بتوقيت المحيط الهادئ)
+DEFAULT_YOUTUBE_CHANNEL = 'default'  # اسم القناة المرتبطة بملف YOUTUBE_TOKEN_PICKLE
+YOUTUBE_CHANNELS_DIR = os.path.join(CREDENTIALS_DIR, 'youtube_channels')  # توكنات القنوات الإضافية (<اسم_القناة>.pickle) وملفات client_secrets الخاصة بها (<اسم_القناة>.json)
+YOUTUBE_CHANNEL_POLICY = 'most_quota'  # توزيع الرفع التلقائي بين القنوات: 'most_quota' أو 'least_loaded'
+
+# إعدادات النقل المباشر (تنزيل ورفع متزامنان دون ملف مؤقت كامل)
+ENABLE_STREAMING_PIPELINE = True
+PIPELINE_CHUNK_SIZE = 512 * 1024  # حجم جزء التنزيل من تيليجرام (الحد الأقصى 512KB)
+PIPELINE_BUFFER_CHUNKS = 8  # عدد الأجزاء المسموح بها في المخزن المؤقت بين التنزيل والرفع
+
+# إعدادات المجدول (عدد العمال لكل مرحلة)
+DOWNLOAD_WORKERS = 3  # عدد التنزيلات المتزامنة من تيليجرام
+UPLOAD_WORKERS = 2  # عدد عمليات الرفع المتزامنة إلى يوتيوب
+UPLOAD_QUEUE_SIZE = 4  # الحد الأقصى للملفات المنزلة بانتظار الرفع
+
+# إعدادات تحديث رسائل الحالة (تجنب حدود Bot API مع كثرة المهام المتزامنة)
+PROGRESS_GLOBAL_EDITS_PER_SECOND = 20  # الحد العام لتعديلات الرسائل في الثانية (حد Bot API نحو 30)
+PROGRESS_CHAT_EDITS_PER_MINUTE = 20  # الحد لكل محادثة في الدقيقة (حد Bot API للمجموعات 20)
+
+# إعدادات وضع webhook (بديل الاستطلاع عبر خادم aiohttp مدمج)
+ENABLE_WEBHOOK = False  # استقبال التحديثات عبر webhook بدلاً من الاستطلاع (long polling)
+WEBHOOK_URL = ''  # العنوان العام HTTPS الذي يصل إلى الخادم (مثل https://example.com)
+WEBHOOK_LISTEN = '0.0.0.0'  # عنوان الاستماع المحلي
+WEBHOOK_PORT = 8443  # منفذ الاستماع (يمكن وضع الخادم خلف وكيل عكسي)
+WEBHOOK_PATH = '/telegram'  # مسار استقبال التحديثات
+WEBHOOK_SECRET_TOKEN = ''  # الرمز السري للتحقق من مصدر التحديثات (يُولد عشوائياً عند كل تشغيل إذا تُرك فارغاً)
+WEBHOOK_WORKERS = 4  # عدد عمال معالجة التحديثات (تحديثات المحادثة الواحدة تُعالج بالترتيب)
+WEBHOOK_QUEUE_SIZE = 100  # الحد الأقصى للتحديثات المنتظرة قبل رفض الجديدة (يعيد تيليجرام إرسالها)
+WEBHOOK_DRAIN_TIMEOUT = 30  # مهلة معالجة التحديثات المتبقية عند الإيقاف (بالثواني)
+
+# إعدادات توزيع المهام على عدة عمليات (واجهة وعقد عاملة تتشارك مخزن المهام)
+NODE_ROLE = 'all'  # 'all' عملية واحدة، 'frontend' استقبال التحديثات فقط، 'worker' تنفيذ المهام فقط (يمكن تغييره بـ main.py --role)
+NODE_ID = ''  # اسم العقدة العاملة (افتراضياً اسم الجهاز ورقم العملية؛ يُفضل اسم ثابت لإعادة استخدام ذاكرة الوسائط)
+JOB_LEASE_SECONDS = 60  # مدة عقد المهمة؛ تسحبها عقدة أخرى إذا لم يُجدد خلالها
+JOB_HEARTBEAT_INTERVAL = 15  # الفترة بين تجديدات عقود المهام (بالثواني)
+JOB_CLAIM_INTERVAL = 2  # الفترة بين محاولات سحب مهام جديدة عند خلو الطابور (بالثواني)
+
+# إعدادات نسخ القنوات (رفع الفيديوهات الجديدة من قنوات تيليجرام تلقائياً)
+MIRROR_CHANNELS = {}  # اسم مستخدم القناة -> قواعدها، مثل {'source_channel': {'playlist_id': 'PL...', 'title': '{caption}', 'channel': None, 'chat_id': None, 'since': None}}
+MIRROR_TITLE_TEMPLATE = '{caption}'  # قالب العنوان الافتراضي: {caption} أول سطر من نص الرسالة، {channel}، {message_id}، {date}
+MIRROR_CATCHUP_INTERVAL = 300  # الفترة بين عمليات استدراك الرسائل الفائتة (بالثواني)
+MIRROR_CATCHUP_EMPTY_WINDOWS = 3  # يتوقف الاستدراك بعد هذا العدد من نوافذ الأرقام المتتالية الخالية من الرسائل (100 رقم لكل نافذة)
+
+# إعدادات مخزن المهام (استئناف التنزيل والرفع بعد إعادة التشغيل)
+JOBS_DB_PATH = os.path.join(DATA_DIR, 'jobs.db')
+JOBS_DB_BUSY_TIMEOUT = 5  # مهلة انتظار قفل قاعدة البيانات بين العمليات (أقصر من JOB_HEARTBEAT_INTERVAL حتى لا يفوت تجديد العقود)
+JOB_PROGRESS_SAVE_INTERVAL = 16 * 1024 * 1024  # حفظ موضع التنزيل كل 16MB
+
+# إعدادات ذاكرة الوسائط (ملفات منزلة مشتركة بين المهام)
+MEDIA_CACHE_DIR = os.path.join(DATA_DIR, 'media_cache')
+MEDIA_CACHE_MAX_BYTES = 20 * 1024 * 1024 * 1024  # الحد الأقصى لحجم الملفات المحتفظ بها (20GB)
+CONTENT_HASH_READ_SIZE = 4 * 1024 * 1024  # حجم القراءة عند حساب بصمة الملفات المنزلة
+FILE_IO_WORKERS = 4  # خيوط مجمع عمليات الملفات (الكتابة والمزامنة والحجز المسبق والحذف) خارج حلقة الأحداث
 
 # إعدادات السجلات
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -0,0 +1,136 @@
+"""
+ضبط حجم أجزاء الرفع والتنزيل تلقائياً حسب معدل النقل المقاس ونسبة الأخطاء
+"""
+import logging
+
+from config.config import (
+    ENABLE_CHUNK_AUTOTUNE,
+    CHUNK_TARGET_SECONDS,
+    UPLOAD_CHUNK_SIZE,
+    UPLOAD_CHUNK_MIN_SIZE,
+    UPLOAD_CHUNK_MAX_SIZE,
+    DOWNLOAD_PART_SIZE,
+    DOWNLOAD_PART_MIN_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+# يشترط بروتوكول الرفع القابل للاستئناف أن يكون كل جزء (عدا الأخير) من مضاعفات 256 كيلوبايت
+UPLOAD_GRANULARITY = 256 * 1024
+# upload.getFile: حجم الجزء يجب أن يقسم 1MB بدون باقٍ
+DOWNLOAD_MAX_PART_SIZE = 1024 * 1024
+
+# معامل التنعيم للمتوسطات المتحركة
+_EWMA_ALPHA = 0.3
+
+
+def multiple_of(granularity):
+    """تقريب الحجم للأسفل إلى مضاعفات granularity"""
+    def quantize(size):
+        return max(granularity, int(size) // granularity * granularity)
+    return quantize
+
+
+def power_of_two(size):
+    """تقريب الحجم للأسفل إلى قوة للعدد 2 (تقسم 1MB ما دامت لا تتجاوزه)"""
+    return 1 << (max(1, int(size)).bit_length() - 1)
+
+
+class ChunkTuner:
+    """
+    يختار حجم الجزء بحيث يستغرق نقله نحو target_seconds بمعدل النقل المقاس (متوسط متحرك)،
+    فتحصل الروابط السريعة على أجزاء أكبر بطلبات أقل. عند كل خطأ ينخفض سقف الحجم إلى النصف
+    حتى لا يُعاد إرسال جزء كبير على رابط غير مستقر، ويتضاعف السقف تدريجياً مع كل نجاح
+    """
+
+    def __init__(self, name, initial, min_size, max_size, quantize,
+                 target_seconds=CHUNK_TARGET_SECONDS, enabled=ENABLE_CHUNK_AUTOTUNE):
+        self.name = name
+        self.quantize = quantize
+        self.min_size = quantize(min_size)
+        self.max_size = max(self.min_size, quantize(max_size))
+        self.target_seconds = target_seconds
+        self.enabled = enabled
+        self._size = self._clamp(initial)
+        self._ceiling = self.max_size
+        self._throughput = None  # بايت/ثانية
+        self._error_rate = 0.0
+        self.samples = 0
+        self.errors = 0
+
+    def _clamp(self, size):
+        return self.quantize(min(max(size, self.min_size), self.max_size))
+
+    @property
+    def chunk_size(self):
+        return self._size
+
+    def record(self, nbytes, seconds):
+        """تسجيل جزء نُقل بنجاح"""
+        if not self.enabled or nbytes <= 0 or seconds <= 0:
+            return
+        rate = nbytes / seconds
+        self.samples += 1
+        if self._throughput is None:
+            self._throughput = rate
+        else:
+            self._throughput += _EWMA_ALPHA * (rate - self._throughput)
+        self._error_rate *= 1 - _EWMA_ALPHA
+        self._ceiling = min(self.max_size, self._ceiling * 2)
+        self._update()
+
+    def record_error(self):
+        """تسجيل فشل نقل جزء بسبب الشبكة أو الخادم"""
+        if not self.enabled:
+            return
+        self.errors += 1
+        self._error_rate += _EWMA_ALPHA * (1 - self._error_rate)
+        self._ceiling = max(self.min_size, self._size // 2)
+        self._update()
+
+    def _update(self):
+        target = self._throughput * self.target_seconds if self._throughput else self._size
+        size = self._clamp(min(target, self._ceiling))
+        if size != self._size:
+            logger.info(
+                f"ضبط حجم أجزاء {self.name}: {self._size / 1024:.0f}KB -> {size / 1024:.0f}KB "
+                f"(المعدل {(self._throughput or 0) / (1024 * 1024):.2f}MB/s، الأخطاء {self._error_rate:.0%})"
+            )
+            self._size = size
+
+    def snapshot(self):
+        return {
+            'chunk_size': self._size,
+            'throughput': self._throughput or 0.0,
+            'error_rate': self._error_rate,
+            'samples': self.samples,
+            'errors': self.errors
+        }
+
+
+_tuners = {}
+
+
+def upload_tuner():
+    """الضابط المشترك لأجزاء الرفع إلى يوتيوب"""
+    if 'upload' not in _tuners:
+        _tuners['upload'] = ChunkTuner(
+            'الرفع', UPLOAD_CHUNK_SIZE, UPLOAD_CHUNK_MIN_SIZE, UPLOAD_CHUNK_MAX_SIZE,
+            multiple_of(UPLOAD_GRANULARITY)
+        )
+    return _tuners['upload']
+
+
+def download_tuner():
+    """الضابط المشترك لأجزاء التنزيل من تيليجرام"""
+    if 'download' not in _tuners:
+        _tuners['download'] = ChunkTuner(
+            'التنزيل', DOWNLOAD_PART_SIZE, DOWNLOAD_PART_MIN_SIZE, DOWNLOAD_MAX_PART_SIZE,
+            power_of_two
+        )
+    return _tuners['download']
+
+
+def tuner_snapshots():
+    """إحصائيات جميع الضوابط المستخدمة حتى الآن"""
+    return {tuner.name: tuner.snapshot() for tuner in _tuners.values()}
@@ -0,0 +1,102 @@
+"""
+مجمع قنوات يوتيوب: عميل وبيانات اعتماد وسجل حصة لكل قناة مع توزيع الرفع بينها
+"""
+import logging
+
+from config.config import DEFAULT_YOUTUBE_CHANNEL, YOUTUBE_CHANNEL_POLICY
+from core.youtube_utils import YouTubeUploader
+from core.quota import QuotaLedger, ADMIT
+from utils.session_manager import SessionManager
+
+logger = logging.getLogger(__name__)
+
+# سياسات اختيار القناة تلقائياً
+POLICY_MOST_QUOTA = 'most_quota'        # القناة ذات الحصة المتبقية الأكبر
+POLICY_LEAST_LOADED = 'least_loaded'    # القناة ذات المهام الجارية الأقل
+
+
+class ChannelPool:
+    """
+    لكل قناة YouTubeUploader مستقل (توكن ومحرك رفع وعملاء API)، وسجل حصة لكل مشروع Google:
+    القنوات التي تتبع نفس المشروع (project_id في ملف client_secrets) تتشارك الحصة نفسها لأن يوتيوب يحسبها لكل مشروع
+    """
+
+    def __init__(self, policy=YOUTUBE_CHANNEL_POLICY):
+        self.policy = policy
+        self._uploaders = {}  # اسم القناة -> YouTubeUploader
+        self._ledgers = {}    # معرف مشروع Google -> QuotaLedger
+        self._assigned = {}   # job_id -> القناة التي حُجزت لها حصة المهمة
+
+    def get(self, channel=None):
+        """عميل القناة (يُنشأ عند أول استخدام دون مصادقة)"""
+        channel = channel or DEFAULT_YOUTUBE_CHANNEL
+        uploader = self._uploaders.get(channel)
+        if uploader is None:
+            uploader = YouTubeUploader(channel=channel, quota=self._ledger_for(channel))
+            self._uploaders[channel] = uploader
+        return uploader
+
+    def for_job(self, job):
+        return self.get(job.get('channel'))
+
+    def _ledger_for(self, channel):
+        # السجل يُحفظ بمعرف المشروع فلا يتغير بتغير القناة التي استخدمته أولاً
+        project = SessionManager.project_id(channel)
+        ledger = self._ledgers.get(project)
+        if ledger is None:
+            ledger = QuotaLedger(project=project)
+            self._ledgers[project] = ledger
+        return ledger
+
+    def ledgers(self):
+        return list(self._ledgers.values())
+
+    async def initialize(self, channel=None, interactive=False):
+        """مصادقة القناة وتهيئة عميلها"""
+        return await self.get(channel).initialize(interactive)
+
+    def ready_channels(self):
+        """القنوات المهيأة للرفع بترتيب إضافتها"""
+        return [name for name, uploader in self._uploaders.items() if uploader.youtube]
+
+    def load(self, channel):
+        """عدد المهام الجارية التي حُجزت لها حصة على القناة"""
+        return sum(1 for assigned in self._assigned.values() if assigned == channel)
+
+    def choose(self, units=0):
+        """
+        اختيار قناة للرفع حسب السياسة من بين القنوات المهيأة التي تكفي حصتها units وحدة
+        (أو من جميعها إن لم تكفِ أي منها، فتؤجل المهمة عند قبولها). تعيد None إذا لم تُهيأ أي قناة
+        """
+        channels = self.ready_channels()
+        if not channels:
+            return None
+        with_quota = [name for name in channels if self.get(name).quota.remaining() >= units]
+        candidates = with_quota or channels
+        if self.policy == POLICY_LEAST_LOADED:
+            key = lambda name: (self.load(name), -self.get(name).quota.remaining())
+        else:
+            key = lambda name: (-self.get(name).quota.remaining(), self.load(name))
+        channel = min(candidates, key=key)
+        logger.info(f"تم اختيار القناة {channel} تلقائياً ({self.policy})")
+        return channel
+
+    def admit(self, job_id, channel, units):
+        """حجز حصة المهمة في سجل القناة وتسجيلها ضمن حمل القناة عند قبولها"""
+        channel = channel or DEFAULT_YOUTUBE_CHANNEL
+        decision, wait_seconds = self.get(channel).quota.admit(job_id, units)
+        if decision == ADMIT:
+            self._assigned[job_id] = channel
+        return decision, wait_seconds
+
+    def release(self, job_id):
+        """انتهاء المهمة: إلغاء حجزها وإزالتها من حمل القناة"""
+        channel = self._assigned.pop(job_id, None)
+        if channel is not None:
+            self.get(channel).quota.release(job_id)
+
+    async def close(self):
+        for uploader in self._uploaders.values():
+            await uploader.close()
+        for ledger in self._ledgers.values():
+            ledger.close()
@@ -0,0 +1,74 @@
+"""
+حساب بصمة محتوى الوسائط (SHA-256) أثناء التنزيل أو النقل المباشر
+"""
+import os
+import hashlib
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from config.config import CONTENT_HASH_READ_SIZE
+
+
+class FileHasher:
+    """
+    يحسب بصمة ملف أثناء تنزيله: كلما تقدم الجزء المكتمل المتصل من بداية الملف يُقرأ
+    الجديد منه (من ذاكرة الصفحات غالباً لأنه كُتب للتو) ويُضاف إلى البصمة في خيط مستقل
+    وبالترتيب، فيعمل مع التنزيل المتوازي والتسلسلي والمستأنف على حد سواء
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._digest = hashlib.sha256()
+        self._hashed = 0
+        self._target = 0
+        self._fd = None
+        self._closed = False
+        # خيط واحد يضمن معالجة المواضع بالترتيب
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='content-hash')
+
+    def advance(self, offset):
+        """تسجيل أن الملف مكتمل حتى offset (تُستدعى من offset_callback دون انتظار)"""
+        if not self._closed and offset > self._target:
+            self._target = offset
+            self._executor.submit(self._consume, offset)
+
+    def _consume(self, offset):
+        if self._closed:
+            return
+        if self._fd is None:
+            self._fd = os.open(self.file_path, os.O_RDONLY)
+        while not self._closed and self._hashed < offset:
+            data = os.pread(self._fd, min(CONTENT_HASH_READ_SIZE, offset - self._hashed), self._hashed)
+            if not data:
+                break
+            self._digest.update(data)
+            self._hashed += len(data)
+
+    async def finish(self, total_size):
+        """إكمال البصمة حتى نهاية الملف وإرجاعها (أو None إذا لم يكتمل الملف)"""
+        try:
+            future = self._executor.submit(self._consume, total_size)
+            await asyncio.wrap_future(future)
+            return self._digest.hexdigest() if self._hashed == total_size else None
+        finally:
+            self.close()
+
+    def close(self):
+        """إيقاف الحساب وإغلاق الملف (يُغلق داخل الخيط بعد انتهاء أي قراءة جارية)"""
+        if self._closed:
+            return
+        self._closed = True
+        self._executor.submit(self._close_fd)
+        self._executor.shutdown(wait=False)
+
+    def _close_fd(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+async def hashed_chunks(chunks, digest):
+    """تمرير أجزاء البث كما هي مع إضافتها إلى البصمة digest بالترتيب"""
+    async for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
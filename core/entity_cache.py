@@ -0,0 +1,94 @@
+"""
+ذاكرة دائمة لكيانات تيليجرام (المعرف وaccess_hash) مع مدة صلاحية لتجنب طلبات ResolveUsername
+"""
+import time
+import sqlite3
+import logging
+import threading
+
+from telethon.tl.types import InputPeerChannel, InputPeerChat, InputPeerUser
+
+from config.config import TELEGRAM_ENTITY_CACHE_PATH, TELEGRAM_ENTITY_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    peer_id INTEGER NOT NULL,
+    access_hash INTEGER,
+    resolved_at REAL NOT NULL
+);
+"""
+
+# أنواع الكيانات المخزنة
+_KIND_CHANNEL = 'channel'
+_KIND_CHAT = 'chat'
+_KIND_USER = 'user'
+
+
+def _to_row(peer):
+    if isinstance(peer, InputPeerChannel):
+        return _KIND_CHANNEL, peer.channel_id, peer.access_hash
+    if isinstance(peer, InputPeerUser):
+        return _KIND_USER, peer.user_id, peer.access_hash
+    if isinstance(peer, InputPeerChat):
+        return _KIND_CHAT, peer.chat_id, None
+    return None
+
+
+def _from_row(kind, peer_id, access_hash):
+    if kind == _KIND_CHANNEL:
+        return InputPeerChannel(channel_id=peer_id, access_hash=access_hash)
+    if kind == _KIND_USER:
+        return InputPeerUser(user_id=peer_id, access_hash=access_hash)
+    return InputPeerChat(chat_id=peer_id)
+
+
+class EntityCache:
+    """
+    ربط مفتاح (اسم مستخدم القناة مثلاً) بـ InputPeer جاهز للاستخدام في الطلبات مباشرة.
+    تنتهي صلاحية المدخل بعد ttl ثانية لأن أسماء المستخدمين قد تنتقل إلى قنوات أخرى
+    """
+
+    def __init__(self, db_path=TELEGRAM_ENTITY_CACHE_PATH, ttl=TELEGRAM_ENTITY_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def normalize(key):
+        return str(key).strip().lstrip('@').lower()
+
+    def get(self, key):
+        """InputPeer المخزن للمفتاح، أو None إذا لم يوجد أو انتهت صلاحيته"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT kind, peer_id, access_hash FROM entities WHERE key = ? AND resolved_at >= ?",
+                (self.normalize(key), time.time() - self.ttl)
+            ).fetchone()
+        return _from_row(*row) if row else None
+
+    def put(self, key, peer):
+        """تخزين InputPeer للمفتاح (الأنواع الأخرى مثل InputPeerSelf لا تُخزن)"""
+        row = _to_row(peer)
+        if row is None:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entities (key, kind, peer_id, access_hash, resolved_at) VALUES (?, ?, ?, ?, ?)",
+                (self.normalize(key), *row, time.time())
+            )
+
+    def forget(self, key):
+        """إزالة مدخل لم يعد صالحاً (مثل access_hash مرفوض)"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entities WHERE key = ?", (self.normalize(key),))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
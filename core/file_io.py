@@ -0,0 +1,111 @@
+"""
+عمليات الملفات خارج حلقة الأحداث: الكتابة والمزامنة والحجز المسبق والحذف في مجمع خيوط مخصص
+"""
+import os
+import uuid
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from config.config import FILE_IO_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# لاحقة الملفات المعدة للحذف (تُحذف عند التشغيل التالي إذا توقف البوت قبل حذفها)
+TOMBSTONE_SUFFIX = '.deleted'
+
+_executor = None
+
+
+def executor():
+    """
+    مجمع الخيوط المشترك لعمليات الملفات، منفصل عن المجمع الافتراضي لحلقة الأحداث
+    فلا تنتظر عمليات القرص البطيئة خلف طلبات أخرى ولا العكس
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=FILE_IO_WORKERS, thread_name_prefix='file-io')
+    return _executor
+
+
+def shutdown():
+    """انتظار انتهاء عمليات الحذف والكتابة المعلقة عند إيقاف البوت"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+async def run(func, *args):
+    """تنفيذ عملية ملفات متزامنة في المجمع وانتظار نتيجتها"""
+    return await asyncio.get_running_loop().run_in_executor(executor(), func, *args)
+
+
+def _pwrite_all(fd, data, offset):
+    # قد تكتب pwrite جزءاً من البيانات فقط
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+def _preallocate(fd, size):
+    """حجز مساحة الملف مسبقاً لتتم الكتابة دون تجزئة (أو تحديد حجمه فقط إن لم يدعم النظام الحجز)"""
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            pass
+    os.ftruncate(fd, size)
+
+
+def _unlink(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _log_delete_failure(future):
+    if not future.cancelled() and future.exception():
+        logger.error(f"فشل في حذف الملف: {str(future.exception())}")
+
+
+async def open_file(path, flags=os.O_RDWR | os.O_CREAT, mode=0o644):
+    """فتح ملف وإرجاع واصفه (بدون O_TRUNC افتراضياً للإبقاء على الأجزاء المنزلة)"""
+    return await run(os.open, path, flags, mode)
+
+
+async def pwrite(fd, data, offset):
+    """كتابة البيانات كاملة في الموضع offset"""
+    await run(_pwrite_all, fd, data, offset)
+
+
+async def preallocate(fd, size):
+    await run(_preallocate, fd, size)
+
+
+async def truncate(fd, size):
+    await run(os.ftruncate, fd, size)
+
+
+async def fsync(fd):
+    await run(os.fsync, fd)
+
+
+def delete(path):
+    """
+    حذف ملف دون انتظار: يُعاد تسميته فوراً (عملية سريعة لا تمس البيانات) فيصبح مساره متاحاً
+    لملف جديد، ثم يُحذف في المجمع لأن تحرير مساحة الملفات الكبيرة قد يستغرق وقتاً طويلاً.
+    تعيد Future لعملية الحذف، أو None إذا لم يكن الملف موجوداً
+    """
+    tombstone = f"{path}.{uuid.uuid4().hex}{TOMBSTONE_SUFFIX}"
+    try:
+        os.rename(path, tombstone)
+    except FileNotFoundError:
+        return None
+    future = executor().submit(_unlink, tombstone)
+    future.add_done_callback(_log_delete_failure)
+    return future
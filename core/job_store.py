@@ -0,0 +1,248 @@
+"""
+مخزن دائم لمهام التنزيل والرفع يسمح باستئنافها بعد إعادة التشغيل
+"""
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from config.config import JOBS_DB_PATH, JOBS_DB_BUSY_TIMEOUT
+from core.resumable_upload import upload_state_path
+
+logger = logging.getLogger(__name__)
+
+# مراحل المهمة
+STAGE_PENDING = 'pending'            # بانتظار البدء
+STAGE_STREAMING = 'streaming'        # نقل مباشر من تيليجرام إلى يوتيوب
+STAGE_DOWNLOADING = 'downloading'    # تنزيل إلى ملف مؤقت
+STAGE_UPLOADING = 'uploading'        # رفع الملف إلى يوتيوب
+STAGE_DONE = 'done'
+STAGE_FAILED = 'failed'
+STAGE_CANCELLED = 'cancelled'
+
+ACTIVE_STAGES = (STAGE_PENDING, STAGE_STREAMING, STAGE_DOWNLOADING, STAGE_UPLOADING)
+
+
+def upload_state_key(job_id):
+    """مفتاح ملف حالة جلسة الرفع الخاص بالمهمة (قد تشترك عدة مهام في نفس الملف)"""
+    return f"job{job_id}"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id INTEGER NOT NULL,
+    user_id INTEGER,
+    stage TEXT NOT NULL,
+    source TEXT NOT NULL,
+    title TEXT NOT NULL,
+    playlist_id TEXT,
+    file_path TEXT,
+    total_bytes INTEGER,
+    downloaded_bytes INTEGER NOT NULL DEFAULT 0,
+    upload_uri TEXT,
+    uploaded_bytes INTEGER NOT NULL DEFAULT 0,
+    video_url TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_stage ON jobs (stage);
+"""
+
+# أعمدة أضيفت بعد الإصدار الأول من الجدول (تُضاف لقواعد البيانات القديمة عند الفتح)
+_ADDED_COLUMNS = {
+    'media_key': 'TEXT',      # معرف مستند تيليجرام
+    'content_hash': 'TEXT',   # بصمة SHA-256 للمحتوى المنزل
+    'channel': 'TEXT',        # قناة يوتيوب المختارة (NULL للقناة الافتراضية)
+    'status_message_id': 'INTEGER',  # رسالة الحالة التي تحدثها العقدة المنفذة للمهمة
+    'lease_owner': 'TEXT',    # العقدة العاملة التي تنفذ المهمة حالياً
+    'lease_expires': 'REAL',  # انتهاء عقد المهمة ما لم تجدده العقدة بنبضات دورية
+    'not_before': 'REAL'      # لا تُسحب المهمة قبل هذا الوقت (تأجيل حتى تجديد الحصة)
+}
+
+class JobStore:
+    """
+    تخزين حالة كل مهمة في SQLite داخل DATA_DIR.
+    الدوال متزامنة؛ المستدعى منها داخل حلقة الأحداث في المسارات المتكررة (سحب المهام وتجديد العقود
+    وحفظ التقدم) يمر عبر run() أو submit() فلا يوقف انتظارُ قفل قاعدة البيانات الحلقة
+    """
+
+    def __init__(self, db_path=JOBS_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=JOBS_DB_BUSY_TIMEOUT, check_same_thread=False)
+        # خيط واحد يحفظ ترتيب الكتابات المرسلة دون انتظار
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='job-store')
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(_SCHEMA)
+            existing = {row['name'] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for name, column_type in _ADDED_COLUMNS.items():
+                if name not in existing:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {column_type}")
+
+    async def run(self, method, *args, **kwargs):
+        """تنفيذ دالة من دوال المخزن في خيطه وانتظار نتيجتها"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(method, *args, **kwargs)
+        )
+
+    def submit(self, method, *args, **kwargs):
+        """تنفيذ دالة من دوال المخزن في خيطه دون انتظار (يُسجل الخطأ فقط)"""
+        future = self._executor.submit(method, *args, **kwargs)
+        future.add_done_callback(self._log_failure)
+        return future
+
+    @staticmethod
+    def _log_failure(future):
+        if not future.cancelled() and future.exception():
+            logger.error(f"فشل في الكتابة في مخزن المهام: {str(future.exception())}")
+
+    @staticmethod
+    def _row_to_job(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job['source'] = json.loads(job['source'])
+        return job
+
+    def create(self, chat_id, user_id, source, title, playlist_id, file_path=None, stage=STAGE_PENDING, channel=None):
+        """إنشاء مهمة جديدة وإرجاع معرفها"""
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (chat_id, user_id, stage, source, title, playlist_id, file_path, channel, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (chat_id, user_id, stage, json.dumps(source), title, playlist_id, file_path, channel, now, now)
+            )
+        logger.info(f"تم تسجيل مهمة جديدة برقم {cursor.lastrowid}")
+        return cursor.lastrowid
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def update(self, job_id, **fields):
+        """تحديث حقول مهمة"""
+        if not fields:
+            return
+        fields['updated_at'] = time.time()
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def active_jobs(self):
+        """المهام التي لم تنتهِ بعد مرتبة حسب الأقدمية"""
+        placeholders = ', '.join('?' for _ in ACTIVE_STAGES)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM jobs WHERE stage IN ({placeholders}) ORDER BY id",
+                ACTIVE_STAGES
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def claim(self, owner, lease_seconds):
+        """
+        سحب أقدم مهمة نشطة غير محجوزة (أو انتهى عقدها) وحجزها للعقدة owner لمدة lease_seconds.
+        تعيد المهمة أو None. يتم السحب في معاملة تحجز قاعدة البيانات للكتابة فلا تسحب عقدتان نفس المهمة
+        """
+        now = time.time()
+        placeholders = ', '.join('?' for _ in ACTIVE_STAGES)
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute(
+                    f"SELECT * FROM jobs WHERE stage IN ({placeholders}) "
+                    "AND (lease_owner IS NULL OR lease_expires < ?) "
+                    "AND (not_before IS NULL OR not_before <= ?) ORDER BY id LIMIT 1",
+                    (*ACTIVE_STAGES, now, now)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET lease_owner = ?, lease_expires = ?, updated_at = ? WHERE id = ?",
+                        (owner, now + lease_seconds, now, row['id'])
+                    )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        if row is None:
+            return None
+        if row['lease_owner']:
+            logger.warning(f"انتهى عقد المهمة {row['id']} لدى العقدة {row['lease_owner']}، ستنفذها العقدة {owner}")
+        job = self._row_to_job(row)
+        job['lease_owner'] = owner
+        return job
+
+    def renew_lease(self, job_id, owner, lease_seconds):
+        """تجديد عقد المهمة؛ تعيد False إذا لم تعد المهمة محجوزة لهذه العقدة"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ?",
+                (time.time() + lease_seconds, job_id, owner)
+            )
+        return cursor.rowcount == 1
+
+    def release_lease(self, job_id, owner):
+        """إنهاء حجز المهمة لتتمكن أي عقدة من سحبها"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET lease_owner = NULL, lease_expires = NULL WHERE id = ? AND lease_owner = ?",
+                (job_id, owner)
+            )
+
+    def lease_counts(self):
+        """عدد المهام النشطة المحجوزة لكل عقدة عاملة (العقود السارية فقط)"""
+        placeholders = ', '.join('?' for _ in ACTIVE_STAGES)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT lease_owner, COUNT(*) FROM jobs WHERE stage IN ({placeholders}) "
+                "AND lease_owner IS NOT NULL AND lease_expires >= ? GROUP BY lease_owner",
+                (*ACTIVE_STAGES, time.time())
+            ).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def queue_position(self, job_id=None):
+        """
+        ترتيب المهمة بين المهام النشطة التي لم تسحبها أي عقدة بعد
+        (أو عدد هذه المهام جميعها إذا لم تُحدد مهمة)
+        """
+        placeholders = ', '.join('?' for _ in ACTIVE_STAGES)
+        query = (
+            f"SELECT COUNT(*) FROM jobs WHERE stage IN ({placeholders}) "
+            "AND (lease_owner IS NULL OR lease_expires < ?)"
+        )
+        params = [*ACTIVE_STAGES, time.time()]
+        if job_id is not None:
+            query += " AND id <= ?"
+            params.append(job_id)
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+        return row[0]
+
+    def active_chat_jobs(self, chat_id):
+        return [job for job in self.active_jobs() if job['chat_id'] == chat_id]
+
+    def active_files(self):
+        """مسارات الملفات المؤقتة (مع ملفات حالة الرفع) التي تستخدمها مهام لم تنتهِ"""
+        files = set()
+        for job in self.active_jobs():
+            if job['file_path']:
+                files.add(job['file_path'])
+                files.add(upload_state_path(job['file_path']))
+                files.add(upload_state_path(job['file_path'], upload_state_key(job['id'])))
+        return files
+
+    def close(self):
+        # إكمال الكتابات المعلقة قبل إغلاق الاتصال
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,165 @@
+"""
+ذاكرة تخزين للوسائط المنزلة مفهرسة بمعرف مستند تيليجرام، مع مشاركة التنزيلات الجارية
+"""
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+
+from config.config import MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_BYTES
+from core import file_io
+
+logger = logging.getLogger(__name__)
+
+_FILE_EXTENSION = '.mp4'
+_PARTIAL_SUFFIX = '.part'
+
+
+class MediaCache:
+    """
+    كل ملف يُنزّل مرة واحدة مهما تعددت المهام التي تطلبه: المهام المتزامنة تنتظر نفس التنزيل،
+    وكل مهمة تسجل نفسها كحاملة للملف حتى تنتهي منه. عند تجاوز الحجم الكلي max_bytes
+    تُحذف الملفات الأقدم استخداماً التي لا تحملها أي مهمة
+    """
+
+    def __init__(self, cache_dir=MEDIA_CACHE_DIR, max_bytes=MEDIA_CACHE_MAX_BYTES, keep_paths=()):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> حجم الملف المكتمل، بترتيب آخر استخدام
+        self._holders = {}             # key -> مجموعة المهام التي تستخدم الملف
+        self._inflight = {}            # key -> مهمة التنزيل الجارية
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan(set(keep_paths))
+
+    def _scan(self, keep_paths):
+        """تحميل الملفات المكتملة من تشغيل سابق وحذف التنزيلات الجزئية التي لا تخص مهمة نشطة"""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(file_io.TOMBSTONE_SUFFIX):
+                # ملف لم يكتمل حذفه قبل توقف البوت
+                file_io.delete(path)
+            elif name.endswith(_PARTIAL_SUFFIX):
+                if path[:-len(_PARTIAL_SUFFIX)] not in keep_paths:
+                    file_io.delete(path)
+                    logger.info(f"تم حذف تنزيل جزئي غير مستخدم: {name}")
+            elif name.endswith(_FILE_EXTENSION):
+                stat = os.stat(path)
+                files.append((stat.st_atime, name[:-len(_FILE_EXTENSION)], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+        if files:
+            logger.info(f"ذاكرة الوسائط: {len(files)} ملف ({self.total_bytes() / (1024 * 1024):.1f} ميجابايت)")
+
+    @staticmethod
+    def media_key(message):
+        """مفتاح الوسائط في الذاكرة (معرف المستند)، أو None إذا لم تكن مستنداً"""
+        document = getattr(message, 'document', None)
+        return f"doc{document.id}" if document else None
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key + _FILE_EXTENSION)
+
+    def key_for_path(self, file_path):
+        """مفتاح الملف إذا كان ضمن مجلد الذاكرة، وإلا None"""
+        if not file_path or os.path.dirname(file_path) != self.cache_dir:
+            return None
+        name = os.path.basename(file_path)
+        return name[:-len(_FILE_EXTENSION)] if name.endswith(_FILE_EXTENSION) else None
+
+    def contains(self, key):
+        return key in self._entries and os.path.exists(self.path_for(key))
+
+    def is_downloading(self, key):
+        return key in self._inflight
+
+    def total_bytes(self):
+        return sum(self._entries.values())
+
+    async def acquire(self, key, download, holder):
+        """
+        إرجاع مسار الملف المكتمل بعد تسجيل holder كحامل له.
+        download(partial_path) دالة غير متزامنة تُستدعى مرة واحدة فقط إذا لم يكن الملف موجوداً،
+        وبقية الطلبات المتزامنة لنفس المفتاح تنتظر نفس التنزيل
+        """
+        self._holders.setdefault(key, set()).add(holder)
+        try:
+            if self.contains(key):
+                self._entries.move_to_end(key)
+                logger.info(f"استخدام الملف {key} من ذاكرة الوسائط")
+                return self.path_for(key)
+
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.create_task(self._fill(key, download))
+                self._inflight[key] = task
+            # shield: خروج إحدى المهام لا يلغي تنزيلاً تنتظره مهام أخرى
+            return await asyncio.shield(task)
+        except BaseException:
+            self._discard_holder(key, holder)
+            raise
+
+    def retain(self, file_path, holder):
+        """تسجيل holder كحامل لملف موجود في الذاكرة (عند استئناف المهام بعد إعادة التشغيل)"""
+        key = self.key_for_path(file_path)
+        if key is None:
+            return False
+        self._holders.setdefault(key, set()).add(holder)
+        return True
+
+    def release(self, file_path, holder):
+        """انتهاء استخدام holder للملف؛ يبقى الملف في الذاكرة حتى يُحذف عند تجاوز الحجم"""
+        key = self.key_for_path(file_path)
+        if key is None:
+            return False
+        self._discard_holder(key, holder)
+        self._evict()
+        return True
+
+    def _discard_holder(self, key, holder):
+        holders = self._holders.get(key)
+        if holders is None:
+            return
+        holders.discard(holder)
+        if not holders:
+            del self._holders[key]
+            # لم تعد أي مهمة تنتظر هذا التنزيل (يبقى الملف الجزئي للاستئناف)
+            task = self._inflight.get(key)
+            if task and not task.done():
+                task.cancel()
+
+    async def _fill(self, key, download):
+        path = self.path_for(key)
+        partial_path = path + _PARTIAL_SUFFIX
+        try:
+            await download(partial_path)
+            os.replace(partial_path, path)
+            self._entries[key] = os.path.getsize(path)
+            self._entries.move_to_end(key)
+            self._evict()
+            return path
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            file_io.delete(partial_path)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def _evict(self):
+        """حذف الملفات الأقدم استخداماً غير المحمولة حتى يعود الحجم ضمن الحد"""
+        total = self.total_bytes()
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if self._holders.get(key):
+                continue
+            size = self._entries.pop(key)
+            total -= size
+            try:
+                file_io.delete(self.path_for(key))
+                logger.info(f"تم حذف {key} من ذاكرة الوسائط ({size / (1024 * 1024):.1f} ميجابايت)")
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.error(f"فشل حذف {key} من ذاكرة الوسائط: {str(e)}")
@@ -0,0 +1,265 @@
+"""
+نسخ قنوات تيليجرام إلى يوتيوب: رفع الفيديوهات الجديدة تلقائياً عند نشرها واستدراك ما فات أثناء التوقف
+"""
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from telethon import events, utils
+
+from config.config import (
+    JOBS_DB_PATH,
+    JOBS_DB_BUSY_TIMEOUT,
+    MIRROR_CHANNELS,
+    MIRROR_TITLE_TEMPLATE,
+    MIRROR_CATCHUP_INTERVAL,
+    MIRROR_CATCHUP_EMPTY_WINDOWS
+)
+from core.entity_cache import EntityCache
+from core.job_store import STAGE_PENDING
+from core.telegram_utils import GET_MESSAGES_BATCH
+from core.worker import ROLE_FRONTEND
+from core.youtube_utils import YOUTUBE_TITLE_MAX_LENGTH
+from utils.session_manager import SessionManager
+
+logger = logging.getLogger(__name__)
+
+# الحقول المتاحة في قوالب العناوين (بقيم تجريبية للتحقق من القالب عند التشغيل)
+_TITLE_FIELDS = {'caption': '', 'channel': '', 'message_id': 0, 'date': ''}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mirror_marks (
+    channel TEXT PRIMARY KEY,
+    last_message_id INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class MirrorMarks:
+    """
+    آخر رسالة عولجت في كل قناة منسوخة (لا تتراجع أبداً).
+    معالجة الرسائل داخل حلقة الأحداث تقرأ العلامات وتكتبها عبر run()
+    """
+
+    def __init__(self, db_path=JOBS_DB_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=JOBS_DB_BUSY_TIMEOUT, check_same_thread=False)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mirror-marks')
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(_SCHEMA)
+
+    async def run(self, method, *args, **kwargs):
+        """تنفيذ دالة من دوال العلامات في خيطها وانتظار نتيجتها"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(method, *args, **kwargs)
+        )
+
+    def get(self, channel):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_message_id FROM mirror_marks WHERE channel = ?", (channel,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def advance(self, channel, message_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO mirror_marks (channel, last_message_id, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(channel) DO UPDATE SET "
+                "last_message_id = MAX(last_message_id, excluded.last_message_id), updated_at = excluded.updated_at",
+                (channel, message_id, time.time())
+            )
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._conn.close()
+
+
+class ChannelMirror:
+    """
+    تستمع لأحداث NewMessage في قنوات MIRROR_CHANNELS وتنشئ مهمة رفع لكل فيديو جديد بقائمة التشغيل
+    والعنوان المحددين في قواعد القناة. الرسائل المنشورة أثناء التوقف (أو التي فاتت أحداثها) تُستدرك
+    من آخر رسالة عولجت بطلبات مجمعة عند التشغيل وكل MIRROR_CATCHUP_INTERVAL.
+    القناة الجديدة تبدأ من أول رسالة تُنشر بعد إضافتها، أو من الرسالة 'since' في قواعدها
+    """
+
+    def __init__(self, bot, subscriptions=MIRROR_CHANNELS):
+        self.bot = bot
+        self.downloader = bot.telegram_downloader
+        self.rules = {EntityCache.normalize(name): rules or {} for name, rules in subscriptions.items()}
+        self.marks = MirrorMarks()
+        self._peers = {}  # معرف القناة -> اسمها
+        self._locks = {}  # معالجة رسائل كل قناة بالترتيب (الأحداث والاستدراك)
+        self._event = None
+        self._task = None
+
+    async def start(self):
+        """حل القنوات وتسجيل معالج الأحداث وتشغيل الاستدراك الدوري"""
+        if not self.rules or self._task:
+            return
+        if not await self.downloader.start():
+            logger.error("تعذر تشغيل نسخ القنوات: فشل في الاتصال بـ Telegram")
+            return
+        for name in self.rules:
+            template = self.rules[name].get('title') or MIRROR_TITLE_TEMPLATE
+            try:
+                template.format(**_TITLE_FIELDS)
+            except (KeyError, IndexError, ValueError, AttributeError) as e:
+                # قالب لا يمكن تنسيقه يوقف تقدم القناة عند أول فيديو
+                logger.error(f"قالب العنوان غير صالح للقناة المنسوخة {name} ({template!r}): {str(e)}")
+                continue
+            try:
+                peer = await self.downloader.resolve_peer(name)
+            except Exception as e:
+                logger.error(f"تعذر الوصول إلى القناة المنسوخة {name}: {str(e)}")
+                continue
+            self._peers[utils.get_peer_id(peer)] = name
+            self._locks[name] = asyncio.Lock()
+        if not self._peers:
+            return
+
+        self._event = events.NewMessage(chats=list(self._peers))
+        self.downloader.client.add_event_handler(self._on_new_message, self._event)
+        self._task = asyncio.create_task(self._catchup_loop())
+        logger.info(f"تم تشغيل نسخ {len(self._peers)} قناة: {', '.join(self._peers.values())}")
+
+    async def stop(self):
+        if self._event:
+            self.downloader.client.remove_event_handler(self._on_new_message, self._event)
+            self._event = None
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.marks.close()
+
+    def snapshot(self):
+        """آخر رسالة عولجت لكل قناة منسوخة"""
+        return {name: self.marks.get(name) for name in self.rules}
+
+    async def _on_new_message(self, event):
+        name = self._peers.get(event.chat_id)
+        if name is None:
+            return
+        try:
+            await self._advance(name, event.message)
+        except Exception as e:
+            logger.error(f"فشل في معالجة رسالة جديدة من {name}: {str(e)}")
+
+    async def _catchup_loop(self):
+        while True:
+            for name in self._locks:
+                try:
+                    await self._advance(name)
+                except Exception as e:
+                    logger.error(f"فشل في استدراك رسائل {name}: {str(e)}")
+            await asyncio.sleep(MIRROR_CATCHUP_INTERVAL)
+
+    async def _advance(self, name, latest=None):
+        """
+        معالجة رسائل القناة بعد آخر رسالة عولجت حتى latest (رسالة الحدث الجديد)، أو حتى أحدث
+        رسالة في القناة عند الاستدراك الدوري. الرسائل تُجلب GET_MESSAGES_BATCH رسالة في كل طلب،
+        والأرقام الناقصة قبل آخر رسالة وُجدت رسائل محذوفة.
+        حسابات البوتات لا تستطيع قراءة سجل القناة (messages.getHistory) لمعرفة أحدث رسالة، لذا
+        يتقدم الاستدراك نافذة بعد نافذة ويتوقف بعد MIRROR_CATCHUP_EMPTY_WINDOWS نافذة متتالية خالية
+        """
+        async with self._locks[name]:
+            mark = await self.marks.run(self.marks.get, name)
+            if mark is None:
+                since = self.rules[name].get('since')
+                if since:
+                    mark = since - 1
+                elif latest is not None:
+                    mark = latest.id - 1
+                else:
+                    return
+
+            peer = None
+            start = mark + 1
+            empty_windows = 0
+            while True:
+                if latest is not None:
+                    if start > latest.id:
+                        break
+                    end = min(start + GET_MESSAGES_BATCH - 1, latest.id)
+                elif empty_windows >= MIRROR_CATCHUP_EMPTY_WINDOWS:
+                    # لا رسائل بعد آخر رسالة وُجدت؛ أرقام النوافذ الخالية قد تأخذها رسائل قادمة
+                    break
+                else:
+                    end = start + GET_MESSAGES_BATCH - 1
+                # رسالة الحدث نفسه لا تحتاج طلباً
+                fetch_end = end - 1 if latest is not None and end == latest.id else end
+                messages = []
+                if fetch_end >= start:
+                    peer = peer or await self.downloader.resolve_peer(name)
+                    messages = await self.downloader.fetch_messages(peer, list(range(start, fetch_end + 1)))
+                if fetch_end < end:
+                    messages.append(latest)
+                if latest is None and not messages:
+                    # فجوة من الرسائل المحذوفة لا تعني نهاية القناة
+                    empty_windows += 1
+                    start = end + 1
+                    continue
+                empty_windows = 0
+
+                for message in sorted(messages, key=lambda message: message.id):
+                    if self.downloader.is_video(message) and not await self._create_job(name, message):
+                        # تُستأنف المعالجة من هذه الرسالة في الاستدراك التالي
+                        return
+                    await self.marks.run(self.marks.advance, name, message.id)
+                if latest is not None:
+                    # الأرقام الناقصة حتى رسالة الحدث رسائل محذوفة
+                    await self.marks.run(self.marks.advance, name, end)
+                start = end + 1
+
+    def title_for(self, name, message):
+        """عنوان الفيديو من قالب قواعد القناة (أو MIRROR_TITLE_TEMPLATE)"""
+        lines = [line.strip() for line in (message.message or '').splitlines() if line.strip()]
+        template = self.rules[name].get('title') or MIRROR_TITLE_TEMPLATE
+        title = template.format(
+            caption=lines[0] if lines else '',
+            channel=name,
+            message_id=message.id,
+            date=message.date.strftime('%Y-%m-%d') if message.date else ''
+        ).strip()
+        return (title or f"{name} {message.id}")[:YOUTUBE_TITLE_MAX_LENGTH]
+
+    async def _youtube_ready(self):
+        """الواجهة تسجل المهام للعقد العاملة؛ العملية الواحدة تحتاج اتصال يوتيوب لتنفيذها"""
+        if self.bot.role == ROLE_FRONTEND or self.bot.youtube_initialized:
+            return True
+        return bool(SessionManager.list_channels()) and await self.bot.initialize_youtube()
+
+    async def _create_job(self, name, message):
+        """
+        تسجيل مهمة رفع للفيديو حسب قواعد القناة.
+        تعيد False إذا لم يُعين المسؤول أو لم تكتمل المصادقة مع يوتيوب بعد
+        """
+        rules = self.rules[name]
+        chat_id = rules.get('chat_id') or SessionManager.get_admin_chat_id()
+        if chat_id is None or not await self._youtube_ready():
+            logger.warning(f"نسخ القناة {name} متوقف حتى تعيين المسؤول والمصادقة مع يوتيوب")
+            return False
+
+        link_info = {'type': 'public', 'channel_username': name, 'message_id': message.id}
+        job_id = await self.bot.jobs.run(
+            self.bot.jobs.create,
+            chat_id=chat_id,
+            user_id=None,
+            source={'type': 'link', 'link_info': link_info},
+            title=self.title_for(name, message),
+            playlist_id=rules.get('playlist_id'),
+            file_path=self.downloader.get_link_file_path(link_info),
+            stage=STAGE_PENDING,
+            channel=rules.get('channel')
+        )
+        logger.info(f"نسخ القناة {name}: المهمة {job_id} للرسالة {message.id}")
+        await self.bot._enqueue_job(await self.bot.jobs.run(self.bot.jobs.get, job_id))
+        return True
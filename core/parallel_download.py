@@ -0,0 +1,209 @@
+"""
+تنزيل متوازٍ للملفات الكبيرة من تيليجرام عبر عدة اتصالات MTProto
+"""
+import os
+import copy
+import math
+import time
+import asyncio
+import inspect
+import logging
+
+from telethon import utils
+from telethon.network import MTProtoSender
+from telethon.tl.alltlobjects import LAYER
+from telethon.tl.functions import InvokeWithLayerRequest
+from telethon.tl.functions.auth import ExportAuthorizationRequest, ImportAuthorizationRequest
+from telethon.tl.functions.upload import GetFileRequest
+
+from config.config import (
+    DOWNLOAD_CONNECTIONS_PER_FILE,
+    DOWNLOAD_GLOBAL_CONNECTIONS,
+    MAX_RETRIES
+)
+from core.autotune import download_tuner
+from core import file_io
+from utils.retry import circuit_breaker, classify_error, retry_async, RETRYABLE
+
+logger = logging.getLogger(__name__)
+
+# قيود upload.getFile: الحد من مضاعفات 4KB ويقسم 1MB بدون باقٍ
+_MAX_PART_SIZE = 1024 * 1024
+_PART_ALIGNMENT = 4096
+
+
+class ParallelDownloader:
+    """تنزيل ملف واحد على شكل أجزاء متوازية عبر عدة مرسلين على مركز بيانات الملف"""
+
+    # حد عام لعدد طلبات الأجزاء المتزامنة عبر جميع التنزيلات
+    _global_slots = None
+
+    def __init__(self, client, connections=DOWNLOAD_CONNECTIONS_PER_FILE, part_size=None):
+        self.client = client
+        self.connections = max(1, connections)
+        # حجم الجزء يُختار عند بدء كل تنزيل من الضابط التلقائي ما لم يُحدد صراحة
+        # (يبقى ثابتاً طوال التنزيل لأن مواضع الاستئناف محسوبة بأرقام الأجزاء)
+        self._tuner = download_tuner()
+        if part_size is None:
+            part_size = self._tuner.chunk_size
+        if part_size % _PART_ALIGNMENT or _MAX_PART_SIZE % part_size:
+            logger.warning(f"حجم الجزء {part_size} غير متوافق مع upload.getFile، سيتم استخدام 1MB")
+            part_size = _MAX_PART_SIZE
+        self.part_size = part_size
+
+    @classmethod
+    def _slots(cls):
+        if cls._global_slots is None:
+            cls._global_slots = asyncio.Semaphore(DOWNLOAD_GLOBAL_CONNECTIONS)
+        return cls._global_slots
+
+    async def _create_sender(self, dc_id, auth_key):
+        """إنشاء مرسل MTProto جديد على مركز البيانات المطلوب"""
+        client = self.client
+        dc = await client._get_dc(dc_id)
+        sender = MTProtoSender(auth_key, loggers=client._log)
+        await sender.connect(client._connection(
+            dc.ip_address,
+            dc.port,
+            dc.id,
+            loggers=client._log,
+            proxy=client._proxy
+        ))
+
+        if not auth_key:
+            # مركز بيانات مختلف عن مركز الجلسة: تصدير التفويض واستيراده على الاتصال الجديد
+            auth = await client(ExportAuthorizationRequest(dc_id))
+            init_request = copy.copy(client._init_request)
+            init_request.query = ImportAuthorizationRequest(id=auth.id, bytes=auth.bytes)
+            await sender.send(InvokeWithLayerRequest(LAYER, init_request))
+
+        return sender
+
+    async def _create_senders(self, dc_id, count):
+        session = self.client.session
+        auth_key = session.auth_key if dc_id == session.dc_id else None
+
+        # المرسل الأول يحصل على مفتاح التفويض، والبقية يعيدون استخدامه
+        first = await self._create_sender(dc_id, auth_key)
+        others = await asyncio.gather(
+            *(self._create_sender(dc_id, first.auth_key) for _ in range(count - 1)),
+            return_exceptions=True
+        )
+
+        senders = [first]
+        for sender in others:
+            if isinstance(sender, Exception):
+                logger.warning(f"تعذر فتح اتصال تنزيل إضافي: {str(sender)}")
+            else:
+                senders.append(sender)
+        return senders
+
+    async def _fetch_part(self, sender, location, offset, breaker):
+        """طلب جزء واحد مع احترام FloodWait وإعادة المحاولة عند الأخطاء العابرة"""
+        async def request():
+            async with self._slots():
+                started = time.monotonic()
+                try:
+                    result = await sender.send(GetFileRequest(location, offset=offset, limit=self.part_size))
+                except Exception as e:
+                    if classify_error(e) == RETRYABLE:
+                        self._tuner.record_error()
+                    raise
+                self._tuner.record(len(result.bytes), time.monotonic() - started)
+            return result.bytes
+
+        return await retry_async(
+            request,
+            f"تنزيل الجزء عند {offset}",
+            max_attempts=MAX_RETRIES,
+            breaker=breaker
+        )
+
+    async def _worker(self, sender, location, parts, fd, file_size, state, progress_callback, offset_callback, breaker):
+        while True:
+            try:
+                index = parts.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            offset = index * self.part_size
+            data = await self._fetch_part(sender, location, offset, breaker)
+            await file_io.pwrite(fd, data, offset)
+
+            state['downloaded'] += len(data)
+            if progress_callback:
+                result = progress_callback(state['downloaded'], file_size)
+                if inspect.isawaitable(result):
+                    await result
+
+            # تقدم الحد المتصل من البداية هو الموضع الآمن للاستئناف لاحقاً
+            state['done'].add(index)
+            advanced = False
+            while state['committed'] in state['done']:
+                state['done'].remove(state['committed'])
+                state['committed'] += 1
+                advanced = True
+            if advanced and offset_callback:
+                offset_callback(min(state['committed'] * self.part_size, file_size))
+
+    async def download(self, media, file_path, file_size, progress_callback=None, start_offset=0, offset_callback=None):
+        """
+        تنزيل الوسائط إلى file_path وإرجاع المسار.
+        start_offset: موضع مؤكد سابقاً لاستئناف تنزيل منقطع،
+        offset_callback: تُستدعى بالموضع المتصل المكتمل كلما تقدم
+        """
+        dc_id, location = utils.get_input_location(media)
+        part_count = math.ceil(file_size / self.part_size)
+        first_part = min(start_offset // self.part_size, part_count)
+        connections = max(1, min(self.connections, part_count - first_part))
+
+        parts = asyncio.Queue()
+        for index in range(first_part, part_count):
+            parts.put_nowait(index)
+
+        if first_part:
+            logger.info(f"استئناف التنزيل المتوازي من الجزء {first_part}")
+        logger.info(
+            f"تنزيل متوازٍ: {part_count - first_part} جزء عبر {connections} اتصال على مركز البيانات {dc_id}"
+        )
+
+        # بدون O_TRUNC للإبقاء على الأجزاء المنزلة سابقاً
+        fd = await file_io.open_file(file_path)
+        senders = []
+        try:
+            await file_io.preallocate(fd, file_size)
+            if first_part < part_count:
+                senders = await self._create_senders(dc_id, connections)
+
+            state = {
+                'downloaded': first_part * self.part_size,
+                'committed': first_part,
+                'done': set()
+            }
+            # قاطع مشترك لكل مركز بيانات بين جميع التنزيلات المتوازية
+            breaker = circuit_breaker(f'telegram.dc{dc_id}')
+            workers = [
+                asyncio.create_task(
+                    self._worker(sender, location, parts, fd, file_size, state, progress_callback, offset_callback, breaker)
+                )
+                for sender in senders
+            ]
+            try:
+                await asyncio.gather(*workers)
+            except BaseException:
+                for worker in workers:
+                    worker.cancel()
+                raise
+
+            # إزالة أي مساحة زائدة حجزت مسبقاً والتأكد من وصول البيانات إلى القرص
+            await file_io.truncate(fd, file_size)
+            await file_io.fsync(fd)
+            return file_path
+
+        finally:
+            os.close(fd)
+            for sender in senders:
+                try:
+                    await sender.disconnect()
+                except Exception:
+                    pass
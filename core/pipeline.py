@@ -0,0 +1,50 @@
+"""
+خط نقل مباشر من تنزيل تيليجرام إلى رفع يوتيوب عبر مخزن مؤقت محدود
+"""
+import asyncio
+import logging
+
+from config.config import PIPELINE_BUFFER_CHUNKS
+
+logger = logging.getLogger(__name__)
+
+# علامة نهاية البث داخل الطابور
+_END_OF_STREAM = object()
+
+
+async def buffered(source, max_chunks=PIPELINE_BUFFER_CHUNKS):
+    """
+    تشغيل مصدر الأجزاء في مهمة مستقلة وتمرير مخرجاته عبر طابور محدود،
+    بحيث يتقدم التنزيل والرفع بالتوازي ولا يتجاوز الاستهلاك max_chunks جزءاً
+    """
+    queue = asyncio.Queue(maxsize=max_chunks)
+
+    async def produce():
+        try:
+            async for chunk in source:
+                await queue.put(chunk)
+            await queue.put(_END_OF_STREAM)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put(e)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _END_OF_STREAM:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # إيقاف التنزيل إذا توقف الرفع قبل اكتمال البث
+        if not producer.done():
+            producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.debug(f"تجاهل خطأ من مهمة التنزيل بعد إيقافها: {str(e)}")
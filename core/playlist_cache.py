@@ -0,0 +1,87 @@
+"""
+ذاكرة مؤقتة لقوائم تشغيل يوتيوب لكل بيانات اعتماد، مع تحديث مسبق في الخلفية
+"""
+import time
+import asyncio
+import logging
+
+from config.config import PLAYLIST_CACHE_TTL, PLAYLIST_CACHE_REFRESH_AFTER
+
+logger = logging.getLogger(__name__)
+
+
+class PlaylistCache:
+    """
+    تُخدم القوائم من الذاكرة طالما لم تنتهِ صلاحيتها (ttl)، وبعد refresh_after ثانية
+    يبدأ تحديثها في الخلفية دون انتظار المستخدم. طلبات التحميل المتزامنة لنفس المفتاح
+    تنتظر عملية جلب واحدة، وأي فشل في الجلب يزيل المدخل من الذاكرة
+    """
+
+    def __init__(self, ttl=PLAYLIST_CACHE_TTL, refresh_after=PLAYLIST_CACHE_REFRESH_AFTER):
+        self.ttl = ttl
+        self.refresh_after = min(refresh_after, ttl)
+        self._entries = {}   # key -> (playlists, fetched_at)
+        self._inflight = {}  # key -> asyncio.Task
+
+    async def get(self, key, loader):
+        """إرجاع قوائم التشغيل للمفتاح؛ loader دالة غير متزامنة تجلب القائمة الكاملة"""
+        entry = self._entries.get(key)
+        if entry:
+            playlists, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                if age >= self.refresh_after:
+                    self._refresh_in_background(key, loader)
+                return playlists
+        return await self._load(key, loader)
+
+    def peek(self, key):
+        """القوائم المخزنة حالياً دون أي طلب إلى الشبكة (أو None)"""
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def find_title(self, key, playlist_id):
+        """البحث عن عنوان قائمة تشغيل في الذاكرة المؤقتة"""
+        for item_id, title in self.peek(key) or []:
+            if item_id == playlist_id:
+                return title
+        return None
+
+    def invalidate(self, key=None):
+        """إزالة مدخل واحد أو كل المدخلات"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def _load(self, key, loader):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, loader))
+            self._inflight[key] = task
+        # shield: إلغاء أحد المنتظرين لا يلغي الجلب المشترك
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key, loader):
+        try:
+            playlists = await loader()
+            self._entries[key] = (playlists, time.monotonic())
+            return playlists
+        except Exception:
+            self.invalidate(key)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def _refresh_in_background(self, key, loader):
+        if key in self._inflight:
+            return
+        logger.info("تحديث قوائم التشغيل في الخلفية")
+        task = asyncio.create_task(self._fetch(key, loader))
+        self._inflight[key] = task
+        task.add_done_callback(self._log_refresh_error)
+
+    @staticmethod
+    def _log_refresh_error(task):
+        if not task.cancelled() and task.exception():
+            logger.warning(f"فشل تحديث قوائم التشغيل في الخلفية: {str(task.exception())}")
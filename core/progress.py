@@ -0,0 +1,242 @@
+"""
+خدمة تحديث رسائل الحالة: تجميع تقدم النقل وتعديل الرسائل بمعدل محدود عام ولكل محادثة
+"""
+import time
+import asyncio
+import logging
+
+from telegram.error import RetryAfter
+
+from config.config import PROGRESS_GLOBAL_EDITS_PER_SECOND, PROGRESS_CHAT_EDITS_PER_MINUTE
+
+logger = logging.getLogger(__name__)
+
+# عدد التعديلات المسموح بها دفعة واحدة في المحادثة قبل تطبيق المعدل
+_CHAT_BURST = 3
+
+# تُنسى المحادثة بعد هذه المدة دون تعديلات (دلوها ممتلئ حينها فلا يختلف عن دلو جديد)
+_CHAT_IDLE_SECONDS = 600
+
+
+def _retry_after_seconds(error):
+    """مدة الانتظار في RetryAfter (رقم أو timedelta حسب إصدار المكتبة)"""
+    value = error.retry_after
+    return value.total_seconds() if hasattr(value, 'total_seconds') else float(value)
+
+
+class TokenBucket:
+    """دلو رموز: rate رمز في الثانية بسعة capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, now=None):
+        """الثواني المتبقية حتى توفر رمز"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+        return max(wait, self._paused_until - now)
+
+    def take(self):
+        self._tokens -= 1
+
+    def pause(self, seconds):
+        """إيقاف الدلو بعد أن طلب تيليجرام الانتظار (RetryAfter)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+
+class _Chat:
+    def __init__(self):
+        self.bucket = TokenBucket(PROGRESS_CHAT_EDITS_PER_MINUTE / 60, _CHAT_BURST)
+        # تعديلات رسائل المحادثة تُرسل بالترتيب فلا يطغى تقدم قديم على حالة أحدث
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class ProgressService:
+    """
+    عمليات النقل تسجل تقدمها عبر report() دون انتظار، ومهمة واحدة تحول آخر حالة لكل رسالة
+    إلى تعديل عندما يسمح الحد العام وحد المحادثة (الحالات الوسيطة التي لم تُعرض تُهمل).
+    تعديلات الحالة الأخرى تمر عبر edit() بنفس الحدود وتلغي التقدم المعلق للرسالة.
+    التعديلات كلها بأفضل جهد: فشل تعديل رسالة (حُذفت مثلاً) يُسجل ولا يوقف المهمة
+    """
+
+    def __init__(self, global_rate=PROGRESS_GLOBAL_EDITS_PER_SECOND):
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats = {}
+        self._pending = {}  # (chat_id, message_id) -> (الرسالة، النص)
+        self._shown = {}    # آخر نص تقدم عُرض لكل رسالة
+        self._last_sweep = time.monotonic()
+        self._wakeup = None
+        self._task = None
+
+    def start(self):
+        """تشغيل مهمة التعديل (يجب استدعاؤها من داخل حلقة الأحداث)"""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    @staticmethod
+    def _key(msg):
+        return msg.chat_id, msg.message_id
+
+    def _chat(self, chat_id):
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            self._expire_idle_chats()
+            chat = self._chats[chat_id] = _Chat()
+        return chat
+
+    def _expire_idle_chats(self):
+        """نسيان المحادثات التي لم تُعدل رسائلها منذ _CHAT_IDLE_SECONDS مع آخر تقدم عُرض فيها"""
+        now = time.monotonic()
+        if now - self._last_sweep < _CHAT_IDLE_SECONDS:
+            return
+        self._last_sweep = now
+        pending_chats = {key[0] for key in self._pending}
+        idle = {
+            chat_id for chat_id, chat in self._chats.items()
+            if now - chat.last_used >= _CHAT_IDLE_SECONDS and not chat.lock.locked() and chat_id not in pending_chats
+        }
+        for chat_id in idle:
+            del self._chats[chat_id]
+        for key in [key for key in self._shown if key[0] not in self._chats]:
+            del self._shown[key]
+
+    def forget(self, msg):
+        """إنهاء تتبع رسالة حالة بعد انتهاء مهمتها (يلغي أي تقدم متأخر لم يُعرض)"""
+        key = self._key(msg)
+        self._pending.pop(key, None)
+        self._shown.pop(key, None)
+
+    def report(self, msg, text):
+        """تسجيل آخر حالة تقدم للرسالة (تستبدل أي حالة لم تُعرض بعد)"""
+        key = self._key(msg)
+        if self._shown.get(key) == text:
+            self._pending.pop(key, None)
+            return
+        self._pending[key] = (msg, text)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def tracker(self, msg, text):
+        """دالة تقدم للتنزيل أو الرفع تعرض النسبة المئوية بعد النص"""
+        async def progress_callback(current, total):
+            if total:
+                self.report(msg, f"{text} {int(current * 100 / total)}%")
+        return progress_callback
+
+    async def edit(self, msg, text, **kwargs):
+        """
+        تعديل رسالة الحالة فوراً ضمن حدود المعدل (مع إلغاء التقدم المعلق لها).
+        تعيد الرسالة المعدلة، أو None إذا فشل التعديل
+        """
+        key = self._key(msg)
+        chat = self._chat(key[0])
+        self._pending.pop(key, None)
+        async with chat.lock:
+            while True:
+                await self._acquire(chat)
+                # تقدم سُجل أثناء الانتظار أقدم من هذه الحالة
+                self._pending.pop(key, None)
+                try:
+                    result = await msg.edit_text(text, **kwargs)
+                except RetryAfter as e:
+                    self._global.pause(_retry_after_seconds(e))
+                    continue
+                except Exception as e:
+                    # حُذفت الرسالة أو لم يتغير نصها مثلاً: لا فائدة من تتبعها
+                    logger.warning(f"تعذر تعديل رسالة الحالة {key[1]} في المحادثة {key[0]}: {str(e)}")
+                    self.forget(msg)
+                    return None
+                finally:
+                    # التقدم المعلق لمحادثات أخرى ينتظر انتهاء هذا التعديل
+                    if self._pending and self._wakeup is not None:
+                        self._wakeup.set()
+                self._shown.pop(key, None)
+                return result
+
+    async def _acquire(self, chat):
+        while True:
+            wait = max(self._global.wait_time(), chat.bucket.wait_time())
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        self._global.take()
+        chat.bucket.take()
+        chat.last_used = time.monotonic()
+
+    def _next_ready(self):
+        """
+        أقدم رسالة تسمح محادثتها بالتعديل الآن، أو (None، مدة الانتظار أو None حتى الإيقاظ).
+        المحادثات التي يجري فيها تعديل حالة تُتخطى حتى لا يُعرض تقدم قديم بعد حالة أحدث
+        """
+        now = time.monotonic()
+        wait = None
+        for key in self._pending:
+            chat = self._chat(key[0])
+            if chat.lock.locked():
+                continue
+            chat_wait = chat.bucket.wait_time(now)
+            if chat_wait <= 0:
+                return key, 0.0
+            wait = chat_wait if wait is None else min(wait, chat_wait)
+        return None, wait
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            global_wait = self._global.wait_time()
+            key, chat_wait = self._next_ready()
+            wait = None if chat_wait is None else max(global_wait, chat_wait)
+            if key is None or wait > 0:
+                # تقدم جديد قد يكون لمحادثة متاحة، لذا يوقظنا قبل انتهاء المدة
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            msg, text = self._pending.pop(key)
+            chat = self._chat(key[0])
+            # القفل غير مشغول فيُحجز دون انتظار، وأي تعديل حالة لاحق ينتظر انتهاء هذا التعديل
+            async with chat.lock:
+                self._global.take()
+                chat.bucket.take()
+                chat.last_used = time.monotonic()
+                try:
+                    await msg.edit_text(text)
+                    self._shown[key] = text
+                except RetryAfter as e:
+                    seconds = _retry_after_seconds(e)
+                    logger.warning(f"تيليجرام طلب إيقاف تعديل الرسائل لمدة {seconds:.0f} ث")
+                    self._global.pause(seconds)
+                    # إعادة الحالة ما لم تُسجل حالة أحدث
+                    self._pending.setdefault(key, (msg, text))
+                except Exception as e:
+                    logger.warning(f"تعذر تعديل رسالة التقدم {key[1]} في المحادثة {key[0]}: {str(e)}")
+                    self.forget(msg)
@@ -0,0 +1,165 @@
+"""
+سجل دائم لاستهلاك حصة YouTube Data API اليومية مع قبول المهام أو تأجيلها قبل تنزيلها
+"""
+import time
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from config.config import JOBS_DB_PATH, JOBS_DB_BUSY_TIMEOUT, YOUTUBE_DAILY_QUOTA, DEFAULT_YOUTUBE_CHANNEL
+from utils.session_manager import SessionManager
+
+logger = logging.getLogger(__name__)
+
+try:
+    from zoneinfo import ZoneInfo
+    _PACIFIC = ZoneInfo('America/Los_Angeles')
+except Exception:  # لا تتوفر قاعدة المناطق الزمنية
+    _PACIFIC = timezone(timedelta(hours=-8))
+
+# تكلفة كل عملية بالوحدات حسب توثيق YouTube Data API
+QUOTA_COSTS = {
+    'videos.insert': 1600,
+    'videos.list': 1,
+    'playlistItems.insert': 50,
+    'playlists.list': 1
+}
+
+# قرارات القبول
+ADMIT = 'admit'
+DEFER = 'defer'
+REJECT = 'reject'
+
+# عمود channel يحمل معرف مشروع Google الذي تُحسب عليه الحصة
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quota_usage (
+    channel TEXT NOT NULL,
+    day TEXT NOT NULL,
+    used INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (channel, day)
+);
+"""
+
+
+def _pacific_now():
+    return datetime.now(_PACIFIC)
+
+
+def seconds_until_reset():
+    """الثواني المتبقية حتى منتصف الليل بتوقيت المحيط الهادئ (موعد تجديد الحصة)"""
+    now = _pacific_now()
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(0.0, (tomorrow - now).total_seconds())
+
+
+class QuotaLedger:
+    """
+    يُسجل استهلاك كل يوم (بتوقيت المحيط الهادئ) في قاعدة بيانات المهام، ويحجز للمهام المقبولة
+    الوحدات التي ستحتاجها حتى لا تُقبل مهام أكثر مما تسمح به الحصة المتبقية.
+    تسجيل الاستهلاك من حلقة الأحداث يمر عبر submit() فلا يوقف انتظارُ قفل قاعدة البيانات الحلقة
+    """
+
+    def __init__(self, db_path=JOBS_DB_PATH, daily_limit=YOUTUBE_DAILY_QUOTA, project=None):
+        self.daily_limit = daily_limit
+        # يوتيوب يحسب الحصة لكل مشروع Google، فتتشارك القنوات التابعة لنفس المشروع سجلاً واحداً
+        self.project = project or SessionManager.project_id(DEFAULT_YOUTUBE_CHANNEL)
+        self._reservations = {}  # job_id -> الوحدات المتوقع استهلاكها
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=JOBS_DB_BUSY_TIMEOUT, check_same_thread=False)
+        # خيط واحد يحفظ ترتيب الكتابات المرسلة دون انتظار
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='quota')
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(_SCHEMA)
+
+    def submit(self, method, *args, **kwargs):
+        """تنفيذ دالة من دوال السجل في خيطه دون انتظار (يُسجل الخطأ فقط)"""
+        future = self._executor.submit(method, *args, **kwargs)
+        future.add_done_callback(self._log_failure)
+        return future
+
+    @staticmethod
+    def _log_failure(future):
+        if not future.cancelled() and future.exception():
+            logger.error(f"فشل في تسجيل استهلاك حصة يوتيوب: {str(future.exception())}")
+
+    @staticmethod
+    def _today():
+        return _pacific_now().date().isoformat()
+
+    def used(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT used FROM quota_usage WHERE channel = ? AND day = ?",
+                (self.project, self._today())
+            ).fetchone()
+        return row[0] if row else 0
+
+    def reserved(self):
+        return sum(self._reservations.values())
+
+    def remaining(self):
+        """الوحدات المتاحة اليوم بعد خصم المستهلك والمحجوز"""
+        return max(0, self.daily_limit - self.used() - self.reserved())
+
+    def charge(self, operation, units=None):
+        """تسجيل استهلاك عملية API (تُستدعى لكل طلب يُرسل إلى يوتيوب)"""
+        units = QUOTA_COSTS.get(operation, 1) if units is None else units
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO quota_usage (channel, day, used, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(channel, day) DO UPDATE SET used = used + excluded.used, updated_at = excluded.updated_at",
+                (self.project, self._today(), units, time.time())
+            )
+
+    def mark_exhausted(self):
+        """رد يوتيوب بنفاد الحصة: اعتبار حصة اليوم مستهلكة بالكامل"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO quota_usage (channel, day, used, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(channel, day) DO UPDATE SET used = MAX(used, excluded.used), updated_at = excluded.updated_at",
+                (self.project, self._today(), self.daily_limit, time.time())
+            )
+        logger.warning("نفدت حصة YouTube API لهذا اليوم")
+
+    def admit(self, job_id, units):
+        """
+        قبول مهمة تحتاج units وحدة وحجزها. تعيد (القرار، ثواني الانتظار):
+        ADMIT عند توفر الحصة، DEFER حتى تجديد الحصة، REJECT إذا تجاوزت الحد اليومي نفسه
+        """
+        if units > self.daily_limit:
+            return REJECT, 0
+        self._reservations.pop(job_id, None)
+        if units <= self.remaining():
+            self._reservations[job_id] = units
+            return ADMIT, 0
+        return DEFER, seconds_until_reset()
+
+    def consume(self, job_id, units):
+        """تخفيض حجز المهمة بعد تسجيل استهلاكها الفعلي"""
+        if job_id in self._reservations:
+            self._reservations[job_id] = max(0, self._reservations[job_id] - units)
+
+    def release(self, job_id):
+        """إلغاء ما تبقى من حجز المهمة عند انتهائها"""
+        self._reservations.pop(job_id, None)
+
+    def snapshot(self):
+        return {
+            'project': self.project,
+            'day': self._today(),
+            'limit': self.daily_limit,
+            'used': self.used(),
+            'reserved': self.reserved(),
+            'remaining': self.remaining(),
+            'reset_in': seconds_until_reset()
+        }
+
+    def close(self):
+        # تسجيل الاستهلاك المرسل قبل إغلاق الاتصال
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._conn.close()
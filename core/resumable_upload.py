@@ -0,0 +1,433 @@
+"""
+محرك رفع غير متزامن لبروتوكول الرفع القابل للاستئناف في YouTube Data API
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import aiohttp
+
+from config.config import (
+    YOUTUBE_UPLOAD_URL,
+    MAX_UPLOAD_RETRIES,
+    UPLOAD_STATE_SUFFIX,
+    UPLOAD_SESSION_MAX_AGE,
+    UPLOAD_BUFFER_SIZE
+)
+from core import file_io
+from core.autotune import UPLOAD_GRANULARITY, upload_tuner
+from utils.retry import Backoff, CircuitOpenError, circuit_breaker, classify_error, retry_async, AUTH, RETRYABLE
+
+logger = logging.getLogger(__name__)
+
+# يشترط البروتوكول أن يكون حجم كل جزء (عدا الأخير) من مضاعفات 256 كيلوبايت
+CHUNK_GRANULARITY = UPLOAD_GRANULARITY
+
+
+class ResumableUploadError(Exception):
+    """خطأ أثناء التعامل مع جلسة الرفع القابل للاستئناف"""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        # مدة الانتظار التي حددها الخادم في ترويسة Retry-After
+        self.retry_after = retry_after
+
+
+class SessionExpiredError(ResumableUploadError):
+    """انتهت صلاحية جلسة الرفع ويجب إنشاء جلسة جديدة"""
+
+
+class StreamUploadInterrupted(ResumableUploadError):
+    """انقطع الرفع المباشر ولم تعد البيانات المرسلة متاحة لإعادة إرسالها"""
+
+    def __init__(self, message, session_uri):
+        super().__init__(message)
+        # يمكن استكمال الجلسة نفسها لاحقاً من ملف كامل على القرص
+        self.session_uri = session_uri
+
+
+def upload_state_path(file_path, state_key=None):
+    """
+    مسار ملف حالة جلسة الرفع بجانب الملف؛ state_key يميز جلسات عدة مهام
+    ترفع نفس الملف (مثل الملفات المشتركة في ذاكرة الوسائط)
+    """
+    if state_key:
+        file_path = f"{file_path}.{state_key}"
+    return file_path + UPLOAD_STATE_SUFFIX
+
+
+def load_upload_state(file_path, total_size, state_key=None):
+    """قراءة رابط جلسة الرفع المحفوظ بجانب الملف إن كان صالحاً للاستكمال"""
+    state_path = upload_state_path(file_path, state_key)
+    if not os.path.exists(state_path):
+        return None
+    try:
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+    except Exception as e:
+        logger.warning(f"تعذر قراءة حالة جلسة الرفع المحفوظة: {str(e)}")
+        return None
+
+    if state.get('total_size') != total_size:
+        logger.warning("حجم الملف تغير منذ حفظ جلسة الرفع، سيتم تجاهلها")
+        return None
+    if time.time() - state.get('created_at', 0) > UPLOAD_SESSION_MAX_AGE:
+        logger.info("جلسة الرفع المحفوظة قديمة جداً، سيتم تجاهلها")
+        return None
+
+    logger.info(f"تم العثور على جلسة رفع محفوظة (آخر موضع مؤكد: {state.get('offset', 0)})")
+    return state.get('session_uri')
+
+
+def save_upload_state(file_path, session_uri, total_size, offset, state_key=None):
+    """حفظ رابط جلسة الرفع وآخر موضع مؤكد بجانب الملف المؤقت"""
+    state_path = upload_state_path(file_path, state_key)
+    created_at = time.time()
+    if os.path.exists(state_path):
+        try:
+            with open(state_path, 'r') as f:
+                previous = json.load(f)
+            if previous.get('session_uri') == session_uri:
+                created_at = previous.get('created_at', created_at)
+        except Exception:
+            pass
+
+    state = {
+        'session_uri': session_uri,
+        'total_size': total_size,
+        'offset': offset,
+        'created_at': created_at
+    }
+    # كتابة ذرية حتى لا يبقى ملف حالة تالف عند انقطاع العملية
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+
+def clear_upload_state(file_path, state_key=None):
+    """حذف حالة جلسة الرفع بعد اكتمالها أو انتهاء صلاحيتها"""
+    state_path = upload_state_path(file_path, state_key)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+
+
+class FileWindowSource:
+    """
+    مصدر أجزاء الرفع من ملف على القرص: يُبث كل جزء عبر نافذة قراءة ثابتة الحجم
+    بحيث لا تتجاوز الذاكرة المستخدمة لكل عملية رفع حجم النافذة مهما كبر حجم الجزء
+    """
+
+    def __init__(self, file_path, window_size=UPLOAD_BUFFER_SIZE):
+        self.file_path = file_path
+        self.window_size = window_size
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.file_path, os.O_RDONLY)
+        if hasattr(os, 'posix_fadvise'):
+            # قراءة تسلسلية: تمكين القراءة المسبقة في نواة النظام
+            os.posix_fadvise(self._fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    async def iter_range(self, start, end):
+        """بث البايتات من start حتى end (غير شامل) نافذةً بعد نافذة"""
+        loop = asyncio.get_running_loop()
+        position = start
+        while position < end:
+            length = min(self.window_size, end - position)
+            # os.pread يحرر GIL أثناء القراءة من القرص فلا تتوقف حلقة الأحداث
+            data = await loop.run_in_executor(None, os.pread, self._fd, length, position)
+            if not data:
+                raise ResumableUploadError(f"انتهى الملف قبل الموضع المتوقع ({position})")
+            position += len(data)
+            yield data
+
+
+class ResumableUploader:
+    """عميل aiohttp لرفع الملفات إلى videos.insert دون حجب حلقة الأحداث"""
+
+    def __init__(self, token_provider, upload_url=YOUTUBE_UPLOAD_URL, chunk_size=None, on_auth_error=None):
+        # token_provider: دالة غير متزامنة تعيد توكن وصول صالح،
+        # on_auth_error: دالة غير متزامنة تجدد التوكن عند رفض الخادم له (401)
+        self._token_provider = token_provider
+        self._on_auth_error = on_auth_error
+        # قاطع مشترك بين جميع عمليات الرفع حتى لا يتحول تعطل خادم الرفع إلى سيل من المحاولات
+        self._breaker = circuit_breaker('youtube.upload')
+        self.upload_url = upload_url
+        # chunk_size يثبت حجم الأجزاء؛ وإن لم يُمرر يُضبط تلقائياً بضابط مشترك بين عمليات الرفع
+        self._fixed_chunk_size = (
+            max(CHUNK_GRANULARITY, chunk_size // CHUNK_GRANULARITY * CHUNK_GRANULARITY) if chunk_size else None
+        )
+        self._tuner = upload_tuner()
+        self._session = None
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=300)
+            self._session = aiohttp.ClientSession(timeout=timeout)
+        return self._session
+
+    async def close(self):
+        """إغلاق جلسة HTTP المشتركة"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    @property
+    def chunk_size(self):
+        return self._fixed_chunk_size or self._tuner.chunk_size
+
+    async def _auth_headers(self):
+        token = await self._token_provider()
+        return {'Authorization': f'Bearer {token}'}
+
+    async def _with_retry(self, operation, description):
+        """تنفيذ طلب مفرد (إنشاء جلسة أو استعلام) وفق سياسة إعادة المحاولة المشتركة"""
+        return await retry_async(
+            operation,
+            description,
+            max_attempts=MAX_UPLOAD_RETRIES,
+            breaker=self._breaker,
+            on_auth_error=self._on_auth_error
+        )
+
+    async def create_session(self, body, total_size, mimetype='video/*'):
+        """إنشاء جلسة رفع جديدة وإرجاع رابطها (Location)"""
+        headers = await self._auth_headers()
+        headers.update({
+            'Content-Type': 'application/json; charset=UTF-8',
+            'X-Upload-Content-Length': str(total_size),
+            'X-Upload-Content-Type': mimetype
+        })
+        params = {'uploadType': 'resumable', 'part': ','.join(body.keys())}
+
+        session = await self._get_session()
+        async with session.post(self.upload_url, params=params, json=body, headers=headers) as resp:
+            if resp.status != 200:
+                text = await resp.text()
+                raise ResumableUploadError(
+                    f"فشل إنشاء جلسة الرفع ({resp.status}): {text[:200]}",
+                    resp.status,
+                    retry_after=resp.headers.get('Retry-After')
+                )
+            session_uri = resp.headers.get('Location')
+            if not session_uri:
+                raise ResumableUploadError("لم يُرجع الخادم رابط جلسة الرفع", resp.status)
+
+        logger.info("تم إنشاء جلسة رفع قابلة للاستئناف")
+        return session_uri
+
+    async def query_status(self, session_uri, total_size):
+        """الاستعلام عن آخر بايت أكّد الخادم استلامه"""
+        headers = await self._auth_headers()
+        headers.update({'Content-Range': f'bytes */{total_size}', 'Content-Length': '0'})
+
+        session = await self._get_session()
+        async with session.put(session_uri, headers=headers, allow_redirects=False) as resp:
+            return await self._parse_response(resp, total_size)
+
+    async def session_alive(self, session_uri, total_size):
+        """هل ما زالت جلسة الرفع المحفوظة صالحة للاستكمال (أو اكتمل رفعها)"""
+        try:
+            await self._with_retry(lambda: self.query_status(session_uri, total_size), "الاستعلام عن جلسة الرفع")
+        except SessionExpiredError:
+            return False
+        return True
+
+    async def _put_chunk(self, session_uri, data, start, length, total_size):
+        """إرسال جزء بطول length بدءاً من start؛ data قد تكون بايتات أو مصدراً غير متزامن"""
+        end = start + length - 1
+        headers = await self._auth_headers()
+        headers.update({
+            'Content-Range': f'bytes {start}-{end}/{total_size}',
+            'Content-Length': str(length)
+        })
+
+        session = await self._get_session()
+        async with session.put(session_uri, data=data, headers=headers, allow_redirects=False) as resp:
+            return await self._parse_response(resp, total_size)
+
+    async def _parse_response(self, resp, total_size):
+        """
+        تحويل رد الخادم إلى (الموضع المؤكد، جسم الرد عند الاكتمال).
+        308 هنا تعني "لم يكتمل الرفع" وليست إعادة توجيه، لذا تُرسل الطلبات مع allow_redirects=False
+        """
+        if resp.status in (200, 201):
+            return total_size, await resp.json(content_type=None)
+
+        if resp.status == 308:
+            # Range: bytes=0-N يعني أن الخادم استلم حتى البايت N
+            range_header = resp.headers.get('Range')
+            if not range_header:
+                return 0, None
+            return int(range_header.rsplit('-', 1)[1]) + 1, None
+
+        text = await resp.text()
+        if resp.status in (404, 410):
+            raise SessionExpiredError(f"انتهت صلاحية جلسة الرفع ({resp.status})", resp.status)
+        raise ResumableUploadError(
+            f"رد غير متوقع من خادم الرفع ({resp.status}): {text[:200]}",
+            resp.status,
+            retry_after=resp.headers.get('Retry-After')
+        )
+
+    async def upload_stream(self, chunks, total_size, body, progress_callback=None, session_callback=None):
+        """رفع محتوى يصل على شكل أجزاء متتالية في طلب واحد دون ملف وسيط"""
+        session_uri = await self._with_retry(lambda: self.create_session(body, total_size), "إنشاء جلسة الرفع")
+        if session_callback:
+            session_callback(session_uri)
+        sent = [0]
+
+        async def counted():
+            async for chunk in chunks:
+                sent[0] += len(chunk)
+                if progress_callback:
+                    await progress_callback(sent[0], total_size)
+                yield chunk
+
+            if sent[0] != total_size:
+                raise ResumableUploadError(f"حجم البيانات المستلمة ({sent[0]}) لا يطابق الحجم المتوقع ({total_size})")
+
+        headers = await self._auth_headers()
+        headers.update({
+            'Content-Range': f'bytes 0-{total_size - 1}/{total_size}',
+            'Content-Length': str(total_size)
+        })
+
+        try:
+            with self._breaker.guard():
+                session = await self._get_session()
+                async with session.put(session_uri, data=counted(), headers=headers, allow_redirects=False) as resp:
+                    offset, response = await self._parse_response(resp, total_size)
+        except Exception as e:
+            # البيانات التي أُرسلت لم تعد في الذاكرة، لذا نترك الاستكمال للمسار المعتمد على الملف
+            logger.warning(f"انقطع الرفع المباشر بعد {sent[0]} بايت: {str(e)}")
+            raise StreamUploadInterrupted(f"انقطع الرفع المباشر: {str(e)}", session_uri) from e
+
+        if response is None:
+            raise StreamUploadInterrupted(f"لم يكتمل الرفع المباشر (تم تأكيد {offset} بايت)", session_uri)
+
+        logger.info(f"اكتمل الرفع المباشر بنجاح! معرف الفيديو: {response['id']}")
+        return response
+
+    async def upload_file(self, file_path, body, progress_callback=None, session_uri=None, session_callback=None, state_key=None):
+        """
+        رفع ملف كامل عبر جلسة قابلة للاستئناف وإرجاع مورد الفيديو.
+        session_uri: جلسة سابقة يتم استكمالها من آخر بايت أكده الخادم،
+        وإن لم تُمرر تُستخدم الجلسة المحفوظة بجانب الملف من عملية سابقة إن وجدت.
+        session_callback: تُستدعى برابط الجلسة الجديدة فور إنشائها لحفظه،
+        state_key: يميز ملف حالة الجلسة عندما ترفع عدة مهام نفس الملف
+        """
+        total_size = os.path.getsize(file_path)
+
+        if not session_uri:
+            session_uri = await file_io.run(load_upload_state, file_path, total_size, state_key)
+
+        offset = 0
+        if session_uri:
+            # استكمال جلسة قائمة من آخر بايت أكده الخادم
+            try:
+                offset, response = await self._with_retry(
+                    lambda: self.query_status(session_uri, total_size),
+                    "الاستعلام عن جلسة الرفع"
+                )
+                if response is not None:
+                    await file_io.run(clear_upload_state, file_path, state_key)
+                    return response
+                logger.info(f"استكمال جلسة الرفع من البايت {offset}")
+            except SessionExpiredError:
+                logger.warning("انتهت صلاحية جلسة الرفع السابقة، سيتم إنشاء جلسة جديدة")
+                await file_io.run(clear_upload_state, file_path, state_key)
+                session_uri = None
+
+        if not session_uri:
+            session_uri = await self._with_retry(lambda: self.create_session(body, total_size), "إنشاء جلسة الرفع")
+            if session_callback:
+                session_callback(session_uri)
+
+        await file_io.run(save_upload_state, file_path, session_uri, total_size, offset, state_key)
+        response = await self._upload_from(file_path, session_uri, offset, total_size, progress_callback, state_key)
+        await file_io.run(clear_upload_state, file_path, state_key)
+        return response
+
+    async def _upload_from(self, file_path, session_uri, offset, total_size, progress_callback=None, state_key=None):
+        """
+        إرسال الملف جزءاً بعد جزء بدءاً من offset مع حفظ آخر موضع مؤكد.
+        بعد كل خطأ قابل لإعادة المحاولة يُنتظر تأخير أسي بارتعاش (أو المدة التي حددها الخادم)
+        ثم يُستعلم عن آخر موضع أكده الخادم ويُستكمل منه
+        """
+        retry = 0
+        auth_refreshed = False
+        backoff = Backoff()
+        with FileWindowSource(file_path) as source:
+            while True:
+                try:
+                    end = min(offset + self.chunk_size, total_size)
+                    started = time.monotonic()
+                    previous_offset = offset
+                    # القاطع يسجل نتيجة الطلب أياً كانت، ويحرر طلب الاختبار إذا أُلغي الرفع
+                    with self._breaker.guard():
+                        offset, response = await self._put_chunk(
+                            session_uri,
+                            source.iter_range(offset, end),
+                            offset,
+                            end - offset,
+                            total_size
+                        )
+                    self._tuner.record(offset - previous_offset, time.monotonic() - started)
+                    retry = 0
+                    backoff.reset()
+
+                    if response is not None:
+                        logger.info(f"اكتمل الرفع بنجاح! معرف الفيديو: {response['id']}")
+                        return response
+
+                    # كتابة ملف الحالة في مجمع خيوط الملفات لا في حلقة الأحداث بعد كل جزء
+                    await file_io.run(save_upload_state, file_path, session_uri, total_size, offset, state_key)
+                    logger.info(f"تقدم الرفع: {int(offset * 100 / total_size)}%")
+                    if progress_callback:
+                        await progress_callback(offset, total_size)
+
+                except SessionExpiredError:
+                    await file_io.run(clear_upload_state, file_path, state_key)
+                    raise
+                except (aiohttp.ClientError, asyncio.TimeoutError, ResumableUploadError, CircuitOpenError) as e:
+                    kind = classify_error(e)
+                    if kind == RETRYABLE and not isinstance(e, CircuitOpenError):
+                        # جزء فُقد أثناء النقل: أجزاء أصغر على الرابط غير المستقر
+                        self._tuner.record_error()
+                    if kind == AUTH and self._on_auth_error and not auth_refreshed:
+                        # تجديد التوكن مرة واحدة ثم استكمال الجزء نفسه
+                        auth_refreshed = True
+                        logger.warning("رفض خادم الرفع التوكن، سيتم تجديده وإعادة المحاولة")
+                        await self._on_auth_error()
+                        continue
+                    if kind != RETRYABLE:
+                        raise
+
+                    retry += 1
+                    if retry >= MAX_UPLOAD_RETRIES:
+                        logger.error(f"فشل الرفع بعد {MAX_UPLOAD_RETRIES} محاولة: {str(e)}")
+                        raise Exception(f"فشل الرفع بعد {MAX_UPLOAD_RETRIES} محاولة: {str(e)}")
+
+                    delay = backoff.delay_for(e)
+                    logger.warning(f"إعادة محاولة الرفع بعد {delay:.1f} ث... المحاولة {retry}: {str(e)}")
+                    await asyncio.sleep(delay)
+                    try:
+                        with self._breaker.guard():
+                            offset, response = await self.query_status(session_uri, total_size)
+                        if response is not None:
+                            return response
+                    except SessionExpiredError:
+                        await file_io.run(clear_upload_state, file_path, state_key)
+                        raise
+                    except Exception as query_error:
+                        logger.warning(f"فشل الاستعلام عن حالة الرفع: {str(query_error)}")
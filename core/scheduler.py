@@ -0,0 +1,168 @@
+"""
+مجدول المهام: مجمع عمال للتنزيل ومجمع عمال للرفع يربط بينهما طابور محدود
+"""
+import time
+import asyncio
+import logging
+
+from config.config import DOWNLOAD_WORKERS, UPLOAD_WORKERS, UPLOAD_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+STAGE_DOWNLOAD = 'download'
+STAGE_UPLOAD = 'upload'
+
+# معامل التنعيم للمتوسطات المتحركة لأزمنة الانتظار والخدمة
+_EWMA_ALPHA = 0.2
+
+
+class StageStats:
+    """إحصائيات مرحلة واحدة لضبط أعداد العمال وحجم الطابور"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.active = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.avg_wait = 0.0
+        self.max_wait = 0.0
+        self.avg_service = 0.0
+
+    @staticmethod
+    def _ewma(current, sample, first):
+        return sample if first else current + _EWMA_ALPHA * (sample - current)
+
+    def record_wait(self, seconds):
+        first = self.completed + self.failed + self.cancelled + self.active == 0
+        self.avg_wait = self._ewma(self.avg_wait, seconds, first)
+        self.max_wait = max(self.max_wait, seconds)
+
+    def record_service(self, seconds):
+        first = self.completed + self.failed + self.cancelled == 0
+        self.avg_service = self._ewma(self.avg_service, seconds, first)
+
+
+class JobScheduler:
+    """
+    تُنفذ مرحلة التنزيل بواسطة download_handler(job_id, payload) وتعيد True إذا كانت المهمة
+    تحتاج إلى مرحلة رفع، ثم تنتقل إلى طابور الرفع المحدود لتُنفذ بواسطة upload_handler.
+    امتلاء طابور الرفع يوقف عمال التنزيل مؤقتاً فلا تتراكم الملفات على القرص
+    """
+
+    def __init__(self, download_handler, upload_handler,
+                 download_workers=DOWNLOAD_WORKERS,
+                 upload_workers=UPLOAD_WORKERS,
+                 upload_queue_size=UPLOAD_QUEUE_SIZE):
+        self._handlers = {STAGE_DOWNLOAD: download_handler, STAGE_UPLOAD: upload_handler}
+        self._worker_counts = {STAGE_DOWNLOAD: download_workers, STAGE_UPLOAD: upload_workers}
+        self._upload_queue_size = upload_queue_size
+        self.stats = {stage: StageStats(count) for stage, count in self._worker_counts.items()}
+        self._queues = None
+        self._workers = []
+        self._running = {}  # المهام قيد التنفيذ حسب معرف المهمة
+        # حد مشترك لعمليات الرفع، تستخدمه أيضاً عمليات النقل المباشر التي تتم في مرحلة التنزيل
+        self.upload_slots = None
+
+    def start(self):
+        """تشغيل العمال (يجب استدعاؤها من داخل حلقة الأحداث)"""
+        if self._workers:
+            return
+        self._queues = {
+            STAGE_DOWNLOAD: asyncio.Queue(),
+            STAGE_UPLOAD: asyncio.Queue(maxsize=self._upload_queue_size)
+        }
+        self.upload_slots = asyncio.Semaphore(self._worker_counts[STAGE_UPLOAD])
+        for stage, count in self._worker_counts.items():
+            for _ in range(count):
+                self._workers.append(asyncio.create_task(self._worker(stage)))
+        logger.info(
+            f"تم تشغيل المجدول: {self._worker_counts[STAGE_DOWNLOAD]} عامل تنزيل، "
+            f"{self._worker_counts[STAGE_UPLOAD]} عامل رفع"
+        )
+
+    async def stop(self):
+        """إيقاف العمال وإلغاء المهام الجارية (تبقى حالتها في مخزن المهام للاستئناف)"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, job_id, payload, stage=STAGE_DOWNLOAD):
+        """إضافة مهمة إلى طابور المرحلة المحددة وإرجاع موقعها في الطابور"""
+        self.stats[stage].submitted += 1
+        await self._queues[stage].put((job_id, payload, time.monotonic()))
+        return self._queues[stage].qsize()
+
+    def cancel(self, job_id):
+        """إلغاء مهمة قيد التنفيذ؛ المهام المنتظرة يتم تجاهلها عند سحبها من الطابور"""
+        task = self._running.get(job_id)
+        if task and not task.done():
+            task.cancel()
+            return True
+        return False
+
+    def snapshot(self):
+        """لقطة من حالة الطوابير والعمال لأغراض المراقبة والضبط"""
+        result = {}
+        for stage, stats in self.stats.items():
+            result[stage] = {
+                'queue_depth': self._queues[stage].qsize() if self._queues else 0,
+                'workers': stats.workers,
+                'active': stats.active,
+                'submitted': stats.submitted,
+                'completed': stats.completed,
+                'failed': stats.failed,
+                'cancelled': stats.cancelled,
+                'avg_wait': stats.avg_wait,
+                'max_wait': stats.max_wait,
+                'avg_service': stats.avg_service
+            }
+        return result
+
+    async def _worker(self, stage):
+        queue = self._queues[stage]
+        while True:
+            job_id, payload, enqueued_at = await queue.get()
+            try:
+                self.stats[stage].record_wait(time.monotonic() - enqueued_at)
+                if stage == STAGE_UPLOAD:
+                    async with self.upload_slots:
+                        await self._run(stage, job_id, payload)
+                elif await self._run(stage, job_id, payload):
+                    # ينتظر هنا إذا امتلأ طابور الرفع (ضغط عكسي على التنزيل)
+                    await self.submit(job_id, payload, STAGE_UPLOAD)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"خطأ غير متوقع في عامل {stage}: {str(e)}")
+            finally:
+                queue.task_done()
+
+    async def _run(self, stage, job_id, payload):
+        """تنفيذ معالج المرحلة في مهمة مستقلة حتى يمكن إلغاؤها دون إيقاف العامل"""
+        stats = self.stats[stage]
+        stats.active += 1
+        started = time.monotonic()
+        task = asyncio.create_task(self._handlers[stage](job_id, payload))
+        self._running[job_id] = task
+        try:
+            await asyncio.wait({task})
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            self._running.pop(job_id, None)
+            stats.active -= 1
+            stats.record_service(time.monotonic() - started)
+
+        if task.cancelled():
+            stats.cancelled += 1
+            return False
+        if task.exception():
+            stats.failed += 1
+            logger.error(f"فشلت المهمة {job_id} في مرحلة {stage}: {str(task.exception())}")
+            return False
+        stats.completed += 1
+        return task.result()
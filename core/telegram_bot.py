@@ -1,19 +1,87 @@
-import os, re, traceback, logging, aiohttp, asyncio
+import os, re, time, traceback, logging, asyncio, hashlib
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ContextTypes, filters
 
-from config.config import TELEGRAM_BOT_TOKEN, TEMP_DOWNLOAD_PATH, YOUTUBE_TOKEN_PICKLE
-from core.youtube_utils import YouTubeUploader
-from core.telegram_utils import TelegramDownloader
+from config.config import (
+    TELEGRAM_BOT_TOKEN,
+    TEMP_DOWNLOAD_PATH,
+    MAX_FILE_SIZE,
+    MAX_BULK_MESSAGES,
+    DEFAULT_YOUTUBE_CHANNEL,
+    ENABLE_STREAMING_PIPELINE,
+    ENABLE_WEBHOOK,
+    NODE_ROLE,
+    MIRROR_CHANNELS,
+    MEDIA_CACHE_DIR,
+    JOB_PROGRESS_SAVE_INTERVAL
+)
+from core.youtube_utils import YouTubeUploader, YOUTUBE_TITLE_MAX_LENGTH
+from core.channel_pool import ChannelPool
+from core.telegram_utils import TelegramDownloader, node_session_path
+from core.resumable_upload import StreamUploadInterrupted, clear_upload_state
+from core.pipeline import buffered
+from core.media_cache import MediaCache
+from core import file_io
+from core.content_hash import FileHasher, hashed_chunks
+from core.upload_index import UploadIndex
+from core.quota import QUOTA_COSTS, ADMIT, REJECT
+from core.autotune import tuner_snapshots
+from core.progress import ProgressService
+from core.webhook import WebhookServer
+from core.mirror import ChannelMirror
+from core.worker import WorkerNode, StatusMessage, ROLE_ALL, ROLE_FRONTEND, ROLE_WORKER
+from core.scheduler import JobScheduler, STAGE_DOWNLOAD as SCHEDULER_DOWNLOAD, STAGE_UPLOAD as SCHEDULER_UPLOAD
+from core.job_store import (
+    JobStore,
+    ACTIVE_STAGES,
+    STAGE_PENDING,
+    STAGE_STREAMING,
+    STAGE_DOWNLOADING,
+    STAGE_UPLOADING,
+    STAGE_DONE,
+    STAGE_FAILED,
+    STAGE_CANCELLED,
+    upload_state_key
+)
 from utils.session_manager import SessionManager
-from google.auth.transport.requests import Request
 
 logger = logging.getLogger(__name__)
 
+# عنوان أساسي خاص لفيديوهات الدفعة: استخدام نص كل رسالة عنواناً لفيديوها
+BULK_CAPTION_TITLE = '.'
+
 class UploadBot:
-    def __init__(self):
-        self.youtube = YouTubeUploader(init_auth=False)
-        self.telegram_downloader = TelegramDownloader()
+    def __init__(self, role=NODE_ROLE, node_id=None):
+        # all: عملية واحدة تستقبل التحديثات وتنفذ المهام؛ frontend: تستقبل التحديثات وتسجل المهام فقط؛
+        # worker: تسحب المهام من مخزن المهام المشترك وتنفذها دون استقبال تحديثات
+        self.role = role
+        # عميل مستقل لكل قناة يوتيوب مع توزيع الرفع بينها
+        self.channels = ChannelPool()
+        self.jobs = JobStore()
+        self.uploads = UploadIndex()
+        self.worker = WorkerNode(self, node_id) if role == ROLE_WORKER else None
+        if self.worker:
+            self.telegram_downloader = TelegramDownloader(session_path=node_session_path(self.worker.node_id))
+        else:
+            self.telegram_downloader = TelegramDownloader()
+        # الملفات المنزلة مشتركة بين المهام؛ المهام غير المكتملة تحتفظ بملفاتها من التشغيل السابق.
+        # لكل عقدة عاملة مجلد مستقل حتى لا تكتب عقدتان في نفس الملف الجزئي
+        cache_dir = os.path.join(MEDIA_CACHE_DIR, self.worker.node_id) if self.worker else MEDIA_CACHE_DIR
+        self.media_cache = MediaCache(cache_dir=cache_dir, keep_paths=self.jobs.active_files())
+        for job in self.jobs.active_jobs():
+            self.media_cache.retain(job['file_path'], job['id'])
+        if self.worker:
+            # العقدة العاملة تنهي عقد المهمة عند انتهاء مراحلها
+            self.scheduler = JobScheduler(self.worker.download_stage, self.worker.upload_stage)
+        else:
+            self.scheduler = JobScheduler(self._download_stage, self._upload_stage)
+        # تعديلات رسائل الحالة تمر بخدمة واحدة ضمن حدود معدل Bot API
+        self.progress = ProgressService()
+        self.webhook = None
+        # نسخ القنوات يعمل في العملية التي تستقبل التحديثات وتسجل المهام
+        self.mirror = ChannelMirror(self) if MIRROR_CHANNELS and role != ROLE_WORKER else None
+        self._deferred_jobs = set()  # مهام مؤجلة حتى تجديد حصة يوتيوب
+        self._jobs_resumed = False
         self.app = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
         self.setup_handlers()
         os.makedirs(TEMP_DOWNLOAD_PATH, exist_ok=True)
@@ -23,17 +91,21 @@ class UploadBot:
         self.app.add_handler(CommandHandler('start', self.start_command))
         self.app.add_handler(CommandHandler('help', self.help_command))
         self.app.add_handler(CommandHandler('setadmin', self.set_admin_command))
-        self.app.add_handler(CommandHandler('auth', self.auth_command))
+        # /auth ينتظر رمز المصادقة في رسالة لاحقة من نفس المحادثة، فيُنفذ دون حجز تحديثات المحادثة
+        # (تُعالج تحديثات المحادثة الواحدة بالترتيب في الاستطلاع وفي webhook)
+        self.app.add_handler(CommandHandler('auth', self.auth_command, block=False))
         self.app.add_handler(CommandHandler('checkauth', self.check_auth_command))
         self.app.add_handler(CommandHandler('sendcode', self.send_code_command))
         self.app.add_handler(CommandHandler('authhelp', self.auth_help_command))
         self.app.add_handler(CommandHandler('cancel', self.cancel_command))
+        self.app.add_handler(CommandHandler('stats', self.stats_command))
         self.app.add_handler(MessageHandler(filters.VIDEO | filters.Document.VIDEO, self.handle_video))
         
-        # تحسين فلتر روابط تيليجرام
+        # تحسين فلتر روابط تيليجرام (يطابق أيضاً النطاقات والرسائل التي تحتوي عدة روابط)
         tg_link_pattern = r'https?://(?:t|telegram)\.(?:me|dog)/([^/]+)/(\d+)'
         self.app.add_handler(MessageHandler(filters.Regex(tg_link_pattern), self.handle_telegram_link))
         
+        self.app.add_handler(CallbackQueryHandler(self.handle_channel_selection, pattern=r'^channel_'))
         self.app.add_handler(CallbackQueryHandler(self.handle_playlist_selection))
         
         # معالج خاص للرسائل النصية
@@ -41,18 +113,25 @@ class UploadBot:
         
         self.app.add_error_handler(self.error_handler)
 
-    async def initialize_youtube(self):
-        """تهيئة اتصال يوتيوب"""
-        if not self.youtube_initialized:
+    async def initialize_youtube(self, channel=None, interactive=False):
+        """
+        تهيئة اتصال يوتيوب لقناة محددة، أو لجميع القنوات التي لها توكن محفوظ
+        (والقناة الافتراضية إن لم توجد أي قناة). المصادقة التفاعلية (interactive)
+        تبدأ من الأمر /auth في الواجهة فقط، وبقية المسارات تستخدم التوكن المحفوظ
+        """
+        if channel is None and self.youtube_initialized:
+            return True
+        channels = [channel] if channel else (SessionManager.list_channels() or [DEFAULT_YOUTUBE_CHANNEL])
+        for name in channels:
             try:
-                await self.youtube.initialize()
+                await self.channels.initialize(name, interactive)
                 self.youtube_initialized = True
-                logger.info("تم تهيئة اتصال يوتيوب بنجاح")
-                return True
+                logger.info(f"تم تهيئة اتصال يوتيوب بنجاح للقناة {name}")
             except Exception as e:
-                logger.error(f"فشل في تهيئة اتصال يوتيوب: {str(e)}")
-                return False
-        return True
+                logger.error(f"فشل في تهيئة اتصال يوتيوب للقناة {name}: {str(e)}")
+        if channel:
+            return channel in self.channels.ready_channels()
+        return self.youtube_initialized
 
     async def auth_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """بدء عملية المصادقة مع يوتيوب"""
@@ -72,6 +151,14 @@ class UploadBot:
             )
             return
             
+        # /auth [اسم_القناة] لإضافة قناة أخرى أو إعادة مصادقتها
+        channel = context.args[0] if context.args else DEFAULT_YOUTUBE_CHANNEL
+        if not SessionManager.is_valid_channel_name(channel):
+            await update.message.reply_text(
+                "⚠️ اسم القناة غير صالح. استخدم أحرفاً لاتينية وأرقاماً و - أو _ فقط (حتى 32 حرفاً)."
+            )
+            return
+            
         await update.message.reply_text(
             "🔄 جاري بدء عملية المصادقة مع يوتيوب...\n\n"
             "سيتم إرسال رابط لك للمصادقة. اتبع الخطوات التالية:\n\n"
@@ -84,11 +171,13 @@ class UploadBot:
         )
         
         try:
-            success = await self.initialize_youtube()
+            success = await self.initialize_youtube(channel, interactive=True)
             if success:
                 await update.message.reply_text(
-                    "✅ تم تهيئة اتصال يوتيوب بنجاح!"
+                    "✅ تم تهيئة اتصال يوتيوب بنجاح!" if channel == DEFAULT_YOUTUBE_CHANNEL
+                    else f"✅ تم تهيئة اتصال يوتيوب بنجاح للقناة: {channel}"
                 )
+                await self.resume_jobs()
             else:
                 await update.message.reply_text(
                     "❌ فشل في تهيئة اتصال يوتيوب. يرجى المحاولة مرة أخرى.\n"
@@ -113,14 +202,9 @@ class UploadBot:
             error_type = type(context.error).__name__
             simple_error = str(context.error).split('\n')[0]  # الحصول على السطر الأول فقط
             
-            if "File too large" in simple_error:
-                await update.effective_message.reply_text(
-                    "❌ خطأ: حجم الملف كبير جدًا. استخدم رابط تيليجرام بدلاً من ذلك."
-                )
-            else:
-                await update.effective_message.reply_text(
-                    f"❌ حدث خطأ: {simple_error}\nنوع الخطأ: {error_type}"
-                )
+            await update.effective_message.reply_text(
+                f"❌ حدث خطأ: {simple_error}\nنوع الخطأ: {error_type}"
+            )
 
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(
@@ -146,13 +230,15 @@ class UploadBot:
             "• `/start` - بدء البوت\n"
             "• `/help` - عرض المساعدة\n"
             "• `/setadmin` - تعيين مستخدم كمدير\n"
-            "• `/auth` - المصادقة مع يوتيوب\n"
+            "• `/auth` - المصادقة مع يوتيوب (`/auth اسم_القناة` لإضافة قناة أخرى)\n"
             "• `/checkauth` - التحقق من حالة المصادقة\n"
-            "• `/cancel` - إلغاء العملية الحالية\n\n"
+            "• `/cancel` - إلغاء العملية الحالية\n"
+            "• `/stats` - حالة طوابير التنزيل والرفع\n\n"
             
             "كيفية الاستخدام:\n"
             "1. قم بإرسال فيديو من هاتفك\n"
             "2. أو شارك رابط رسالة من تيليجرام تحتوي على فيديو\n"
+            "   (يمكن إرسال عدة روابط معاً أو نطاق رسائل مثل `t.me/channel/100-300`)\n"
             "3. اختر قائمة التشغيل التي تريد رفع الفيديو إليها\n"
             "4. أدخل عنوان الفيديو\n"
             "5. انتظر حتى يتم الرفع\n\n"
@@ -169,65 +255,31 @@ class UploadBot:
             )
             return
             
-        msg = await update.message.reply_text("⬇️ جاري تحميل الفيديو...")
+        msg = await update.message.reply_text("⬇️ جاري تجهيز الفيديو...")
         
         try:
             # تحديد نوع الملف
-            if update.message.video:
-                file = update.message.video
-                file_name = file.file_name if file.file_name else f"video_{file.file_id[-10:]}.mp4"
-            else:  # Document
-                file = update.message.document
-                file_name = file.file_name if file.file_name else f"video_{file.file_id[-10:]}.mp4"
-            
-            # تحميل الملف
-            file_path = os.path.join(TEMP_DOWNLOAD_PATH, file_name)
-            video_file = await file.get_file()
-            
-            # التحميل مع إظهار التقدم
-            total_size = file.file_size
-            downloaded = 0
-            last_percentage = 0
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(video_file.file_path) as response:
-                    with open(file_path, 'wb') as f:
-                        while True:
-                            chunk = await response.content.read(1024 * 1024)  # 1MB chunks
-                            if not chunk:
-                                break
-                                
-                            f.write(chunk)
-                            downloaded += len(chunk)
-                            percentage = int((downloaded / total_size) * 100)
-                            
-                            if percentage - last_percentage >= 5:
-                                await msg.edit_text(
-                                    f"⬇️ جاري التحميل: {percentage}%\n"
-                                    f"تم تحميل: {downloaded / (1024 * 1024):.1f} ميجابايت / {total_size / (1024 * 1024):.1f} ميجابايت"
-                                )
-                                last_percentage = percentage
-            
-            await msg.edit_text("✅ اكتمل التحميل! جاري التحضير ليوتيوب...")
-            
-            # حفظ معلومات الملف
-            context.user_data.update({
-                'file_path': file_path,
-                'original_name': file_name
-            })
-            
-            # الحصول على قوائم التشغيل
-            playlists = self.youtube.get_playlists()
-            keyboard = [[InlineKeyboardButton(title, callback_data=f"playlist_{id}")] 
-                       for id, title in playlists]
-            
-            await msg.edit_text("اختر قائمة تشغيل:", reply_markup=InlineKeyboardMarkup(keyboard))
+            file = update.message.video or update.message.document
+            if file.file_size and file.file_size > MAX_FILE_SIZE:
+                await msg.edit_text(
+                    f"❌ حجم الملف أكبر من الحد المسموح ({MAX_FILE_SIZE / (1024 * 1024 * 1024):.0f} جيجابايت)."
+                )
+                return
+            
+            # يُنزّل الملف لاحقاً عبر Telethon بمعرف المحادثة والرسالة (نفس مسار روابط تيليجرام)
+            # بدلاً من Bot API المحدودة بـ 20 ميجابايت
+            context.user_data['telegram_link_info'] = {
+                'type': 'message',
+                'chat_id': update.effective_chat.id,
+                'message_id': update.message.message_id
+            }
+            
+            # اختيار القناة (عند وجود أكثر من قناة) ثم قائمة التشغيل
+            await self._ask_channel(msg, context)
             
         except Exception as e:
             error_msg = str(e)
             await msg.edit_text(f"❌ خطأ: {error_msg}\nيرجى المحاولة مرة أخرى.")
-            if 'file_path' in context.user_data and os.path.exists(context.user_data['file_path']):
-                os.remove(context.user_data['file_path'])
             context.user_data.clear()
     
     async def handle_telegram_link(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -244,6 +296,20 @@ class UploadBot:
             link = update.message.text
             logger.info(f"معالجة رابط: {link}")
             
+            # عدة روابط أو نطاق رسائل أو رسالة من ألبوم: مهمة لكل فيديو
+            specs = self.telegram_downloader.parse_telegram_links(link)
+            message_count = sum(len(spec['message_ids']) for spec in specs)
+            if message_count > MAX_BULK_MESSAGES:
+                await msg.edit_text(f"❌ عدد الرسائل ({message_count}) يتجاوز الحد المسموح ({MAX_BULK_MESSAGES}).")
+                return
+            if message_count > 1:
+                videos = await self.telegram_downloader.collect_link_videos(specs)
+                if not videos:
+                    await msg.edit_text("❌ لا توجد فيديوهات في الرسائل المحددة.")
+                    return
+                await self._ask_bulk(msg, context, videos)
+                return
+            
             # تحليل الرابط باستخدام الوظيفة الجديدة
             link_info = await self.telegram_downloader.parse_telegram_link(link)
             
@@ -251,22 +317,74 @@ class UploadBot:
                 await msg.edit_text("❌ صيغة الرابط غير صحيحة. تأكد من نسخ الرابط بشكل كامل.")
                 return
                 
+            # رابط رسالة واحدة قد يشير إلى ألبوم فيديوهات
+            try:
+                videos = await self.telegram_downloader.collect_link_videos(specs)
+            except Exception as e:
+                logger.warning(f"تعذر التحقق من ألبوم الرسالة: {str(e)}")
+                videos = []
+            if len(videos) > 1:
+                await self._ask_bulk(msg, context, videos)
+                return
+                
             # تحقق من نوع الرابط (مجموعة عامة أو خاصة)
             context.user_data['telegram_link_info'] = link_info
             
-            # الحصول على قوائم التشغيل من يوتيوب أولاً (لجميع أنواع الروابط)
-            playlists = await self.youtube.get_playlists()
-            keyboard = [[InlineKeyboardButton(title, callback_data=f"playlist_{id}")] 
-                      for id, title in playlists]
-            
-            await msg.edit_text("اختر قائمة تشغيل للفيديو:", 
-                              reply_markup=InlineKeyboardMarkup(keyboard))
+            # اختيار القناة (عند وجود أكثر من قناة) ثم قائمة التشغيل (لجميع أنواع الروابط)
+            await self._ask_channel(msg, context)
                 
         except Exception as e:
             error_msg = str(e)
             await msg.edit_text(f"❌ خطأ: {error_msg}\nيرجى المحاولة مرة أخرى.")
             context.user_data.clear()
 
+    async def _ask_bulk(self, msg, context, videos):
+        """حفظ فيديوهات الدفعة ثم اختيار القناة وقائمة التشغيل مرة واحدة لها جميعاً"""
+        logger.info(f"دفعة من {len(videos)} فيديو")
+        context.user_data['bulk_videos'] = videos
+        await self._ask_channel(msg, context)
+
+    async def _ask_channel(self, msg, context):
+        """عرض أزرار القنوات المهيأة، أو قوائم التشغيل مباشرة عند وجود قناة واحدة"""
+        channels = self.channels.ready_channels()
+        if len(channels) <= 1:
+            context.user_data['channel'] = channels[0] if channels else DEFAULT_YOUTUBE_CHANNEL
+            await self._ask_playlist(msg, context)
+            return
+            
+        keyboard = [[InlineKeyboardButton("🔀 تلقائي (حسب الحصة والحمل)", callback_data="channel_*")]]
+        keyboard += [[InlineKeyboardButton(f"📺 {name}", callback_data=f"channel_{name}")] for name in channels]
+        await msg.edit_text("اختر القناة:", reply_markup=InlineKeyboardMarkup(keyboard))
+
+    async def _ask_playlist(self, msg, context):
+        """عرض قوائم تشغيل القناة المختارة"""
+        playlists = await self.channels.get(context.user_data['channel']).get_playlists()
+        keyboard = [[InlineKeyboardButton(title, callback_data=f"playlist_{id}")] 
+                   for id, title in playlists]
+        
+        await msg.edit_text("اختر قائمة تشغيل للفيديو:", 
+                          reply_markup=InlineKeyboardMarkup(keyboard))
+
+    async def handle_channel_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+        
+        channel = query.data.replace("channel_", "", 1)
+        if channel == "*":
+            # قوائم التشغيل خاصة بكل قناة، لذلك تُختار القناة الآن حسب سياسة التوزيع
+            channel = self.channels.choose(QUOTA_COSTS['videos.insert'] + QUOTA_COSTS['playlistItems.insert'])
+        if channel not in self.channels.ready_channels():
+            await query.edit_message_text("❌ القناة غير متاحة. يرجى إرسال الفيديو مرة أخرى.")
+            context.user_data.clear()
+            return
+            
+        context.user_data['channel'] = channel
+        try:
+            await self._ask_playlist(query.message, context)
+        except Exception as e:
+            await query.edit_message_text(f"❌ خطأ: {str(e)}\nيرجى المحاولة مرة أخرى.")
+            context.user_data.clear()
+
     async def handle_playlist_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
         await query.answer()
@@ -276,15 +394,26 @@ class UploadBot:
         
         # حفظ في البيانات
         context.user_data['playlist_id'] = playlist_id
-        playlist_title = next((title for id, title in await self.youtube.get_playlists() if id == playlist_id), "غير معروف")
+        channel = context.user_data.get('channel', DEFAULT_YOUTUBE_CHANNEL)
+        playlist_title = self.channels.get(channel).get_playlist_title(playlist_id) or "غير معروف"
+        if len(self.channels.ready_channels()) > 1:
+            playlist_title += f" (القناة: {channel})"
         
         # الاستجابة للمستخدم
         await query.edit_message_text(f"✓ تم اختيار قائمة التشغيل: {playlist_title}")
         
         # طلب عنوان الفيديو مباشرة بعد اختيار القائمة (لكل أنواع الفيديوهات)
+        if 'bulk_videos' in context.user_data:
+            prompt = (
+                f"أدخل عنواناً أساسياً للفيديوهات ({len(context.user_data['bulk_videos'])} فيديو)، "
+                "سيُضاف إليه رقم كل فيديو.\n"
+                f"أو أرسل «{BULK_CAPTION_TITLE}» لاستخدام نص كل رسالة عنواناً لفيديوها."
+            )
+        else:
+            prompt = "أدخل عنوان الفيديو الذي تريد رفعه:"
         msg = await context.bot.send_message(
             chat_id=update.effective_chat.id, 
-            text="أدخل عنوان الفيديو الذي تريد رفعه:"
+            text=prompt
         )
         
         # حفظ معرف الرسالة لاستخدامه لاحقاً للتحديثات أثناء التنزيل
@@ -300,7 +429,7 @@ class UploadBot:
         is_auth_code = False
         
         # فحص أكثر شمولاً لرموز جوجل المختلفة
-        if SessionManager._waiting_for_code:
+        if SessionManager.is_waiting_for_code(chat_id):
             if "4/" in message_text or "4%2F" in message_text:
                 is_auth_code = True
             elif len(message_text) > 20:  # رموز جوجل عادة طويلة
@@ -323,6 +452,48 @@ class UploadBot:
         else:
             await update.message.reply_text("❌ يجب اختيار قائمة تشغيل أولاً.")
 
+    async def _try_stream_upload(self, uploader, message, title, msg, session_callback=None, digest=None):
+        """
+        محاولة النقل المباشر من تيليجرام إلى يوتيوب دون ملف مؤقت كامل.
+        تعيد (معرف الفيديو، None) عند النجاح، أو (None، رابط الجلسة إن وجد) للرجوع إلى مسار الملف.
+        digest: بصمة تُحدّث بمحتوى البث أثناء مروره
+        """
+        total_size = self.telegram_downloader.get_media_size(message)
+        if not total_size:
+            logger.info("حجم الملف غير معروف، سيتم استخدام التنزيل الكامل قبل الرفع")
+            return None, None
+            
+        await self.progress.edit(msg, "🔄 جاري النقل المباشر من تيليجرام إلى يوتيوب...")
+        chunks = buffered(self.telegram_downloader.iter_media(message))
+        if digest is not None:
+            chunks = hashed_chunks(chunks, digest)
+        try:
+            video_id = await uploader.upload_video_stream(
+                chunks,
+                total_size,
+                title,
+                self.progress.tracker(msg, "🔄 جاري النقل المباشر..."),
+                session_callback=session_callback
+            )
+            return video_id, None
+        except StreamUploadInterrupted as e:
+            logger.warning(f"تعذر إكمال النقل المباشر، سيتم التنزيل الكامل ثم استكمال الرفع: {str(e)}")
+            return None, e.session_uri
+
+    def _make_offset_saver(self, job_id):
+        """
+        حفظ موضع التنزيل في مخزن المهام على فترات لتقليل الكتابة على القرص.
+        الكتابة تُرسل إلى خيط المخزن دون انتظار (تُستدعى من داخل حلقة التنزيل)
+        """
+        last_saved = [0]
+        
+        def save_offset(offset):
+            if offset - last_saved[0] >= JOB_PROGRESS_SAVE_INTERVAL:
+                last_saved[0] = offset
+                self.jobs.submit(self.jobs.update, job_id, downloaded_bytes=offset)
+                
+        return save_offset
+
     async def process_download_and_upload(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """دالة موحدة لتنزيل ورفع الفيديو"""
         title = context.user_data.get('video_title')
@@ -332,94 +503,464 @@ class UploadBot:
             await update.message.reply_text("❌ يجب إدخال عنوان للفيديو.")
             return
             
+        if 'bulk_videos' in context.user_data:
+            await self._enqueue_bulk_jobs(update, context, title)
+            return
+            
         # إنشاء رسالة الحالة
         msg = await update.message.reply_text("⬇️ جاري تجهيز الفيديو...")
         
+        # الفيديوهات المرسلة مباشرة والروابط تُنزّل جميعها عبر Telethon
+        if 'telegram_link_info' not in context.user_data:
+            await self.progress.edit(msg, "❌ لم يتم تحديد أي فيديو للرفع.")
+            return
+        link_info = context.user_data['telegram_link_info']
+            
+        # تسجيل المهمة في المخزن الدائم حتى يمكن استئنافها بعد إعادة التشغيل
+        job_id = await self.jobs.run(
+            self.jobs.create,
+            chat_id=update.effective_chat.id,
+            user_id=update.effective_user.id if update.effective_user else None,
+            source={'type': 'link', 'link_info': link_info},
+            title=title,
+            playlist_id=context.user_data['playlist_id'],
+            file_path=self.telegram_downloader.get_link_file_path(link_info),
+            stage=STAGE_PENDING,
+            channel=context.user_data.get('channel')
+        )
+        
+        # أصبحت حالة المهمة في المخزن، لذا ننظف بيانات المستخدم
+        context.user_data.clear()
+        
+        await self._enqueue_job(await self.jobs.run(self.jobs.get, job_id), msg)
+
+    @staticmethod
+    def _bulk_title(base_title, index, caption, link_info):
+        """عنوان فيديو الدفعة: العنوان الأساسي مع رقم الفيديو، أو أول سطر من نص رسالته"""
+        if base_title.strip() == BULK_CAPTION_TITLE:
+            lines = [line.strip() for line in caption.splitlines() if line.strip()]
+            source = link_info.get('channel_username') or link_info['chat_id']
+            title = lines[0] if lines else f"{source} {link_info['message_id']}"
+        else:
+            title = f"{base_title.strip()} {index}"
+        return title[:YOUTUBE_TITLE_MAX_LENGTH]
+
+    async def _enqueue_bulk_jobs(self, update, context, base_title):
+        """
+        تسجيل مهمة لكل فيديو في الدفعة بنفس القناة وقائمة التشغيل. رسالة حالة كل مهمة
+        تُرسل عند بدء تنفيذها بدلاً من إرسال مئات الرسائل دفعة واحدة
+        """
+        videos = context.user_data['bulk_videos']
+        playlist_id = context.user_data['playlist_id']
+        channel = context.user_data.get('channel')
+        context.user_data.clear()
+        
+        for index, (link_info, caption) in enumerate(videos, 1):
+            job_id = await self.jobs.run(
+                self.jobs.create,
+                chat_id=update.effective_chat.id,
+                user_id=update.effective_user.id if update.effective_user else None,
+                source={'type': 'link', 'link_info': link_info},
+                title=self._bulk_title(base_title, index, caption, link_info),
+                playlist_id=playlist_id,
+                file_path=self.telegram_downloader.get_link_file_path(link_info),
+                stage=STAGE_PENDING,
+                channel=channel
+            )
+            await self._enqueue_job(await self.jobs.run(self.jobs.get, job_id))
+            
+        await update.message.reply_text(
+            f"✅ تمت إضافة {len(videos)} فيديو إلى قائمة الانتظار.\n"
+            "ستصلك رسالة حالة لكل فيديو عند بدء معالجته."
+        )
+
+    @staticmethod
+    def _scheduler_stage(job):
+        """مرحلة المجدول المناسبة لحالة المهمة المحفوظة"""
+        if job['source']['type'] == 'link' and job['stage'] != STAGE_UPLOADING:
+            return SCHEDULER_DOWNLOAD
+        return SCHEDULER_UPLOAD
+
+    async def _enqueue_job(self, job, msg=None):
+        """
+        إرسال المهمة إلى المجدول في المرحلة المناسبة لحالتها المحفوظة.
+        المهمة دون رسالة حالة تُرسل رسالتها عند بدء تنفيذها
+        """
+        if msg is not None:
+            # رسالة الحالة تحدثها العقدة التي تنفذ المهمة
+            await self.jobs.run(self.jobs.update, job['id'], status_message_id=msg.message_id)
+        if self.role == ROLE_FRONTEND:
+            # تسحب العقد العاملة المهمة من مخزن المهام المشترك
+            position = await self.jobs.run(self.jobs.queue_position, job['id'])
+        else:
+            position = await self.scheduler.submit(job['id'], msg, self._scheduler_stage(job))
+        if msg is not None and position > 1:
+            await self.progress.edit(msg, f"⏳ تمت إضافة الفيديو إلى قائمة الانتظار (الترتيب: {position})")
+
+    async def _job_message(self, job, msg):
+        """رسالة حالة المهمة: الممررة من المجدول، أو المحفوظة في المخزن، أو رسالة جديدة"""
+        if msg is not None:
+            return msg
+        bot = self.app.bot
+        if job['status_message_id']:
+            return StatusMessage(bot, job['chat_id'], job['status_message_id'])
+        sent = await bot.send_message(chat_id=job['chat_id'], text=f"⬇️ جاري تجهيز الفيديو: {job['title']}")
+        await self.jobs.run(self.jobs.update, job['id'], status_message_id=sent.message_id)
+        return StatusMessage(bot, job['chat_id'], sent.message_id)
+
+    def _make_session_saver(self, job_id, uploader):
+        """حفظ رابط جلسة الرفع في مخزن المهام فور إنشائها"""
+        def save_session(session_uri):
+            self.jobs.submit(self.jobs.update, job_id, upload_uri=session_uri)
+            # إنشاء الجلسة يستهلك تكلفة videos.insert من حجز المهمة
+            uploader.quota.consume(job_id, QUOTA_COSTS['videos.insert'])
+        return save_session
+
+    async def _download_stage(self, job_id, msg):
+        """
+        مرحلة التنزيل في المجدول: تنزيل وسائط الرابط (أو نقلها مباشرة إلى يوتيوب).
+        تعيد True إذا كانت المهمة بحاجة إلى مرحلة الرفع
+        """
+        job = await self.jobs.run(self.jobs.get, job_id)
+        if job['stage'] not in ACTIVE_STAGES:
+            return False
+        msg = await self._job_message(job, msg)
+        
         try:
-            # تحقق من نوع الفيديو (رابط تيليجرام أو ملف محمل)
-            downloaded_path = None
+            # تنزيل الفيديو من رابط تيليجرام
+            link_info = job['source']['link_info']
             
-            if 'telegram_link_info' in context.user_data:
-                # تنزيل الفيديو من رابط تيليجرام
-                link_info = context.user_data['telegram_link_info']
-                
-                await msg.edit_text("⬇️ جاري تنزيل الفيديو من تيليجرام...")
-                
-                # بدء تشغيل عميل تيليجرام
-                await self.telegram_downloader.start()
-                
-                # تعريف دالة تتبع التقدم
-                percent_complete = [0]
+            # بدء تشغيل عميل تيليجرام
+            await self.telegram_downloader.start()
+            message = await self.telegram_downloader.get_link_message(link_info)
+            cache_key = self.media_cache.media_key(message)
+            await self.jobs.run(
+                self.jobs.update,
+                job_id,
+                media_key=cache_key,
+                total_bytes=self.telegram_downloader.get_media_size(message)
+            )
+            
+            # نفس المستند مرفوع مسبقاً: لا حاجة للتنزيل أو الرفع
+            if await self._reuse_existing_upload(job_id, msg):
+                return False
+            
+            # عدم بدء التنزيل إذا لم تكفِ حصة يوتيوب المتبقية لرفعه اليوم
+            if not await self._admit_job(job_id, msg, SCHEDULER_DOWNLOAD):
+                return False
+            
+            # لا حاجة للنقل المباشر إذا كان الملف منزلاً مسبقاً في ذاكرة الوسائط
+            if (ENABLE_STREAMING_PIPELINE and job['stage'] == STAGE_PENDING
+                    and not (cache_key and self.media_cache.contains(cache_key))):
+                await self.jobs.run(self.jobs.update, job_id, stage=STAGE_STREAMING)
+                digest = hashlib.sha256()
+                # النقل المباشر يشغل أيضاً أحد مواقع الرفع المتاحة
+                async with self.scheduler.upload_slots:
+                    video_id, session_uri = await self._try_stream_upload(
+                        self.channels.for_job(job),
+                        message,
+                        job['title'],
+                        msg,
+                        session_callback=self._make_session_saver(job_id, self.channels.for_job(job)),
+                        digest=digest
+                    )
+                if video_id:
+                    await self.jobs.run(self.jobs.update, job_id, content_hash=digest.hexdigest())
+                    await self._complete_job(job_id, msg, video_id)
+                    return False
+            
+            file_path = self.media_cache.path_for(cache_key) if cache_key else \
+                self.telegram_downloader.get_link_file_path(link_info)
+            await self.jobs.run(self.jobs.update, job_id, stage=STAGE_DOWNLOADING, file_path=file_path)
+            offset_saver = self._make_offset_saver(job_id)
+            progress_callback = self.progress.tracker(msg, "⬇️ جاري تنزيل الفيديو...")
+            
+            async def download(target_path):
+                # استئناف التنزيل من آخر موضع محفوظ إن وجد الملف الجزئي
+                start_offset = job['downloaded_bytes'] if os.path.exists(target_path) else 0
+                # بصمة المحتوى تُحسب أثناء التنزيل من الجزء المكتمل المتصل
+                hasher = FileHasher(target_path)
                 
-                async def progress_callback(current, total):
-                    percent = int((current / total) * 100)
-                    
-                    # تحديث الرسالة فقط عندما يتغير النسبة بـ 10٪
-                    if percent // 10 > percent_complete[0] // 10:
-                        percent_complete[0] = percent
-                        try:
-                            await msg.edit_text(f"⬇️ جاري تنزيل الفيديو... {percent}%")
-                        except Exception:
-                            pass  # تجاهل أخطاء تحديث الرسالة
+                def on_offset(offset):
+                    offset_saver(offset)
+                    hasher.advance(offset)
                 
-                # تحميل الفيديو حسب نوع الرابط
-                if link_info['type'] == 'public':
-                    # رابط عام
-                    downloaded_path = await self.telegram_downloader.download_media_from_link(
-                        link_info['channel_username'], 
-                        link_info['message_id'],
-                        progress_callback
+                try:
+                    downloaded = await self.telegram_downloader.download_message_media(
+                        message,
+                        target_path,
+                        progress_callback,
+                        start_offset=start_offset,
+                        offset_callback=on_offset
                     )
+                except BaseException:
+                    hasher.close()
+                    raise
+                if not downloaded:
+                    hasher.close()
+                    return downloaded
+                content_hash = await hasher.finish(os.path.getsize(downloaded))
+                await self.jobs.run(self.jobs.update, job_id, content_hash=content_hash)
+                return downloaded
+            
+            if cache_key:
+                # مهام متزامنة لنفس الملف تشترك في تنزيل واحد
+                if self.media_cache.is_downloading(cache_key):
+                    await self.progress.edit(msg, "⏳ هذا الملف قيد التنزيل لطلب آخر، في انتظار اكتماله...")
                 else:
-                    # رابط مجموعة خاصة
-                    downloaded_path = await self.telegram_downloader.download_media_from_private_chat(
-                        link_info['chat_id'],
-                        link_info['message_id'],
-                        link_info['sub_message_id'],
-                        progress_callback
-                    )
-                    
-                if not downloaded_path:
-                    await msg.edit_text("❌ فشل في تنزيل الفيديو من الرابط.")
-                    return
-                    
-            elif 'file_path' in context.user_data:
-                # استخدام ملف تم تحميله مسبقاً
-                downloaded_path = context.user_data['file_path']
+                    await self.progress.edit(msg, "⬇️ جاري تنزيل الفيديو من تيليجرام...")
+                downloaded_path = await self.media_cache.acquire(cache_key, download, job_id)
             else:
-                await msg.edit_text("❌ لم يتم تحديد أي فيديو للرفع.")
-                return
+                await self.progress.edit(msg, "⬇️ جاري تنزيل الفيديو من تيليجرام...")
+                downloaded_path = await download(file_path)
+                
+            if not downloaded_path:
+                raise Exception("فشل في تنزيل الفيديو من الرابط.")
+                
+            # عبر خيط المخزن لتُكتب بعد مواضع التنزيل المرسلة قبلها
+            await self.jobs.run(
+                self.jobs.update,
+                job_id,
+                stage=STAGE_UPLOADING,
+                file_path=downloaded_path,
+                downloaded_bytes=os.path.getsize(downloaded_path)
+            )
             
-            # حفظ مسار الملف المنزل
-            context.user_data['file_path'] = downloaded_path
+            # نفس المحتوى (بمستند مختلف) مرفوع مسبقاً
+            if await self._reuse_existing_upload(job_id, msg):
+                self._release_job_file(job_id, downloaded_path)
+                return False
+                
+            await self.progress.edit(msg, "⏳ اكتمل التنزيل، في انتظار دور الرفع إلى يوتيوب...")
+            return True
             
-            # بدء الرفع إلى يوتيوب مباشرة
-            await msg.edit_text("⬆️ جاري الرفع إلى يوتيوب...")
+        except Exception as e:
+            await self._fail_job(job_id, msg, e)
+            return False
+
+    async def _upload_stage(self, job_id, msg):
+        """مرحلة الرفع في المجدول: رفع الملف المؤقت إلى يوتيوب مع استكمال الجلسة المحفوظة"""
+        job = await self.jobs.run(self.jobs.get, job_id)
+        if job['stage'] not in ACTIVE_STAGES:
+            return False
+        msg = await self._job_message(job, msg)
+        file_path = job['file_path']
+        
+        try:
+            # ربما اكتمل رفع نفس المحتوى لمهمة أخرى أثناء انتظار هذه المهمة
+            if await self._reuse_existing_upload(job_id, msg):
+                self._release_job_file(job_id, file_path)
+                return True
+                
+            # جلسة الرفع المحفوظة انتهت صلاحيتها: الجلسة الجديدة تكلف videos.insert من جديد
+            # فيُحجز لها من الحصة قبل إنشائها
+            if job['upload_uri'] and not await self.channels.for_job(job).upload_session_alive(job['upload_uri'], file_path):
+                logger.info(f"المهمة {job_id}: انتهت صلاحية جلسة الرفع المحفوظة، سيتم إنشاء جلسة جديدة")
+                await self.jobs.run(self.jobs.update, job_id, upload_uri=None)
+                job = await self.jobs.run(self.jobs.get, job_id)
+                
+            # المهام المستأنفة مباشرة في مرحلة الرفع لم يُحجز لها من الحصة بعد
+            if not await self._admit_job(job_id, msg, SCHEDULER_UPLOAD):
+                return False
+                
+            # بدء الرفع إلى يوتيوب
+            await self.progress.edit(msg, "⬆️ جاري الرفع إلى يوتيوب...")
             
-            # رفع الفيديو
-            video_url = await self.youtube.upload_video(
-                downloaded_path,
-                title,
-                context.user_data['playlist_id']
+            show_progress = self.progress.tracker(msg, "⬆️ جاري الرفع إلى يوتيوب...")
+            
+            async def save_upload_offset(offset, total):
+                await self.jobs.run(self.jobs.update, job_id, uploaded_bytes=offset, total_bytes=total)
+                await show_progress(offset, total)
+            
+            # رفع الفيديو (مع استكمال الجلسة المحفوظة إن وجدت)
+            video_id = await self.channels.for_job(job).upload_video(
+                file_path,
+                job['title'],
+                progress_callback=save_upload_offset,
+                session_uri=job['upload_uri'],
+                session_callback=self._make_session_saver(job_id, self.channels.for_job(job)),
+                state_key=upload_state_key(job_id)
             )
             
             # تنظيف الملفات المؤقتة
-            if os.path.exists(downloaded_path):
-                os.remove(downloaded_path)
-                logger.info(f"تم حذف الملف المؤقت: {downloaded_path}")
+            self._release_job_file(job_id, file_path)
                 
-            # إعلام المستخدم بالانتهاء
-            await msg.edit_text(f"✅ تم الرفع بنجاح!\n🔗 الرابط: {video_url}")
+            await self._complete_job(job_id, msg, video_id)
+            return True
             
-            # تنظيف بيانات المستخدم
-            context.user_data.clear()
+        except Exception as e:
+            await self._fail_job(job_id, msg, e)
+            return False
+
+    async def _reuse_existing_upload(self, job_id, msg):
+        """
+        إكمال المهمة من فهرس الرفع إذا كان نفس المستند أو المحتوى مرفوعاً مسبقاً:
+        يكفي إضافة الفيديو الموجود إلى قائمة التشغيل المختارة إن لم يكن فيها.
+        هذا أيضاً مسار إعادة محاولة الإضافة إلى قائمة التشغيل بعد رفع اكتمل وفشلت إضافته
+        """
+        job = await self.jobs.run(self.jobs.get, job_id)
+        existing = self.uploads.find(job['media_key'], job['content_hash'], job['channel'])
+        if not existing:
+            return False
             
+        video_id = existing['video_id']
+        uploader = self.channels.for_job(job)
+        try:
+            if not await uploader.video_exists(video_id):
+                # حُذف الفيديو من يوتيوب؛ يُرفع من جديد
+                self.uploads.forget(video_id)
+                return False
         except Exception as e:
-            logger.error(f"خطأ في العملية: {str(e)}")
-            await msg.edit_text(f"❌ حدث خطأ: {str(e)}")
-            if 'file_path' in context.user_data and os.path.exists(context.user_data['file_path']):
-                os.remove(context.user_data['file_path'])
-            context.user_data.clear()
+            logger.warning(f"تعذر استخدام الفيديو المرفوع مسبقاً {video_id}: {str(e)}")
+            return False
+            
+        logger.info(f"المهمة {job_id}: الفيديو مرفوع مسبقاً ({video_id})، تم تخطي الرفع")
+        await self._complete_job(job_id, msg, video_id, reused=True, playlists=existing['playlists'])
+        return True
+
+    async def _admit_job(self, job_id, msg, stage):
+        """
+        حجز وحدات الحصة التي ستحتاجها المهمة، أو تأجيلها حتى تجديد الحصة.
+        تعيد True إذا قُبلت المهمة
+        """
+        job = await self.jobs.run(self.jobs.get, job_id)
+        # جلسة الرفع المحفوظة دُفعت تكلفتها عند إنشائها
+        units = 0 if job['upload_uri'] else QUOTA_COSTS['videos.insert']
+        if job['playlist_id']:
+            units += QUOTA_COSTS['playlistItems.insert']
+        decision, wait_seconds = self.channels.admit(job_id, job['channel'], units)
+        if decision == ADMIT:
+            return True
+        if decision == REJECT:
+            await self._fail_job(job_id, msg, Exception("تكلفة رفع الفيديو تتجاوز حصة يوتيوب اليومية."))
+            return False
+            
+        logger.info(f"المهمة {job_id}: تأجيل لمدة {wait_seconds:.0f} ث حتى تجديد حصة يوتيوب")
+        await self.progress.edit(
+            msg,
+            "⏳ تم استهلاك حصة يوتيوب اليومية.\n"
+            f"سيُستكمل الفيديو تلقائياً بعد تجديد الحصة (خلال {wait_seconds / 3600:.1f} ساعة تقريباً)."
+        )
+        if self.worker:
+            # لا تسحب أي عقدة المهمة قبل تجديد الحصة (مع نفس الهامش)
+            await self.jobs.run(self.jobs.update, job_id, not_before=time.time() + wait_seconds + 60)
+            return False
+        task = asyncio.create_task(self._resubmit_later(job_id, msg, stage, wait_seconds))
+        self._deferred_jobs.add(task)
+        task.add_done_callback(self._deferred_jobs.discard)
+        return False
+
+    async def _resubmit_later(self, job_id, msg, stage, delay):
+        """إعادة المهمة المؤجلة إلى المجدول بعد تجديد الحصة"""
+        # هامش قصير بعد منتصف الليل بتوقيت المحيط الهادئ
+        await asyncio.sleep(delay + 60)
+        job = await self.jobs.run(self.jobs.get, job_id)
+        if job and job['stage'] in ACTIVE_STAGES:
+            await self.scheduler.submit(job_id, msg, stage)
+
+    async def _fail_job(self, job_id, msg, error):
+        """تسجيل فشل المهمة وإعلام المستخدم وحذف ملفها المؤقت"""
+        logger.error(f"خطأ في العملية: {str(error)}")
+        await self.jobs.run(self.jobs.update, job_id, stage=STAGE_FAILED, error=str(error))
+        self.channels.release(job_id)
+        try:
+            await self.progress.edit(msg, f"❌ حدث خطأ: {str(error)}")
+            self.progress.forget(msg)
+        except Exception:
+            pass
+        job = await self.jobs.run(self.jobs.get, job_id)
+        self._release_job_file(job_id, job['file_path'])
+
+    async def _complete_job(self, job_id, msg, video_id, reused=False, playlists=()):
+        """
+        تسجيل اكتمال المهمة وإعلام المستخدم. الفيديو الجديد يُسجل في فهرس الرفع قبل إضافته إلى
+        قائمة التشغيل، ففشل الإضافة (أو توقف البوت قبلها) لا يفشل المهمة ولا يعيد الرفع:
+        إعادة المهمة أو إرسال الفيديو مجدداً تعيد محاولة الإضافة وحدها.
+        playlists: قوائم التشغيل التي يوجد فيها الفيديو المرفوع مسبقاً
+        """
+        job = await self.jobs.run(self.jobs.get, job_id)
+        video_url = YouTubeUploader.video_url(video_id)
+        if not reused:
+            self.uploads.record(
+                video_id,
+                media_key=job['media_key'],
+                content_hash=job['content_hash'],
+                size=job['total_bytes'],
+                channel=job['channel']
+            )
+            
+        playlist_error = None
+        playlist_id = job['playlist_id']
+        if playlist_id and playlist_id not in playlists:
+            try:
+                await self.channels.for_job(job).add_to_playlist(video_id, playlist_id)
+                self.uploads.add_playlist(video_id, playlist_id)
+            except Exception as e:
+                logger.error(f"المهمة {job_id}: تعذرت إضافة الفيديو {video_id} إلى قائمة التشغيل: {str(e)}")
+                playlist_error = f"تعذرت الإضافة إلى قائمة التشغيل: {str(e)}"
+                
+        await self.jobs.run(self.jobs.update, job_id, stage=STAGE_DONE, video_url=video_url, error=playlist_error)
+        self.channels.release(job_id)
+        if reused:
+            text = f"✅ هذا الفيديو مرفوع مسبقاً!\n🔗 الرابط: {video_url}"
+        else:
+            text = f"✅ تم الرفع بنجاح!\n🔗 الرابط: {video_url}"
+        if playlist_error:
+            text += "\n⚠️ تعذرت إضافة الفيديو إلى قائمة التشغيل. أعد إرساله لإعادة محاولة الإضافة فقط دون رفعه من جديد."
+        await self.progress.edit(msg, text)
+        self.progress.forget(msg)
+
+    def _release_job_file(self, job_id, file_path):
+        """
+        إنهاء استخدام المهمة لملفها: ملفات ذاكرة الوسائط تبقى لمهام أخرى،
+        وبقية الملفات المؤقتة تُحذف. تُحذف أيضاً حالة جلسة الرفع الخاصة بالمهمة
+        """
+        if not file_path:
+            return
+        if not self.media_cache.release(file_path, job_id):
+            try:
+                # الحذف يكتمل في مجمع خيوط الملفات دون إيقاف حلقة الأحداث
+                if file_io.delete(file_path):
+                    logger.info(f"تم حذف الملف المؤقت: {file_path}")
+            except Exception as e:
+                logger.error(f"فشل في حذف الملف المؤقت: {str(e)}")
+        try:
+            clear_upload_state(file_path)
+            clear_upload_state(file_path, upload_state_key(job_id))
+        except Exception as e:
+            logger.error(f"فشل في حذف حالة جلسة الرفع: {str(e)}")
+
+    async def resume_jobs(self):
+        """استئناف المهام غير المكتملة من التشغيل السابق"""
+        # عند فصل الواجهة عن العقد العاملة تستأنف العقد المهام بسحبها من المخزن
+        if self._jobs_resumed or self.role != ROLE_ALL:
+            return
+            
+        jobs = await self.jobs.run(self.jobs.active_jobs)
+        if not jobs:
+            self._jobs_resumed = True
+            return
+            
+        if not await self.initialize_youtube():
+            logger.warning("تعذر تهيئة يوتيوب، سيتم استئناف المهام بعد المصادقة عبر /auth")
+            return
+            
+        self._jobs_resumed = True
+        logger.info(f"استئناف {len(jobs)} مهمة غير مكتملة")
+        for job in jobs:
+            # مهام الدفعات التي لم تبدأ بعد تُرسل رسالتها عند بدء تنفيذها
+            if not job['status_message_id'] and job['stage'] == STAGE_PENDING:
+                await self._enqueue_job(job)
+                continue
+            try:
+                msg = await self.app.bot.send_message(
+                    chat_id=job['chat_id'],
+                    text=f"🔄 جاري استئناف رفع الفيديو: {job['title']}"
+                )
+            except Exception as e:
+                logger.error(f"تعذر إرسال رسالة الاستئناف للمهمة {job['id']}: {str(e)}")
+                continue
+            await self._enqueue_job(job, msg)
 
     async def set_admin_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """تعيين المستخدم الحالي كمسؤول"""
@@ -458,42 +999,49 @@ class UploadBot:
             )
             return
             
+        # التحقق من توكن كل قناة (أو القناة الافتراضية إن لم توجد أي قناة)
+        channels = SessionManager.list_channels() or [DEFAULT_YOUTUBE_CHANNEL]
+        for channel in channels:
+            prefix = f"📺 {channel}: " if len(channels) > 1 else ""
+            await self._check_channel_auth(update, channel, prefix)
+
+    async def _check_channel_auth(self, update, channel, prefix=""):
+        """التحقق من صلاحية توكن قناة واحدة وتجديده إن أمكن"""
         # التحقق من وجود ملف التوكن
-        token_exists = os.path.exists(YOUTUBE_TOKEN_PICKLE)
+        token_exists = os.path.exists(SessionManager.token_path(channel))
         
         if token_exists:
             # محاولة التحقق من صلاحية التوكن
             try:
-                creds = SessionManager._load_credentials()
+                creds = SessionManager._load_credentials(channel)
                 if creds and creds.valid:
                     await update.message.reply_text(
-                        "✅ المصادقة مع يوتيوب صالحة وتعمل بشكل جيد!"
+                        f"{prefix}✅ المصادقة مع يوتيوب صالحة وتعمل بشكل جيد!"
                     )
                 elif creds and creds.expired and creds.refresh_token:
                     await update.message.reply_text(
-                        "⚠️ توكن يوتيوب منتهي الصلاحية ولكن يمكن تجديده. جاري المحاولة..."
+                        f"{prefix}⚠️ توكن يوتيوب منتهي الصلاحية ولكن يمكن تجديده. جاري المحاولة..."
                     )
                     try:
-                        creds.refresh(Request())
-                        SessionManager._save_credentials(creds)
+                        await SessionManager.refresh_credentials(channel)
                         await update.message.reply_text(
-                            "✅ تم تجديد التوكن بنجاح!"
+                            f"{prefix}✅ تم تجديد التوكن بنجاح!"
                         )
                     except Exception as e:
                         await update.message.reply_text(
-                            f"❌ فشل تجديد التوكن: {str(e)}\nيرجى استخدام /auth مرة أخرى."
+                            f"{prefix}❌ فشل تجديد التوكن: {str(e)}\nيرجى استخدام /auth مرة أخرى."
                         )
                 else:
                     await update.message.reply_text(
-                        "❌ توكن يوتيوب غير صالح. يرجى استخدام /auth لإعادة المصادقة."
+                        f"{prefix}❌ توكن يوتيوب غير صالح. يرجى استخدام /auth لإعادة المصادقة."
                     )
             except Exception as e:
                 await update.message.reply_text(
-                    f"❌ خطأ في التحقق من التوكن: {str(e)}\nيرجى استخدام /auth لإعادة المصادقة."
+                    f"{prefix}❌ خطأ في التحقق من التوكن: {str(e)}\nيرجى استخدام /auth لإعادة المصادقة."
                 )
         else:
             await update.message.reply_text(
-                "❌ لم يتم العثور على ملف توكن يوتيوب. يرجى استخدام /auth للمصادقة."
+                f"{prefix}❌ لم يتم العثور على ملف توكن يوتيوب. يرجى استخدام /auth للمصادقة."
             )
 
     async def send_code_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -535,11 +1083,6 @@ class UploadBot:
         # محاولة معالجة الرمز
         await update.message.reply_text(f"🔄 جاري معالجة الرمز: {code[:10]}...")
         
-        # تأكد من أن النظام ينتظر رمز مصادقة
-        if not SessionManager._waiting_for_code:
-            SessionManager._waiting_for_code = True
-            logger.info("تعيين حالة انتظار الرمز لاستقبال الرمز المرسل")
-            
         is_processed = await SessionManager.receive_auth_code(code, chat_id)
         if is_processed:
             await update.message.reply_text(
@@ -572,17 +1115,74 @@ class UploadBot:
             "/auth"
         )
 
+    async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """عرض حالة طوابير التنزيل والرفع لضبط أعداد العمال"""
+        chat_id = update.effective_chat.id
+        admin_chat_id = SessionManager.get_admin_chat_id()
+        
+        # التحقق من صلاحيات المستخدم
+        if admin_chat_id is None or chat_id != admin_chat_id:
+            await update.message.reply_text(
+                "❌ عذراً، فقط المسؤول يمكنه استخدام هذا الأمر."
+            )
+            return
+            
+        stage_names = {SCHEDULER_DOWNLOAD: "⬇️ التنزيل", SCHEDULER_UPLOAD: "⬆️ الرفع"}
+        lines = ["📊 حالة المجدول:"]
+        if self.role != ROLE_ALL:
+            leases = await self.jobs.run(self.jobs.lease_counts)
+            lines.append(f"\n🖥️ العقد العاملة ({len(leases)}):")
+            lines.extend(f"• {node}: {count} مهمة" for node, count in sorted(leases.items()))
+            lines.append(f"• بانتظار عقدة: {await self.jobs.run(self.jobs.queue_position)}")
+        # الواجهة لا تنفذ المهام بنفسها
+        stages = {} if self.role == ROLE_FRONTEND else self.scheduler.snapshot()
+        for stage, stats in stages.items():
+            lines.append(
+                f"\n{stage_names[stage]}\n"
+                f"• العمال النشطون: {stats['active']}/{stats['workers']}\n"
+                f"• في الطابور: {stats['queue_depth']}\n"
+                f"• مكتملة: {stats['completed']} | فاشلة: {stats['failed']} | ملغاة: {stats['cancelled']}\n"
+                f"• متوسط الانتظار: {stats['avg_wait']:.1f} ث (الأقصى {stats['max_wait']:.1f} ث)\n"
+                f"• متوسط زمن الخدمة: {stats['avg_service']:.1f} ث"
+            )
+        for ledger in self.channels.ledgers():
+            quota = ledger.snapshot()
+            lines.append(
+                f"\n📈 حصة يوتيوب اليومية (المشروع {quota['project']}):\n"
+                f"• المستهلك: {quota['used']}/{quota['limit']} | المحجوز: {quota['reserved']}\n"
+                f"• المتبقي: {quota['remaining']} | التجديد خلال: {quota['reset_in'] / 3600:.1f} ساعة"
+            )
+        channels = self.channels.ready_channels()
+        if len(channels) > 1:
+            lines.append("\n📺 المهام الجارية لكل قناة:")
+            lines.extend(f"• {name}: {self.channels.load(name)}" for name in channels)
+        if self.mirror:
+            lines.append("\n📡 القنوات المنسوخة (آخر رسالة عولجت):")
+            lines.extend(f"• {name}: {mark or 'بانتظار أول رسالة'}" for name, mark in self.mirror.snapshot().items())
+        tuners = tuner_snapshots()
+        if tuners:
+            lines.append("\n📐 أحجام الأجزاء:")
+            for name, tuner in tuners.items():
+                lines.append(
+                    f"• {name}: {tuner['chunk_size'] / 1024:.0f}KB | "
+                    f"المعدل: {tuner['throughput'] / (1024 * 1024):.2f}MB/s | "
+                    f"الأخطاء: {tuner['error_rate']:.0%}"
+                )
+        await update.message.reply_text("\n".join(lines))
+
     async def cancel_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """إلغاء العملية الجارية وتنظيف البيانات"""
         try:
-            # تنظيف البيانات المخزنة
-            if 'file_path' in context.user_data and os.path.exists(context.user_data['file_path']):
-                try:
-                    os.remove(context.user_data['file_path'])
-                    logger.info(f"تم حذف الملف المؤقت: {context.user_data['file_path']}")
-                except Exception as e:
-                    logger.error(f"فشل في حذف الملف المؤقت: {str(e)}")
-            
+            # إلغاء المهام الجارية أو المعلقة لهذه المحادثة
+            for job in await self.jobs.run(self.jobs.active_chat_jobs, update.effective_chat.id):
+                await self.jobs.run(self.jobs.update, job['id'], stage=STAGE_CANCELLED)
+                self.scheduler.cancel(job['id'])
+                self.channels.release(job['id'])
+                self._release_job_file(job['id'], job['file_path'])
+                
+            # إلغاء عمليات المصادقة التي تنتظر رمزاً من هذه المحادثة
+            SessionManager.cancel_auth(update.effective_chat.id)
+                
             # إعادة تعيين بيانات المستخدم
             context.user_data.clear()
             
@@ -593,14 +1193,55 @@ class UploadBot:
             logger.error(f"خطأ أثناء إلغاء العملية: {str(e)}")
             await update.message.reply_text(f"❌ حدث خطأ أثناء إلغاء العملية: {str(e)}")
 
+    def _metrics(self):
+        """مقاييس المجدول والحصة لنقطة /metrics في خادم webhook"""
+        metrics = []
+        for stage, stats in self.scheduler.snapshot().items():
+            labels = {'stage': stage}
+            metrics.extend([
+                ('bot_scheduler_queue_depth', labels, stats['queue_depth']),
+                ('bot_scheduler_active', labels, stats['active']),
+                ('bot_scheduler_completed_total', labels, stats['completed']),
+                ('bot_scheduler_failed_total', labels, stats['failed']),
+                ('bot_scheduler_avg_wait_seconds', labels, stats['avg_wait'])
+            ])
+        for ledger in self.channels.ledgers():
+            quota = ledger.snapshot()
+            labels = {'project': quota['project']}
+            metrics.extend([
+                ('bot_youtube_quota_used', labels, quota['used']),
+                ('bot_youtube_quota_remaining', labels, quota['remaining'])
+            ])
+        for name, tuner in tuner_snapshots().items():
+            metrics.append(('bot_chunk_size_bytes', {'direction': name}, tuner['chunk_size']))
+        return metrics
+
     async def run(self):
         try:
             logger.info("بدء تشغيل البوت...")
             await self.app.initialize()
-            await self.app.start()
-            await self.app.updater.start_polling()
+            if self.role != ROLE_FRONTEND:
+                self.scheduler.start()
+            self.progress.start()
+            SessionManager.start_token_refresher()
+            # العقدة العاملة تستخدم Bot API لتحديث رسائل الحالة فقط ولا تستقبل التحديثات
+            if self.role != ROLE_WORKER:
+                await self.app.start()
+                if ENABLE_WEBHOOK:
+                    self.webhook = WebhookServer(self.app, metrics_provider=self._metrics)
+                    await self.webhook.start()
+                else:
+                    await self.app.updater.start_polling()
+            
+            logger.info(f"البوت يعمل الآن ({self.role}). اضغط Ctrl+C للإيقاف.")
             
-            logger.info("البوت يعمل الآن. اضغط Ctrl+C للإيقاف.")
+            if self.mirror:
+                await self.mirror.start()
+            if self.worker:
+                self.worker.start()
+            # استئناف المهام المنقطعة إذا كان توكن يوتيوب متاحاً دون مصادقة تفاعلية
+            elif SessionManager.list_channels():
+                asyncio.create_task(self.resume_jobs())
             # Use asyncio.Event() for clean shutdown
             stop_event = asyncio.Event()
             await stop_event.wait()
@@ -614,10 +1255,31 @@ class UploadBot:
         finally:
             logger.info("إيقاف البوت وتنظيف الموارد...")
             try:
-                await self.app.updater.stop()
-                await self.app.stop()
+                if self.webhook:
+                    # معالجة التحديثات المستلمة قبل إيقاف المجدول
+                    await self.webhook.stop()
+                elif self.app.updater.running:
+                    await self.app.updater.stop()
+                if self.mirror:
+                    await self.mirror.stop()
+                await self.scheduler.stop()
+                if self.worker:
+                    # إعادة المهام غير المكتملة إلى المخزن لتسحبها عقدة أخرى
+                    await self.worker.stop()
+                await self.progress.stop()
+                for task in list(self._deferred_jobs):
+                    task.cancel()
+                await SessionManager.stop_token_refresher()
+                if self.app.running:
+                    await self.app.stop()
                 await self.app.shutdown()
                 await self.telegram_downloader.stop()
+                self.telegram_downloader.entities.close()
+                await self.channels.close()
+                self.jobs.close()
+                self.uploads.close()
+                # انتظار اكتمال حذف الملفات المؤقتة المعلق
+                file_io.shutdown()
                 logger.info("تم إغلاق البوت بنجاح.")
             except Exception as e:
                 logger.error(f"حدث خطأ أثناء إيقاف البوت: {str(e)}")
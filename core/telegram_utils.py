@@ -1,22 +1,54 @@
-from telethon import TelegramClient
-from telethon.sessions import StringSession, MemorySession
+from telethon import TelegramClient, types, utils
+from telethon.errors import ChannelInvalidError, ChannelPrivateError, PeerIdInvalidError
+from telethon.sessions import SQLiteSession, MemorySession
 import os
+import time
 import logging
 import asyncio
+import inspect
 import re
 from config.config import (
     TELEGRAM_API_ID, 
     TELEGRAM_API_HASH, 
     TELEGRAM_BOT_TOKEN, 
     USE_MEMORY_SESSION, 
-    TEMP_DOWNLOAD_PATH
+    TELEGRAM_SESSION_PATH,
+    TEMP_DOWNLOAD_PATH,
+    PIPELINE_CHUNK_SIZE,
+    ENABLE_PARALLEL_DOWNLOAD,
+    PARALLEL_DOWNLOAD_MIN_SIZE,
+    MAX_BULK_MESSAGES
 )
+from core.parallel_download import ParallelDownloader
+from core.autotune import download_tuner
+from core.entity_cache import EntityCache
+from core import file_io
+from utils.retry import retry_async
 
 logger = logging.getLogger(__name__)
 
+# روابط رسائل تيليجرام: قناة عامة أو مجموعة خاصة (c/<id>)، برقم رسالة أو نطاق (100-300)
+# أو برسالة فرعية في مجموعة خاصة (c/<id>/<رقم>/<رقم فرعي>)
+LINK_PATTERN = re.compile(
+    r'https?://(?:t|telegram)\.(?:me|dog)/(?:c/(\d+)|([A-Za-z0-9_]+))/(\d+)(?:-(\d+)|/(\d+))?'
+)
+# أقصى عدد رسائل في طلب get_messages واحد
+GET_MESSAGES_BATCH = 100
+# أقصى عدد عناصر الألبوم (رسائل متتالية تشترك في grouped_id)
+ALBUM_MAX_SIZE = 10
+
+def node_session_path(node_id):
+    """ملف جلسة مستقل لكل عقدة عاملة (لا تتشارك العمليات ملف جلسة SQLite واحداً)"""
+    base, ext = os.path.splitext(TELEGRAM_SESSION_PATH)
+    return f"{base}-{node_id}{ext}"
+
+
 class TelegramDownloader:
-    def __init__(self):
+    def __init__(self, session_path=TELEGRAM_SESSION_PATH):
         self.client = None
+        self.session_path = session_path
+        # معرفات القنوات وaccess_hash محفوظة بين التشغيلات
+        self.entities = EntityCache()
         self._initialize_client()
 
     def _initialize_client(self):
@@ -26,9 +58,9 @@ class TelegramDownloader:
                 logger.info("استخدام جلسة في الذاكرة لـ Telethon")
                 self.client = TelegramClient(MemorySession(), TELEGRAM_API_ID, TELEGRAM_API_HASH)
             else:
-                # استخدام StringSession لتخزين أكثر كفاءة
-                logger.info("استخدام جلسة StringSession لـ Telethon")
-                self.client = TelegramClient(StringSession(), TELEGRAM_API_ID, TELEGRAM_API_HASH)
+                # الجلسة المحفوظة تحتفظ بمفتاح التفويض فلا يتكرر تسجيل الدخول وتبادل المفاتيح عند كل تشغيل
+                logger.info(f"استخدام جلسة Telethon المحفوظة: {self.session_path}")
+                self.client = TelegramClient(SQLiteSession(self.session_path), TELEGRAM_API_ID, TELEGRAM_API_HASH)
             logger.info("تم إنشاء عميل Telethon بنجاح")
         except Exception as e:
             logger.error(f"فشل في إنشاء عميل Telethon: {str(e)}")
@@ -41,7 +73,11 @@ class TelegramDownloader:
         if not self.client.is_connected():
             try:
                 logger.info("جاري بدء اتصال عميل Telethon")
-                await self.client.start(bot_token=TELEGRAM_BOT_TOKEN)
+                # إعادة المحاولة مع تأخير أسي واحترام FloodWait عند تسجيل الدخول
+                await retry_async(
+                    lambda: self.client.start(bot_token=TELEGRAM_BOT_TOKEN),
+                    "بدء عميل Telethon"
+                )
                 logger.info("تم تشغيل عميل Telethon بنجاح")
                 return True
             except Exception as e:
@@ -58,47 +94,191 @@ class TelegramDownloader:
             except Exception as e:
                 logger.error(f"خطأ عند إيقاف عميل Telethon: {str(e)}")
 
-    async def download_media_from_link(self, channel_username, message_id, progress_callback=None):
-        """تحميل وسائط من رسالة تيليجرام باستخدام اسم المستخدم ورقم الرسالة"""
-        try:
-            if not await self.start():
-                raise Exception("فشل في الاتصال بـ Telegram")
+    async def resolve_peer(self, key):
+        """
+        InputPeer للقناة من الذاكرة الدائمة دون أي طلب شبكة، أو بحلها من تيليجرام
+        (طلب ResolveUsername) وتخزينها عند عدم وجودها أو انتهاء صلاحيتها
+        """
+        peer = self.entities.get(key)
+        if peer is not None:
+            return peer
+        logger.info(f"جاري حل {key} من تيليجرام")
+        entity = await retry_async(lambda: self.client.get_entity(key), f"حل {key}")
+        peer = utils.get_input_peer(entity)
+        self.entities.put(key, peer)
+        return peer
 
-            # محاولة الحصول على الرسالة
-            logger.info(f"جاري الحصول على رسالة من {channel_username} برقم {message_id}")
-            message = await self.client.get_messages(channel_username, ids=message_id)
-            
-            if not message:
-                logger.error(f"لم يتم العثور على الرسالة في {channel_username}")
-                raise Exception(f"لم يتم العثور على الرسالة في {channel_username}")
-                
-            if not message.media:
-                logger.error(f"لا توجد وسائط في الرسالة من {channel_username}")
-                raise Exception(f"لا توجد وسائط في الرسالة")
+    async def get_public_message(self, channel_username, message_id):
+        """الحصول على رسالة تحتوي وسائط من قناة أو مجموعة عامة"""
+        if not await self.start():
+            raise Exception("فشل في الاتصال بـ Telegram")
 
-            # تحديد اسم الملف
-            file_name = f"{channel_username}_{message_id}.mp4"
-            file_path = os.path.join(TEMP_DOWNLOAD_PATH, file_name)
+        # محاولة الحصول على الرسالة
+        logger.info(f"جاري الحصول على رسالة من {channel_username} برقم {message_id}")
+        peer = await self.resolve_peer(channel_username)
+        try:
+            message = await self.client.get_messages(peer, ids=message_id)
+        except (ChannelInvalidError, ChannelPrivateError, PeerIdInvalidError) as e:
+            # ربما انتقل اسم المستخدم إلى قناة أخرى أو تغير access_hash: حل الاسم من جديد مرة واحدة
+            logger.warning(f"الكيان المخزن لـ {channel_username} لم يعد صالحاً: {str(e)}")
+            self.entities.forget(channel_username)
+            peer = await self.resolve_peer(channel_username)
+            message = await self.client.get_messages(peer, ids=message_id)
+        
+        if not message:
+            logger.error(f"لم يتم العثور على الرسالة في {channel_username}")
+            raise Exception(f"لم يتم العثور على الرسالة في {channel_username}")
             
-            # تحميل الملف مع callback للتقدم
-            logger.info(f"بدء تحميل الوسائط إلى {file_path}")
+        if not message.media:
+            logger.error(f"لا توجد وسائط في الرسالة من {channel_username}")
+            raise Exception(f"لا توجد وسائط في الرسالة")
+
+        return message
+
+    async def get_chat_message(self, chat_id, message_id):
+        """الحصول على رسالة وسائط أُرسلت مباشرة إلى البوت بمعرف المحادثة والرسالة"""
+        if not await self.start():
+            raise Exception("فشل في الاتصال بـ Telegram")
+
+        # أرقام الرسائل في المحادثات الخاصة والمجموعات العادية فريدة على مستوى الحساب
+        # فتُجلب دون كيان المحادثة؛ أما القنوات والمجموعات الخارقة (-100...) فتحتاج الكيان
+        peer = chat_id if str(chat_id).startswith('-100') else None
+        logger.info(f"جاري الحصول على الرسالة {message_id} من المحادثة {chat_id}")
+        message = await self.client.get_messages(peer, ids=message_id)
+
+        if not message:
+            logger.error(f"لم يتم العثور على الرسالة {message_id} في المحادثة {chat_id}")
+            raise Exception("لم يتم العثور على الرسالة")
+
+        if not message.media:
+            logger.error(f"لا توجد وسائط في الرسالة {message_id}")
+            raise Exception(f"لا توجد وسائط في الرسالة")
+
+        return message
+
+    async def get_link_message(self, link_info):
+        """الحصول على رسالة الوسائط المشار إليها برابط تم تحليله أو برسالة مرسلة للبوت"""
+        if link_info['type'] == 'public':
+            return await self.get_public_message(
+                link_info['channel_username'],
+                link_info['message_id']
+            )
+        if link_info['type'] == 'message':
+            return await self.get_chat_message(
+                link_info['chat_id'],
+                link_info['message_id']
+            )
+        return await self.get_private_message(
+            link_info['chat_id'],
+            link_info['message_id'],
+            link_info['sub_message_id']
+        )
+
+    @staticmethod
+    def get_media_size(message):
+        """حجم ملف الوسائط بالبايت، أو None إذا لم يكن معروفاً"""
+        file = getattr(message, 'file', None)
+        return file.size if file and file.size else None
+
+    async def iter_media(self, message, chunk_size=PIPELINE_CHUNK_SIZE):
+        """بث محتوى الوسائط على شكل أجزاء متتالية دون كتابتها على القرص"""
+        async for chunk in self.client.iter_download(message.media, request_size=chunk_size):
+            yield chunk
+
+    async def _download_sequential(self, message, file_path, file_size, progress_callback=None, start_offset=0, offset_callback=None):
+        """تنزيل تسلسلي قابل للاستئناف من موضع محدد"""
+        # حجم الطلب من الضابط التلقائي ضمن حد iter_download (قوة للعدد 2 فيبقى الاستئناف محاذياً)
+        tuner = download_tuner()
+        request_size = min(tuner.chunk_size, PIPELINE_CHUNK_SIZE)
+        # يجب أن يكون موضع البدء من مضاعفات حجم الطلب
+        start_offset -= start_offset % request_size
+        if start_offset:
+            logger.info(f"استئناف التنزيل من البايت {start_offset}")
+        
+        # عمليات القرص تتم في مجمع خيوط الملفات فلا تتوقف حلقة الأحداث أثناء الكتابة
+        fd = await file_io.open_file(file_path)
+        try:
+            # الملف يبدأ من موضع الاستئناف ويُحجز باقيه مسبقاً
+            await file_io.truncate(fd, start_offset)
+            await file_io.preallocate(fd, file_size)
+            downloaded = start_offset
+            received_at = time.monotonic()
+            async for chunk in self.client.iter_download(message.media, offset=start_offset, request_size=request_size):
+                tuner.record(len(chunk), time.monotonic() - received_at)
+                await file_io.pwrite(fd, chunk, downloaded)
+                downloaded += len(chunk)
+                if progress_callback:
+                    result = progress_callback(downloaded, file_size)
+                    if inspect.isawaitable(result):
+                        await result
+                if offset_callback:
+                    offset_callback(downloaded)
+                # وقت الكتابة وتحديث التقدم لا يُحتسب من زمن النقل
+                received_at = time.monotonic()
+            # إزالة المساحة المحجوزة الزائدة والتأكد من وصول البيانات إلى القرص قبل اعتبار الملف مكتملاً
+            await file_io.truncate(fd, downloaded)
+            await file_io.fsync(fd)
+        finally:
+            os.close(fd)
+        return file_path
+
+    async def download_message_media(self, message, file_path, progress_callback=None, start_offset=0, offset_callback=None):
+        """تحميل وسائط رسالة إلى مسار محدد مع إمكانية الاستئناف من start_offset"""
+        logger.info(f"بدء تحميل الوسائط إلى {file_path}")
+        
+        # الملفات الكبيرة تُنزّل عبر عدة اتصالات متوازية
+        file_size = self.get_media_size(message)
+        if ENABLE_PARALLEL_DOWNLOAD and file_size and file_size >= PARALLEL_DOWNLOAD_MIN_SIZE:
+            try:
+                downloaded_path = await ParallelDownloader(self.client).download(
+                    message.media,
+                    file_path,
+                    file_size,
+                    progress_callback=progress_callback,
+                    start_offset=start_offset,
+                    offset_callback=offset_callback
+                )
+                logger.info(f"تم تحميل الوسائط بنجاح إلى {downloaded_path}")
+                return downloaded_path
+            except Exception as e:
+                logger.warning(f"فشل التنزيل المتوازي، سيتم استخدام التنزيل العادي: {str(e)}")
+        
+        if file_size:
+            # الحجم معروف: تنزيل تسلسلي يسجل موضعه ليمكن استئنافه
+            downloaded_path = await self._download_sequential(
+                message,
+                file_path,
+                file_size,
+                progress_callback=progress_callback,
+                start_offset=start_offset,
+                offset_callback=offset_callback
+            )
+        else:
             downloaded_path = await self.client.download_media(
                 message.media,
                 file_path,
                 progress_callback=progress_callback
             )
-            
-            if downloaded_path:
-                logger.info(f"تم تحميل الوسائط بنجاح إلى {downloaded_path}")
-                return downloaded_path
-            else:
-                logger.error("فشل تحميل الوسائط")
-                return None
-            
-        except Exception as e:
-            logger.error(f"خطأ في تحميل الوسائط: {str(e)}")
-            raise
-            
+        
+        if downloaded_path:
+            logger.info(f"تم تحميل الوسائط بنجاح إلى {downloaded_path}")
+            return downloaded_path
+        else:
+            logger.error("فشل تحميل الوسائط")
+            return None
+
+    @staticmethod
+    def get_link_file_path(link_info):
+        """مسار الملف المؤقت الذي ستُنزّل إليه وسائط الرابط"""
+        if link_info['type'] == 'public':
+            file_name = f"{link_info['channel_username']}_{link_info['message_id']}.mp4"
+        elif link_info['type'] == 'message':
+            file_name = f"message_{link_info['chat_id']}_{link_info['message_id']}.mp4"
+        else:
+            target_message_id = link_info['sub_message_id'] or link_info['message_id']
+            file_name = f"private_{link_info['chat_id']}_{target_message_id}.mp4"
+        return os.path.join(TEMP_DOWNLOAD_PATH, file_name)
+
     async def parse_telegram_link(self, link):
         """تحليل رابط تيليجرام وتحديد ما إذا كان يشير إلى مجموعة خاصة أو قناة عامة"""
         try:
@@ -135,72 +315,204 @@ class TelegramDownloader:
             logger.error(f"خطأ في تحليل الرابط: {str(e)}")
             return None
             
-    async def download_media_from_private_chat(self, chat_id, message_id, sub_message_id=None, progress_callback=None):
-        """تحميل وسائط من مجموعة خاصة في تيليجرام"""
-        try:
-            if not await self.start():
-                raise Exception("فشل في الاتصال بـ Telegram")
-
-            # محاولة مختلف صيغ معرفات المجموعات الخاصة
-            target_message_id = sub_message_id if sub_message_id else message_id
-            message = None
-            entity_obtained = False
-            
-            # قائمة بصيغ معرفات المجموعات الخاصة المختلفة للتجربة
-            chat_id_formats = [
-                -100 + int(chat_id),             # الصيغة القياسية 1
-                -(100 + int(chat_id)),           # الصيغة القياسية 2
-                -1000000000000 - int(chat_id),   # صيغة بديلة 1
-                -100000000 - int(chat_id)        # صيغة بديلة 2
-            ]
-            
-            # تجربة كل صيغة حتى نجد واحدة تعمل
-            for full_chat_id in chat_id_formats:
-                try:
-                    logger.info(f"محاولة الوصول للمجموعة الخاصة باستخدام المعرف: {full_chat_id}")
-                    entity = await self.client.get_entity(full_chat_id)
-                    logger.info(f"تم الوصول إلى المجموعة/القناة: {getattr(entity, 'title', 'مجموعة خاصة')}")
-                    
-                    # محاولة الحصول على الرسالة
-                    message = await self.client.get_messages(full_chat_id, ids=target_message_id)
-                    if message:
-                        entity_obtained = True
-                        break
-                except Exception as e:
-                    logger.warning(f"فشلت المحاولة باستخدام {full_chat_id}: {str(e)}")
-                    continue
+    @staticmethod
+    def parse_telegram_links(text):
+        """
+        استخراج كل روابط الرسائل من النص (مع توسيع النطاقات) مجمعة حسب القناة بترتيب ورودها.
+        تعيد قائمة من {'type'، 'channel_username' أو 'chat_id'، 'message_ids'}
+        """
+        specs = {}
+        for match in LINK_PATTERN.finditer(text):
+            chat_id, channel_username, first, last, sub = match.groups()
+            if sub:
+                message_ids = [int(sub)]
+            else:
+                first, last = sorted((int(first), int(last or first)))
+                message_ids = range(first, last + 1)
+            if len(message_ids) > MAX_BULK_MESSAGES:
+                raise ValueError(f"النطاق يتجاوز الحد المسموح ({MAX_BULK_MESSAGES} رسالة)")
+                
+            key = f"c/{chat_id}" if chat_id else channel_username.lower()
+            if key not in specs:
+                specs[key] = {'type': 'private', 'chat_id': int(chat_id)} if chat_id else \
+                    {'type': 'public', 'channel_username': channel_username}
+                specs[key]['message_ids'] = []
+            specs[key]['message_ids'].extend(message_ids)
             
-            if not entity_obtained or not message:
-                logger.error(f"لم يتم العثور على المجموعة الخاصة أو الرسالة")
+        for spec in specs.values():
+            spec['message_ids'] = list(dict.fromkeys(spec['message_ids']))
+        return list(specs.values())
+
+    @staticmethod
+    def is_video(message):
+        """هل تحتوي الرسالة على فيديو (كفيديو أو كمستند من نوع فيديو)"""
+        file = getattr(message, 'file', None)
+        return bool(getattr(message, 'video', None) or (file and (file.mime_type or '').startswith('video/')))
+
+    @staticmethod
+    def _is_private_chat_peer(peer, chat_id):
+        """هل الكيان هو المجموعة نفسها (c/<id> في الرابط هو معرف القناة أو المجموعة الخارقة)"""
+        return isinstance(peer, types.InputPeerChannel) and peer.channel_id == int(chat_id)
+
+    def _cached_private_peer(self, chat_id):
+        """كيان المجموعة الخاصة من الذاكرة الدائمة (يُحذف المخزن إن لم يكن المجموعة نفسها)"""
+        cache_key = f"c/{chat_id}"
+        peer = self.entities.get(cache_key)
+        if peer is not None and not self._is_private_chat_peer(peer, chat_id):
+            logger.warning(f"الكيان المخزن للمجموعة {chat_id} ليس المجموعة نفسها، سيتم حله من جديد")
+            self.entities.forget(cache_key)
+            return None
+        return peer
+
+    def _remember_private_peer(self, chat_id, entity):
+        """
+        تخزين كيان المجموعة الخاصة فقط إذا كان المجموعة نفسها: صيغ المعرف البديلة قد تُحل إلى
+        محادثة عادية أو مستخدم يجلب منه messages.getMessages رسالة أخرى بنفس الرقم
+        """
+        peer = utils.get_input_peer(entity)
+        if self._is_private_chat_peer(peer, chat_id):
+            self.entities.put(f"c/{chat_id}", peer)
+        return peer
+
+    async def _private_peer(self, chat_id, message_id):
+        """كيان المجموعة الخاصة من الذاكرة الدائمة، أو بتجربة صيغ معرفها على رسالة منها"""
+        peer = self._cached_private_peer(chat_id)
+        if peer is None:
+            entity, message = await self._probe_private_chat(chat_id, message_id)
+            if not message:
                 raise Exception("فشل في الوصول للمجموعة الخاصة أو الرسالة. تأكد من أن البوت عضو في المجموعة.")
-                
-            if not message.media:
-                logger.error(f"لا توجد وسائط في الرسالة من المجموعة الخاصة")
-                raise Exception(f"لا توجد وسائط في الرسالة")
+            peer = self._remember_private_peer(chat_id, entity)
+        return peer
 
-            # تحديد اسم الملف
-            file_name = f"private_{chat_id}_{target_message_id}.mp4"
-            file_path = os.path.join(TEMP_DOWNLOAD_PATH, file_name)
-            
-            # تحميل الملف مع callback للتقدم
-            logger.info(f"بدء تحميل الوسائط إلى {file_path}")
-            downloaded_path = await self.client.download_media(
-                message.media,
-                file_path,
-                progress_callback=progress_callback
+    async def fetch_messages(self, peer, message_ids):
+        """جلب الرسائل على دفعات من GET_MESSAGES_BATCH رسالة لكل طلب (الرسائل المحذوفة تُتخطى)"""
+        messages = []
+        for start in range(0, len(message_ids), GET_MESSAGES_BATCH):
+            batch = message_ids[start:start + GET_MESSAGES_BATCH]
+            result = await retry_async(
+                lambda: self.client.get_messages(peer, ids=batch),
+                f"جلب {len(batch)} رسالة"
             )
+            messages.extend(message for message in result if message)
+        return messages
+
+    async def collect_link_videos(self, specs, expand_albums=True):
+        """
+        جلب رسائل الروابط المحللة بطلبات مجمعة وإرجاع الفيديوهات بترتيبها كقائمة (link_info، نص الرسالة).
+        expand_albums: الرسالة المطلوبة إذا كانت جزءاً من ألبوم تضاف معها بقية فيديوهات الألبوم.
+        تُجلب الرسائل المطلوبة أولاً، ولا تُجلب الرسائل المجاورة إلا لما كان منها في ألبوم
+        """
+        if not await self.start():
+            raise Exception("فشل في الاتصال بـ Telegram")
             
-            if downloaded_path:
-                logger.info(f"تم تحميل الوسائط بنجاح إلى {downloaded_path}")
-                return downloaded_path
+        videos = []
+        for spec in specs:
+            requested = spec['message_ids']
+            if spec['type'] == 'public':
+                peer = await self.resolve_peer(spec['channel_username'])
             else:
-                logger.error("فشل تحميل الوسائط")
-                return None
+                peer = await self._private_peer(spec['chat_id'], requested[0])
+                
+            requested = set(requested)
+            messages = await self.fetch_messages(peer, sorted(requested))
+            if expand_albums:
+                # عناصر الألبوم متتالية، فتكفي الرسائل المجاورة لكل رسالة مطلوبة في ألبوم
+                neighbours = set()
+                for message in messages:
+                    if message.grouped_id:
+                        neighbours.update(range(max(1, message.id - ALBUM_MAX_SIZE + 1), message.id + ALBUM_MAX_SIZE))
+                neighbours -= requested
+                if neighbours:
+                    messages += await self.fetch_messages(peer, sorted(neighbours))
+                    logger.info(f"تم جلب {len(neighbours)} رسالة مجاورة لألبومات الرسائل المطلوبة")
             
-        except Exception as e:
-            logger.error(f"خطأ في تحميل الوسائط من المجموعة الخاصة: {str(e)}")
-            raise
+            albums = {message.grouped_id for message in messages if message.id in requested and message.grouped_id}
+            for message in sorted(messages, key=lambda message: message.id):
+                if message.id not in requested and not (message.grouped_id and message.grouped_id in albums):
+                    continue
+                if not self.is_video(message):
+                    continue
+                if spec['type'] == 'public':
+                    link_info = {'type': 'public', 'channel_username': spec['channel_username'], 'message_id': message.id}
+                else:
+                    link_info = {'type': 'private', 'chat_id': spec['chat_id'], 'message_id': message.id, 'sub_message_id': None}
+                videos.append((link_info, message.message or ''))
+        return videos
+
+    async def get_private_message(self, chat_id, message_id, sub_message_id=None):
+        """الحصول على رسالة تحتوي وسائط من مجموعة خاصة"""
+        if not await self.start():
+            raise Exception("فشل في الاتصال بـ Telegram")
+
+        target_message_id = sub_message_id if sub_message_id else message_id
+        message = None
+        
+        # الكيان الذي نجح سابقاً لنفس المجموعة يُستخدم مباشرة لجلب الرسالة
+        peer = self._cached_private_peer(chat_id)
+        if peer is not None:
+            try:
+                message = await self.client.get_messages(peer, ids=target_message_id)
+            except Exception as e:
+                logger.warning(f"الكيان المخزن للمجموعة {chat_id} لم يعد صالحاً: {str(e)}")
+                self.entities.forget(f"c/{chat_id}")
+        
+        if not message:
+            entity, message = await self._probe_private_chat(chat_id, target_message_id)
+            if message:
+                self._remember_private_peer(chat_id, entity)
+        
+        if not message:
+            logger.error(f"لم يتم العثور على المجموعة الخاصة أو الرسالة")
+            raise Exception("فشل في الوصول للمجموعة الخاصة أو الرسالة. تأكد من أن البوت عضو في المجموعة.")
+            
+        if not message.media:
+            logger.error(f"لا توجد وسائط في الرسالة من المجموعة الخاصة")
+            raise Exception(f"لا توجد وسائط في الرسالة")
+
+        return message
+
+    async def _probe_private_chat(self, chat_id, message_id):
+        """
+        تجربة صيغة المعرف الكاملة -100<id> أولاً، ثم الصيغ البديلة بالتوازي إذا فشلت (أول صيغة
+        تصل إلى الرسالة تفوز وتُلغى البقية). تعيد (الكيان، الرسالة) أو (None، None)
+        """
+        canonical_id = int(f"-100{chat_id}")  # صيغة المعرف الكاملة للقنوات والمجموعات الخارقة
+        fallback_formats = [
+            -100 + int(chat_id),             # الصيغة القياسية 1
+            -(100 + int(chat_id)),           # الصيغة القياسية 2
+            -1000000000000 - int(chat_id),   # صيغة بديلة 1
+            -100000000 - int(chat_id)        # صيغة بديلة 2
+        ]
+        
+        async def probe(full_chat_id):
+            try:
+                entity = await self.client.get_entity(full_chat_id)
+                message = await self.client.get_messages(entity, ids=message_id)
+            except Exception as e:
+                logger.warning(f"فشلت المحاولة باستخدام {full_chat_id}: {str(e)}")
+                return None, None
+            if message:
+                logger.info(f"تم الوصول إلى المجموعة/القناة: {getattr(entity, 'title', 'مجموعة خاصة')} ({full_chat_id})")
+            return entity, message
+        
+        entity, message = await probe(canonical_id)
+        if message:
+            return entity, message
             
+        tasks = [
+            asyncio.create_task(probe(full_chat_id))
+            for full_chat_id in dict.fromkeys(fallback_formats) if full_chat_id != canonical_id
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                entity, message = await next_done
+                if message:
+                    return entity, message
+        finally:
+            for task in tasks:
+                task.cancel()
+        return None, None
+
     async def download_from_any_link(self, link, progress_callback=None):
         """تحميل وسائط من أي رابط تيليجرام (عام أو خاص)"""
         try:
@@ -210,21 +522,8 @@ class TelegramDownloader:
             if not link_info:
                 raise Exception("صيغة الرابط غير صالحة")
                 
-            if link_info['type'] == 'public':
-                # رابط عام
-                return await self.download_media_from_link(
-                    link_info['channel_username'], 
-                    link_info['message_id'],
-                    progress_callback
-                )
-            else:
-                # رابط مجموعة خاصة
-                return await self.download_media_from_private_chat(
-                    link_info['chat_id'],
-                    link_info['message_id'],
-                    link_info['sub_message_id'],
-                    progress_callback
-                )
+            message = await self.get_link_message(link_info)
+            return await self.download_message_media(message, self.get_link_file_path(link_info), progress_callback)
                 
         except Exception as e:
             logger.error(f"خطأ في تحميل الوسائط من الرابط: {str(e)}")
@@ -4,6 +4,7 @@ import os
 import logging
 import asyncio
 from config import TELEGRAM_API_ID, TELEGRAM_API_HASH, TELEGRAM_BOT_TOKEN, USE_MEMORY_SESSION
+from utils.retry import Backoff, retry_async
 
 logger = logging.getLogger(__name__)
 
@@ -29,20 +30,21 @@ class TelegramDownloader:
         if not self.client:
             self._initialize_client()
         
-        for attempt in range(max_retries):
-            try:
-                if not self.client.is_connected():
-                    await self.client.start(bot_token=TELEGRAM_BOT_TOKEN)
-                    logger.info("تم تشغيل عميل Telethon بنجاح")
-                    return True
-                return True
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    logger.warning(f"محاولة الاتصال {attempt + 1} فشلت: {str(e)}. إعادة المحاولة بعد {retry_delay} ثوان...")
-                    await asyncio.sleep(retry_delay)
-                else:
-                    logger.error(f"فشل في بدء عميل Telethon بعد {max_retries} محاولات: {str(e)}")
-                    return False
+        if self.client.is_connected():
+            return True
+        try:
+            # retry_delay أقل تأخير، ويزداد أسياً مع ارتعاش (أو حسب FloodWait)
+            await retry_async(
+                lambda: self.client.start(bot_token=TELEGRAM_BOT_TOKEN),
+                "بدء عميل Telethon",
+                max_attempts=max_retries,
+                backoff=Backoff(base=retry_delay)
+            )
+            logger.info("تم تشغيل عميل Telethon بنجاح")
+            return True
+        except Exception as e:
+            logger.error(f"فشل في بدء عميل Telethon بعد {max_retries} محاولات: {str(e)}")
+            return False
 
     async def stop(self):
         if self.client and self.client.is_connected():
@@ -0,0 +1,113 @@
+"""
+فهرس دائم للفيديوهات المرفوعة إلى يوتيوب حسب هوية الوسائط لتجنب إعادة رفعها
+"""
+import time
+import sqlite3
+import logging
+import threading
+
+from config.config import JOBS_DB_PATH, JOBS_DB_BUSY_TIMEOUT, DEFAULT_YOUTUBE_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    video_id TEXT PRIMARY KEY,
+    media_key TEXT,
+    content_hash TEXT,
+    size INTEGER,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_uploads_media_key ON uploads (media_key);
+CREATE INDEX IF NOT EXISTS idx_uploads_content_hash ON uploads (content_hash);
+CREATE TABLE IF NOT EXISTS upload_playlists (
+    video_id TEXT NOT NULL,
+    playlist_id TEXT NOT NULL,
+    PRIMARY KEY (video_id, playlist_id)
+);
+"""
+
+# أعمدة أضيفت بعد الإصدار الأول من الجدول
+_ADDED_COLUMNS = {
+    'channel': 'TEXT'  # قناة يوتيوب التي رُفع إليها الفيديو (NULL للقناة الافتراضية)
+}
+
+
+class UploadIndex:
+    """ربط معرف مستند تيليجرام وبصمة المحتوى بمعرف فيديو يوتيوب وقوائم التشغيل التي أضيف إليها"""
+
+    def __init__(self, db_path=JOBS_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=JOBS_DB_BUSY_TIMEOUT, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(_SCHEMA)
+            existing = {row['name'] for row in self._conn.execute("PRAGMA table_info(uploads)")}
+            for name, column_type in _ADDED_COLUMNS.items():
+                if name not in existing:
+                    self._conn.execute(f"ALTER TABLE uploads ADD COLUMN {name} {column_type}")
+
+    def find(self, media_key=None, content_hash=None, channel=None):
+        """
+        البحث عن فيديو مرفوع مسبقاً إلى القناة بنفس المستند أو نفس المحتوى.
+        تعيد {'video_id', 'playlists'} أو None
+        """
+        conditions, params = [], []
+        if media_key:
+            conditions.append("media_key = ?")
+            params.append(media_key)
+        if content_hash:
+            conditions.append("content_hash = ?")
+            params.append(content_hash)
+        if not conditions:
+            return None
+
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT video_id FROM uploads WHERE ({' OR '.join(conditions)}) "
+                "AND COALESCE(channel, ?) = ? ORDER BY created_at DESC LIMIT 1",
+                (*params, DEFAULT_YOUTUBE_CHANNEL, channel or DEFAULT_YOUTUBE_CHANNEL)
+            ).fetchone()
+            if row is None:
+                return None
+            playlists = {
+                item['playlist_id'] for item in self._conn.execute(
+                    "SELECT playlist_id FROM upload_playlists WHERE video_id = ?", (row['video_id'],)
+                )
+            }
+        return {'video_id': row['video_id'], 'playlists': playlists}
+
+    def record(self, video_id, media_key=None, content_hash=None, size=None, playlist_id=None, channel=None):
+        """تسجيل فيديو تم رفعه"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads (video_id, media_key, content_hash, size, channel, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, media_key, content_hash, size, channel, time.time())
+            )
+            if playlist_id:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO upload_playlists (video_id, playlist_id) VALUES (?, ?)",
+                    (video_id, playlist_id)
+                )
+        logger.info(f"تم تسجيل الفيديو {video_id} في فهرس الرفع")
+
+    def add_playlist(self, video_id, playlist_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO upload_playlists (video_id, playlist_id) VALUES (?, ?)",
+                (video_id, playlist_id)
+            )
+
+    def forget(self, video_id):
+        """إزالة فيديو لم يعد موجوداً على يوتيوب"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM upload_playlists WHERE video_id = ?", (video_id,))
+            self._conn.execute("DELETE FROM uploads WHERE video_id = ?", (video_id,))
+        logger.info(f"تمت إزالة الفيديو {video_id} من فهرس الرفع")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
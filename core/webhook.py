@@ -0,0 +1,170 @@
+"""
+خادم aiohttp لاستقبال تحديثات تيليجرام عبر webhook مع نقاط فحص الحالة والمقاييس
+"""
+import time
+import hmac
+import asyncio
+import logging
+import secrets
+
+from aiohttp import web
+from telegram import Update
+
+from config.config import (
+    WEBHOOK_URL,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_WORKERS,
+    WEBHOOK_QUEUE_SIZE,
+    WEBHOOK_DRAIN_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+# ترويسة الرمز السري التي يرسلها تيليجرام مع كل تحديث
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def _chat_id(update):
+    chat = update.effective_chat
+    return chat.id if chat else 0
+
+
+class WebhookServer:
+    """
+    يستقبل التحديثات ويوزعها على عمال المعالجة حسب المحادثة، فتُعالج تحديثات المحادثة
+    الواحدة بالترتيب (اختيار القائمة قبل العنوان مثلاً) بينما تُعالج المحادثات المختلفة بالتوازي.
+    metrics_provider: دالة تعيد قائمة (الاسم، الوسوم، القيمة) تضاف إلى /metrics
+    """
+
+    def __init__(self, application, metrics_provider=None, workers=WEBHOOK_WORKERS):
+        self.application = application
+        self.metrics_provider = metrics_provider
+        # رمز عشوائي لكل تشغيل إذا لم يُحدد رمز ثابت (يُسجل مع الـ webhook عند كل بدء)
+        self.secret_token = WEBHOOK_SECRET_TOKEN or secrets.token_urlsafe(32)
+        self._worker_count = max(1, workers)
+        self._queues = []
+        self._workers = []
+        self._runner = None
+        self._draining = False
+        self._started_at = None
+        self.counters = {'received': 0, 'processed': 0, 'failed': 0, 'rejected': 0, 'dropped': 0}
+        self._processing_seconds = 0.0
+
+    async def start(self):
+        """تشغيل العمال والخادم وتسجيل عنوان الـ webhook لدى تيليجرام"""
+        per_worker = max(1, WEBHOOK_QUEUE_SIZE // self._worker_count)
+        self._queues = [asyncio.Queue(maxsize=per_worker) for _ in range(self._worker_count)]
+        self._workers = [asyncio.create_task(self._worker(queue)) for queue in self._queues]
+
+        app = web.Application()
+        app.router.add_post(WEBHOOK_PATH, self._handle_update)
+        app.router.add_get('/health', self._handle_health)
+        app.router.add_get('/metrics', self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, WEBHOOK_LISTEN, WEBHOOK_PORT).start()
+        self._started_at = time.monotonic()
+
+        await self.application.bot.set_webhook(
+            url=WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+            secret_token=self.secret_token,
+            allowed_updates=Update.ALL_TYPES
+        )
+        logger.info(f"تم تشغيل خادم webhook على {WEBHOOK_LISTEN}:{WEBHOOK_PORT} ({self._worker_count} عامل)")
+
+    async def stop(self):
+        """
+        إيقاف تدريجي: رفض التحديثات الجديدة (يعيد تيليجرام إرسالها لاحقاً)، ثم انتظار
+        معالجة التحديثات المستلمة حتى WEBHOOK_DRAIN_TIMEOUT قبل إيقاف العمال والخادم
+        """
+        self._draining = True
+        pending = sum(queue.qsize() for queue in self._queues)
+        if pending:
+            logger.info(f"في انتظار معالجة {pending} تحديث قبل إيقاف خادم webhook")
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues)),
+                timeout=WEBHOOK_DRAIN_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.warning("انتهت مهلة معالجة التحديثات المتبقية، سيتم إيقاف خادم webhook")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_update(self, request):
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ''), self.secret_token):
+            self.counters['rejected'] += 1
+            return web.Response(status=403)
+        if self._draining:
+            return web.Response(status=503)
+        try:
+            update = Update.de_json(await request.json(), self.application.bot)
+        except Exception as e:
+            logger.warning(f"تحديث غير صالح من webhook: {str(e)}")
+            self.counters['dropped'] += 1
+            return web.Response(status=400)
+
+        self.counters['received'] += 1
+        queue = self._queues[_chat_id(update) % len(self._queues)]
+        try:
+            queue.put_nowait((update, time.monotonic()))
+        except asyncio.QueueFull:
+            # رد بخطأ حتى يعيد تيليجرام إرسال التحديث بدلاً من إبقاء الاتصال مفتوحاً
+            self.counters['dropped'] += 1
+            return web.Response(status=503)
+        return web.Response()
+
+    async def _worker(self, queue):
+        while True:
+            update, received_at = await queue.get()
+            try:
+                await self.application.process_update(update)
+                self.counters['processed'] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.counters['failed'] += 1
+                logger.error(f"خطأ في معالجة التحديث {update.update_id}: {str(e)}")
+            finally:
+                self._processing_seconds += time.monotonic() - received_at
+                queue.task_done()
+
+    def _queue_depth(self):
+        return sum(queue.qsize() for queue in self._queues)
+
+    async def _handle_health(self, request):
+        status = 'draining' if self._draining else 'ok'
+        return web.json_response(
+            {
+                'status': status,
+                'uptime': time.monotonic() - self._started_at if self._started_at else 0,
+                'queue_depth': self._queue_depth(),
+                'workers': len(self._workers)
+            },
+            status=503 if self._draining else 200
+        )
+
+    async def _handle_metrics(self, request):
+        """المقاييس بصيغة Prometheus النصية"""
+        metrics = [(f'bot_webhook_updates_{name}_total', {}, value) for name, value in self.counters.items()]
+        metrics.append(('bot_webhook_queue_depth', {}, self._queue_depth()))
+        metrics.append(('bot_webhook_processing_seconds_total', {}, self._processing_seconds))
+        if self.metrics_provider:
+            try:
+                metrics.extend(self.metrics_provider())
+            except Exception as e:
+                logger.error(f"فشل في جمع المقاييس: {str(e)}")
+
+        lines = []
+        for name, labels, value in metrics:
+            label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return web.Response(text='\n'.join(lines) + '\n', content_type='text/plain')
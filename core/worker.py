@@ -0,0 +1,153 @@
+"""
+العقدة العاملة: سحب المهام من مخزن المهام المشترك بعقود مؤقتة وتنفيذها في المجدول المحلي
+"""
+import os
+import socket
+import asyncio
+import logging
+
+from config.config import (
+    NODE_ID,
+    JOB_LEASE_SECONDS,
+    JOB_HEARTBEAT_INTERVAL,
+    JOB_CLAIM_INTERVAL,
+    DOWNLOAD_WORKERS,
+    UPLOAD_WORKERS
+)
+from core.job_store import ACTIVE_STAGES, STAGE_UPLOADING
+from core.scheduler import STAGE_DOWNLOAD, STAGE_UPLOAD
+from utils.session_manager import SessionManager
+
+logger = logging.getLogger(__name__)
+
+# أدوار العملية
+ROLE_ALL = 'all'            # عملية واحدة تستقبل التحديثات وتنفذ المهام
+ROLE_FRONTEND = 'frontend'  # استقبال التحديثات وتسجيل المهام في المخزن المشترك
+ROLE_WORKER = 'worker'      # سحب المهام من المخزن وتنفيذها
+
+
+class StatusMessage:
+    """رسالة حالة المهمة معرّفة بالمحادثة والرقم، تُعدّل من أي عقدة عبر Bot API"""
+
+    def __init__(self, bot, chat_id, message_id):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+
+    async def edit_text(self, text, **kwargs):
+        return await self.bot.edit_message_text(text, chat_id=self.chat_id, message_id=self.message_id, **kwargs)
+
+
+class WorkerNode:
+    """
+    تسحب العقدة مهمة كلما توفر لديها عامل، وتجدد عقود مهامها كل JOB_HEARTBEAT_INTERVAL.
+    إذا توقفت العقدة دون إنهاء مهامها تنتهي عقودها بعد JOB_LEASE_SECONDS فتسحبها عقدة أخرى
+    وتستأنفها من حالتها المحفوظة. المهام الملغاة من الواجهة أو التي فُقد عقدها تُلغى محلياً.
+    طلبات العقود تُنفذ في خيط مخزن المهام فلا يؤخر انتظارُ قفل قاعدة البيانات حلقة الأحداث
+    """
+
+    def __init__(self, bot, node_id=NODE_ID):
+        self.bot = bot
+        self.jobs = bot.jobs
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.capacity = DOWNLOAD_WORKERS + UPLOAD_WORKERS
+        self._held = set()  # المهام المحجوزة لهذه العقدة
+        self._tasks = []
+
+    def start(self):
+        """تشغيل حلقتي السحب والنبض (يجب استدعاؤها من داخل حلقة الأحداث)"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._claim_loop()), asyncio.create_task(self._heartbeat_loop())]
+            logger.info(f"تم تشغيل العقدة العاملة {self.node_id} (حتى {self.capacity} مهمة)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # المهام التي لم تكتمل تعود إلى الطابور فوراً دون انتظار انتهاء عقودها
+        for job_id in list(self._held):
+            await self.release(job_id)
+
+    async def release(self, job_id):
+        self._held.discard(job_id)
+        await self.jobs.run(self.jobs.release_lease, job_id, self.node_id)
+
+    async def download_stage(self, job_id, msg):
+        """مرحلة التنزيل مع إنهاء العقد إذا لم تعد المهمة بحاجة إلى الرفع"""
+        # فُقد عقد المهمة أثناء انتظارها في الطابور المحلي وسحبتها عقدة أخرى
+        if job_id not in self._held:
+            return False
+        try:
+            needs_upload = await self.bot._download_stage(job_id, msg)
+        except BaseException:
+            await self.release(job_id)
+            raise
+        if not needs_upload:
+            await self.release(job_id)
+        return needs_upload
+
+    async def upload_stage(self, job_id, msg):
+        if job_id not in self._held:
+            return False
+        try:
+            return await self.bot._upload_stage(job_id, msg)
+        finally:
+            await self.release(job_id)
+
+    async def _youtube_ready(self):
+        """
+        لا مصادقة تفاعلية في العقدة العاملة: تنتظر حتى يُحفظ توكن القناة عبر /auth
+        في الواجهة ثم تهيئ اتصالها منه
+        """
+        if self.bot.youtube_initialized:
+            return True
+        return bool(SessionManager.list_channels()) and await self.bot.initialize_youtube()
+
+    async def _claim_loop(self):
+        while True:
+            if not await self._youtube_ready():
+                await asyncio.sleep(JOB_LEASE_SECONDS)
+                continue
+            job = None
+            if len(self._held) < self.capacity:
+                job = await self.jobs.run(self.jobs.claim, self.node_id, JOB_LEASE_SECONDS)
+            if job is None:
+                await asyncio.sleep(JOB_CLAIM_INTERVAL)
+                continue
+            self._held.add(job['id'])
+            try:
+                await self._submit(job)
+            except Exception as e:
+                logger.error(f"تعذر بدء المهمة {job['id']}: {str(e)}")
+                await self.release(job['id'])
+
+    async def _submit(self, job):
+        job_id = job['id']
+        logger.info(f"العقدة {self.node_id}: سحب المهمة {job_id} ({job['stage']})")
+        stage = self.bot._scheduler_stage(job)
+        # ملف مهمة في مرحلة الرفع قد يكون على قرص عقدة أخرى توقفت: يُعاد تنزيله إلى القرص فقط.
+        # تبقى المهمة في مرحلة الرفع بجلسة الرفع المحفوظة (فلا يُجرب النقل المباشر بجلسة جديدة)
+        # ويُستكمل الرفع منها بعد التنزيل
+        if stage == STAGE_UPLOAD and job['source']['type'] == 'link' and job['stage'] == STAGE_UPLOADING \
+                and not (job['file_path'] and os.path.exists(job['file_path'])):
+            await self.jobs.run(self.jobs.update, job_id, downloaded_bytes=0)
+            stage = STAGE_DOWNLOAD
+
+        # تنشئ مراحل المهمة رسالة حالتها من المعرف المحفوظ (أو ترسل رسالة جديدة لمهام الدفعات)
+        await self.bot.scheduler.submit(job_id, None, stage)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+            for job_id in list(self._held):
+                try:
+                    if not await self.jobs.run(self.jobs.renew_lease, job_id, self.node_id, JOB_LEASE_SECONDS):
+                        logger.warning(f"فقدت العقدة {self.node_id} عقد المهمة {job_id}، سيتم إيقافها محلياً")
+                        self._held.discard(job_id)
+                        self.bot.scheduler.cancel(job_id)
+                    elif (await self.jobs.run(self.jobs.get, job_id))['stage'] not in ACTIVE_STAGES:
+                        # أُلغيت المهمة من الواجهة
+                        self.bot.scheduler.cancel(job_id)
+                except Exception as e:
+                    logger.error(f"فشل تجديد عقد المهمة {job_id}: {str(e)}")
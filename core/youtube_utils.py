@@ -1,34 +1,63 @@
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
 from google.auth.transport.requests import Request
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import pickle
 import os
 import logging
 import asyncio
 from config.config import (
     YOUTUBE_CLIENT_SECRETS_FILE, 
-    YOUTUBE_TOKEN_PICKLE,
     SCOPES, 
-    UPLOAD_CHUNK_SIZE, 
-    MAX_UPLOAD_RETRIES
+    YOUTUBE_API_WORKERS,
+    DEFAULT_YOUTUBE_CHANNEL
 )
+from core.playlist_cache import PlaylistCache
+from core.quota import QuotaLedger
+from core.resumable_upload import ResumableUploader
 from utils.session_manager import SessionManager
+from utils.retry import circuit_breaker, classify_error, retry_async, QUOTA
 
 logger = logging.getLogger(__name__)
 
+# أقصى طول لعنوان فيديو يوتيوب
+YOUTUBE_TITLE_MAX_LENGTH = 100
+
 class YouTubeUploader:
-    def __init__(self, init_auth=False):
+    def __init__(self, init_auth=False, channel=DEFAULT_YOUTUBE_CHANNEL, quota=None):
+        # لكل قناة عميل مستقل ببيانات اعتماده ومحرك رفعه، فتعمل عمليات الرفع لقنوات مختلفة بالتوازي
+        self.channel = channel
         self.youtube = None
+        self.credentials = None
+        # مكتبة googleapiclient (httplib2) ليست آمنة للاستخدام من عدة خيوط،
+        # لذلك ننفذ طلباتها في مجمع خيوط مخصص مع عميل مستقل لكل خيط
+        self._api_executor = ThreadPoolExecutor(
+            max_workers=YOUTUBE_API_WORKERS,
+            thread_name_prefix='youtube-api'
+        )
+        self._thread_local = threading.local()
+        self._upload_engine = ResumableUploader(self._get_access_token, on_auth_error=self._refresh_credentials)
+        # قاطع مشترك لطلبات YouTube Data API من جميع القنوات والمهام
+        self._api_breaker = circuit_breaker('youtube.api')
+        # قوائم التشغيل تُخزن لكل بيانات اعتماد (ملف التوكن يمثل القناة)
+        self.cache_key = SessionManager.token_path(channel)
+        self.playlist_cache = PlaylistCache()
+        # القنوات التي تستخدم نفس مشروع Google تتشارك سجل حصة واحد يمرره مجمع القنوات
+        self._owns_quota = quota is None
+        self.quota = quota if quota is not None else QuotaLedger(project=SessionManager.project_id(channel))
         if init_auth:
             # هذا لن يستخدم بعد الآن، سنستخدم الدالة المتزامنة initialize بدلاً منه
             self._initialize()
         # لا نقوم بتهيئة الاتصال تلقائياً هنا - سيتم ذلك عند الطلب بواسطة أمر /auth
         
-    async def initialize(self):
-        """تهيئة الاتصال مع يوتيوب باستخدام SessionManager (متزامنة)"""
+    async def initialize(self, interactive=False):
+        """
+        تهيئة الاتصال مع يوتيوب باستخدام SessionManager (متزامنة).
+        interactive: بدء المصادقة التفاعلية إذا لم يوجد توكن صالح (من الأمر /auth فقط)
+        """
         if not self.youtube:
-            self.youtube = await self._authenticate_async()
+            self.youtube = await self._authenticate_async(interactive)
         return self.youtube
         
     def _initialize(self):
@@ -43,73 +72,212 @@ class YouTubeUploader:
             # استخدام SessionManager للتحقق من صلاحية جلسة يوتيوب
             logger.info("جاري التحقق من صلاحية جلسة يوتيوب (غير متزامن)")
             loop = asyncio.get_event_loop()
-            credentials = loop.run_until_complete(SessionManager.check_youtube_auth())
+            credentials = loop.run_until_complete(SessionManager.check_youtube_auth(self.channel))
             
             if not credentials:
                 logger.error("فشل الحصول على بيانات اعتماد صالحة")
                 raise Exception("فشل الحصول على بيانات اعتماد صالحة")
                 
             logger.info("تم الحصول على بيانات اعتماد صالحة")
+            self.credentials = credentials
             return build('youtube', 'v3', credentials=credentials)
         except Exception as e:
             logger.error(f"خطأ في المصادقة مع يوتيوب: {str(e)}")
             raise
             
-    async def _authenticate_async(self):
+    async def _authenticate_async(self, interactive=False):
         """مصادقة متزامنة - تستخدم من الدوال المتزامنة"""
         try:
             # استخدام SessionManager للتحقق من صلاحية جلسة يوتيوب
             logger.info("جاري التحقق من صلاحية جلسة يوتيوب (متزامن)")
-            credentials = await SessionManager.check_youtube_auth()
+            if interactive:
+                credentials = await SessionManager.check_youtube_auth(self.channel)
+            else:
+                credentials = await SessionManager.get_credentials(self.channel)
             
             if not credentials:
                 logger.error("فشل الحصول على بيانات اعتماد صالحة")
                 raise Exception("فشل الحصول على بيانات اعتماد صالحة")
                 
             logger.info("تم الحصول على بيانات اعتماد صالحة")
+            self.credentials = credentials
+            # قد تكون المصادقة الجديدة لقناة مختلفة
+            self.playlist_cache.invalidate(self.cache_key)
             return build('youtube', 'v3', credentials=credentials)
         except Exception as e:
             logger.error(f"خطأ في المصادقة مع يوتيوب: {str(e)}")
             raise
 
-    async def get_playlists(self):
+    async def _get_access_token(self):
+        """إرجاع توكن وصول صالح لمحرك الرفع مع تجديده عند الحاجة"""
+        # بيانات الاعتماد محفوظة في الذاكرة لدى SessionManager، فالاستدعاء لا يقرأ الملف إلا إذا تغير.
+        # لا مصادقة تفاعلية أثناء الرفع: ترفع CredentialsUnavailableError (خطأ مصادقة) إن لم يوجد توكن صالح
+        credentials = await SessionManager.get_credentials(self.channel)
+        self.credentials = credentials
+        return credentials.token
+
+    async def _refresh_credentials(self):
+        """تجديد التوكن بعد رفض يوتيوب له (401) رغم صلاحيته الظاهرة"""
+        self.credentials = await SessionManager.refresh_credentials(self.channel)
+
+    def _thread_client(self):
+        """عميل يوتيوب خاص بالخيط الحالي، يُعاد بناؤه عند تغير بيانات الاعتماد"""
+        local = self._thread_local
+        if getattr(local, 'credentials', None) is not self.credentials:
+            local.client = build('youtube', 'v3', credentials=self.credentials, cache_discovery=False)
+            local.credentials = self.credentials
+        return local.client
+
+    async def _execute(self, make_request, operation):
+        """
+        تنفيذ طلب googleapiclient في مجمع الخيوط دون حجب حلقة الأحداث وفق سياسة إعادة
+        المحاولة المشتركة، مع تسجيل تكلفة العملية operation في سجل الحصة لكل محاولة
+        """
+        loop = asyncio.get_running_loop()
+
+        async def attempt():
+            self.quota.submit(self.quota.charge, operation)
+            return await loop.run_in_executor(
+                self._api_executor,
+                lambda: make_request(self._thread_client()).execute()
+            )
+
         try:
-            if not self.youtube:
-                logger.error("لم يتم تهيئة اتصال يوتيوب")
-                raise Exception("يجب تهيئة اتصال يوتيوب أولاً")
-
-            logger.info("جاري التحقق من صلاحية الاتصال مع يوتيوب")
-            try:
-                # اختبار الاتصال
-                self.youtube.playlists().list(part="snippet", maxResults=1).execute()
-            except Exception as conn_error:
-                logger.error(f"خطأ في الاتصال مع يوتيوب: {str(conn_error)}")
-                # إعادة تهيئة الاتصال
-                self.youtube = None
-                self.youtube = await self._authenticate_async()
-
-            logger.info("جاري جلب قوائم التشغيل من يوتيوب")
-            request = self.youtube.playlists().list(
-                part="snippet",
-                mine=True,
-                maxResults=50
+            return await retry_async(
+                attempt,
+                operation,
+                breaker=self._api_breaker,
+                on_auth_error=self._refresh_credentials
             )
-            response = request.execute()
+        except Exception as e:
+            self._check_quota_error(e)
+            raise
+
+    def _check_quota_error(self, error):
+        if classify_error(error) == QUOTA:
+            self.quota.submit(self.quota.mark_exhausted)
 
-            if 'items' not in response:
-                logger.error("لم يتم العثور على قوائم تشغيل في الاستجابة")
-                return []
+    def _charging_session_callback(self, session_callback):
+        """تسجيل تكلفة videos.insert عند إنشاء جلسة رفع جديدة"""
+        def on_session(session_uri):
+            self.quota.submit(self.quota.charge, 'videos.insert')
+            if session_callback:
+                session_callback(session_uri)
+        return on_session
 
-            playlists = [(item['id'], item['snippet']['title']) for item in response['items']]
-            logger.info(f"تم جلب {len(playlists)} قائمة تشغيل")
-            return playlists
+    async def close(self):
+        """إغلاق موارد الاتصال"""
+        await self._upload_engine.close()
+        self._api_executor.shutdown(wait=False)
+        if self._owns_quota:
+            self.quota.close()
 
+    async def get_playlists(self):
+        """قوائم تشغيل القناة من الذاكرة المؤقتة، وتُجلب من يوتيوب عند انتهاء صلاحيتها"""
+        if not self.youtube:
+            logger.error("لم يتم تهيئة اتصال يوتيوب")
+            raise Exception("يجب تهيئة اتصال يوتيوب أولاً")
+
+        try:
+            return await self.playlist_cache.get(self.cache_key, self._fetch_playlists)
         except Exception as e:
             logger.error(f"خطأ في جلب قوائم التشغيل: {str(e)}")
             raise Exception(f"فشل في جلب قوائم التشغيل: {str(e)}")
 
+    def get_playlist_title(self, playlist_id):
+        """عنوان قائمة التشغيل من الذاكرة المؤقتة دون أي طلب إلى يوتيوب"""
+        return self.playlist_cache.find_title(self.cache_key, playlist_id)
 
-    async def upload_video(self, file_path, title, playlist_id):
+    async def _fetch_playlists(self):
+        """جلب جميع قوائم التشغيل عبر صفحات nextPageToken مع إعادة المصادقة مرة واحدة عند الفشل"""
+        try:
+            return await self._fetch_playlist_pages()
+        except Exception as conn_error:
+            logger.error(f"خطأ في الاتصال مع يوتيوب: {str(conn_error)}")
+            # إعادة تهيئة الاتصال
+            self.youtube = None
+            self.youtube = await self._authenticate_async()
+            return await self._fetch_playlist_pages()
+
+    async def _fetch_playlist_pages(self):
+        logger.info("جاري جلب قوائم التشغيل من يوتيوب")
+        playlists = []
+        page_token = None
+        while True:
+            response = await self._execute(lambda yt: yt.playlists().list(
+                part="snippet",
+                mine=True,
+                maxResults=50,
+                pageToken=page_token
+            ), 'playlists.list')
+            playlists.extend((item['id'], item['snippet']['title']) for item in response.get('items', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+
+        logger.info(f"تم جلب {len(playlists)} قائمة تشغيل")
+        return playlists
+
+    @staticmethod
+    def _build_video_body(title):
+        """بيانات الفيديو المرسلة مع طلب videos.insert"""
+        return {
+            'snippet': {
+                'title': title,
+                'description': 'Uploaded via Telegram Bot',
+                'categoryId': '22'  # People & Blogs
+            },
+            'status': {
+                'privacyStatus': 'unlisted',
+                'selfDeclaredMadeForKids': False
+            }
+        }
+
+    @staticmethod
+    def video_url(video_id):
+        return f'https://youtu.be/{video_id}'
+
+    async def add_to_playlist(self, video_id, playlist_id):
+        """إضافة فيديو إلى قائمة تشغيل (playlistItems.insert)"""
+        logger.info(f"إضافة الفيديو إلى قائمة التشغيل: {playlist_id}")
+        try:
+            await self._execute(lambda yt: yt.playlistItems().insert(
+                part="snippet",
+                body={
+                    "snippet": {
+                        "playlistId": playlist_id,
+                        "resourceId": {
+                            "kind": "youtube#video",
+                            "videoId": video_id
+                        }
+                    }
+                }
+            ), 'playlistItems.insert')
+        except Exception:
+            # قد تكون القائمة حُذفت أو تغيرت؛ تُجلب القوائم من جديد في المرة القادمة
+            self.playlist_cache.invalidate(self.cache_key)
+            raise
+
+    async def video_exists(self, video_id):
+        """التحقق من أن الفيديو ما زال موجوداً على القناة (videos.list بتكلفة وحدة واحدة)"""
+        response = await self._execute(lambda yt: yt.videos().list(part="id", id=video_id), 'videos.list')
+        return bool(response.get('items'))
+
+    async def upload_session_alive(self, session_uri, file_path):
+        """التحقق من أن جلسة رفع محفوظة ما زالت قابلة للاستكمال دون إنشاء جلسة جديدة"""
+        return await self._upload_engine.session_alive(session_uri, os.path.getsize(file_path))
+
+    def _finish_upload(self, response):
+        """
+        إرجاع معرف الفيديو المرفوع. الإضافة إلى قائمة التشغيل خطوة منفصلة يجريها المستدعي
+        بعد تسجيل الفيديو، فلا يضيع الرفع المكتمل إذا فشلت الإضافة
+        """
+        video_id = response['id']
+        logger.info(f"تم رفع الفيديو بنجاح إلى: {self.video_url(video_id)}")
+        return video_id
+
+    async def upload_video(self, file_path, title, progress_callback=None, session_uri=None, session_callback=None, state_key=None):
+        """رفع ملف فيديو إلى يوتيوب وإرجاع معرف الفيديو"""
         try:
             logger.info(f"بدء رفع فيديو: {title}")
             
@@ -117,76 +285,43 @@ class YouTubeUploader:
                 logger.error(f"ملف الفيديو غير موجود: {file_path}")
                 raise FileNotFoundError(f"ملف الفيديو غير موجود: {file_path}")
                 
-            body = {
-                'snippet': {
-                    'title': title,
-                    'description': 'Uploaded via Telegram Bot',
-                    'categoryId': '22'  # People & Blogs
-                },
-                'status': {
-                    'privacyStatus': 'unlisted',
-                    'selfDeclaredMadeForKids': False
-                }
-            }
+            body = self._build_video_body(title)
 
             # Configure chunked upload
             file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
             logger.info(f"حجم الفيديو: {file_size_mb:.2f} ميجابايت")
             
-            media = MediaFileUpload(
+            # الرفع عبر محرك aiohttp غير المتزامن لإبقاء حلقة الأحداث متجاوبة
+            response = await self._upload_engine.upload_file(
                 file_path,
-                mimetype='video/*',
-                chunksize=UPLOAD_CHUNK_SIZE,
-                resumable=True
+                body,
+                progress_callback=progress_callback,
+                session_uri=session_uri,
+                session_callback=self._charging_session_callback(session_callback),
+                state_key=state_key
             )
-            
-            # Insert the video
-            insert_request = self.youtube.videos().insert(
-                part=",".join(body.keys()),
-                body=body,
-                media_body=media
-            )
-
-            response = None
-            retry = 0
-            
-            while response is None:
-                try:
-                    status, response = insert_request.next_chunk()
-                    if status:
-                        progress = int(status.progress() * 100)
-                        logger.info(f"تقدم الرفع: {progress}%")
-                    if response:
-                        logger.info(f"اكتمل الرفع بنجاح! معرف الفيديو: {response['id']}")
-                except Exception as e:
-                    retry += 1
-                    if retry >= MAX_UPLOAD_RETRIES:
-                        logger.error(f"فشل الرفع بعد {MAX_UPLOAD_RETRIES} محاولة: {str(e)}")
-                        raise Exception(f"فشل الرفع بعد {MAX_UPLOAD_RETRIES} محاولة: {str(e)}")
-                    logger.warning(f"إعادة محاولة الرفع... المحاولة {retry}")
                     
-            video_id = response['id']
-
-            # Add to playlist
-            if playlist_id:
-                logger.info(f"إضافة الفيديو إلى قائمة التشغيل: {playlist_id}")
-                self.youtube.playlistItems().insert(
-                    part="snippet",
-                    body={
-                        "snippet": {
-                            "playlistId": playlist_id,
-                            "resourceId": {
-                                "kind": "youtube#video",
-                                "videoId": video_id
-                            }
-                        }
-                    }
-                ).execute()
-
-            video_url = f'https://youtu.be/{video_id}'
-            logger.info(f"تم رفع الفيديو بنجاح إلى: {video_url}")
-            return video_url
+            return self._finish_upload(response)
             
         except Exception as e:
             logger.error(f"خطأ أثناء رفع الفيديو: {str(e)}")
+            self._check_quota_error(e)
+            raise
+
+    async def upload_video_stream(self, chunks, total_size, title, progress_callback=None, session_callback=None):
+        """رفع فيديو مباشرة من مصدر أجزاء متتالية دون انتظار اكتمال التنزيل وإرجاع معرفه"""
+        try:
+            logger.info(f"بدء رفع مباشر لفيديو: {title} ({total_size / (1024 * 1024):.2f} ميجابايت)")
+            response = await self._upload_engine.upload_stream(
+                chunks,
+                total_size,
+                self._build_video_body(title),
+                progress_callback=progress_callback,
+                session_callback=self._charging_session_callback(session_callback)
+            )
+            return self._finish_upload(response)
+
+        except Exception as e:
+            logger.error(f"خطأ أثناء الرفع المباشر للفيديو: {str(e)}")
+            self._check_quota_error(e)
             raise
@@ -1,8 +1,9 @@
 import os
 import logging
 import asyncio
+import argparse
 import traceback
-from config.config import TEMP_DOWNLOAD_PATH, LOGS_DIR, DATA_DIR, SESSIONS_DIR, CREDENTIALS_DIR
+from config.config import TEMP_DOWNLOAD_PATH, LOGS_DIR, DATA_DIR, SESSIONS_DIR, CREDENTIALS_DIR, NODE_ROLE
 from core.telegram_bot import UploadBot
 from utils.session_manager import SessionManager
 
@@ -36,11 +37,20 @@ def print_startup_instructions():
     print("  4. اتبع التعليمات التي ستظهر في البوت")
     print("=" * 70 + "\n")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="بوت الرفع من تيليجرام إلى يوتيوب")
+    parser.add_argument('--role', choices=['all', 'frontend', 'worker'], default=NODE_ROLE,
+                        help="دور العملية: all (الافتراضي)، frontend (استقبال التحديثات)، worker (تنفيذ المهام)")
+    parser.add_argument('--node-id', default=None, help="اسم العقدة العاملة")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        logger.info("بدء تشغيل البوت...")
-        bot = UploadBot()  # إنشاء البوت بدون تهيئة اتصال يوتيوب
-        print_startup_instructions()
+        logger.info(f"بدء تشغيل البوت ({args.role})...")
+        bot = UploadBot(role=args.role, node_id=args.node_id)  # إنشاء البوت بدون تهيئة اتصال يوتيوب
+        if args.role != 'worker':
+            print_startup_instructions()
         asyncio.run(bot.run())
     except KeyboardInterrupt:
         logger.info("تم إيقاف البوت بواسطة المستخدم.")
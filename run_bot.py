@@ -6,6 +6,7 @@ import sys
 import time
 import logging
 import asyncio
+import argparse
 import subprocess
 import traceback
 from datetime import datetime
@@ -13,6 +14,7 @@ from utils.watcher import start_watcher
 
 # استيراد مكون Instance واحدة
 from core.single_instance import SingleInstance
+from core.job_store import JobStore
 
 # استيراد الإعدادات والبوت
 from config import (
@@ -24,6 +26,8 @@ from config import (
     ENABLE_SINGLE_INSTANCE,
     LOCK_FILE_PATH,
     LOCK_TIMEOUT_MINUTES,
+    NODE_ROLE,
+    NODE_ID,
     BOT_VERSION,
     BOT_NAME
 )
@@ -47,11 +51,17 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 def cleanup_temp_files():
-    """تنظيف الملفات المؤقتة"""
+    """تنظيف الملفات المؤقتة (مع الإبقاء على ملفات المهام غير المكتملة لاستئنافها)"""
     try:
+        job_store = JobStore()
+        active_files = job_store.active_files()
+        job_store.close()
+        
         file_count = 0
         for file in os.listdir(TEMP_DOWNLOAD_PATH):
             file_path = os.path.join(TEMP_DOWNLOAD_PATH, file)
+            if file_path in active_files:
+                continue
             if os.path.isfile(file_path):
                 os.remove(file_path)
                 file_count += 1
@@ -76,14 +86,38 @@ def print_banner():
     print(banner)
     logger.info(f"بدء تشغيل {BOT_NAME} - الإصدار {BOT_VERSION}")
 
+def parse_args():
+    """نفس خيارات main.py وتُمرر إليه كما هي"""
+    parser = argparse.ArgumentParser(description="تشغيل البوت مع المراقبة")
+    parser.add_argument('--role', choices=['all', 'frontend', 'worker'], default=NODE_ROLE,
+                        help="دور العملية: all (الافتراضي)، frontend (استقبال التحديثات)، worker (تنفيذ المهام)")
+    parser.add_argument('--node-id', default=NODE_ID or None, help="اسم العقدة العاملة")
+    return parser.parse_args()
+
+def lock_file_for(role, node_id):
+    """
+    ملف قفل النسخة الواحدة: نسخة واحدة من العملية الكاملة، ونسخة واحدة لكل دور واسم عقدة
+    عند التوزيع. تعيد None للعقدة العاملة دون اسم ثابت فلا تُوقف عقدة أخرى على نفس الجهاز
+    """
+    if role == 'all':
+        return LOCK_FILE_PATH
+    if role == 'worker' and not node_id:
+        return None
+    base, ext = os.path.splitext(LOCK_FILE_PATH)
+    suffix = f"{role}.{node_id}" if node_id else role
+    return f"{base}.{suffix}{ext}"
+
 def main():
     """دالة التشغيل الرئيسية"""
+    args = parse_args()
+    
     # التأكد من أن نسخة واحدة فقط تعمل (إذا كان ذلك مفعلاً)
     single_instance = None
-    if ENABLE_SINGLE_INSTANCE:
+    lock_file_path = lock_file_for(args.role, args.node_id)
+    if ENABLE_SINGLE_INSTANCE and lock_file_path:
         try:
             single_instance = SingleInstance(
-                lock_file_path=LOCK_FILE_PATH, 
+                lock_file_path=lock_file_path, 
                 timeout=LOCK_TIMEOUT_MINUTES
             )
         except SystemExit:
@@ -98,11 +132,14 @@ def main():
         cleanup_temp_files()
         
         # بدء عملية البوت
-        bot_process = subprocess.Popen([sys.executable, 'main.py'])
-        logger.info("تم بدء تشغيل البوت عبر main.py")
+        command = [sys.executable, 'main.py', '--role', args.role]
+        if args.node_id:
+            command += ['--node-id', args.node_id]
+        bot_process = subprocess.Popen(command)
+        logger.info(f"تم بدء تشغيل البوت عبر main.py ({args.role})")
         
         # بدء نظام مراقبة الملفات
-        observer = start_watcher(bot_process)
+        observer = start_watcher(bot_process, lock_file_path)
         
         try:
             while True:
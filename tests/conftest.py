@@ -0,0 +1,28 @@
+"""
+إعدادات مشتركة للاختبارات: الخدمات الخارجية (يوتيوب وتيليجرام) تُستبدل ببدائل محلية
+من tests.fakes، أما aiohttp وTelethon فتُستخدم مكتباتها الحقيقية
+"""
+import os
+
+import pytest
+
+from utils import retry
+
+
+@pytest.fixture(autouse=True)
+def reset_circuit_breakers():
+    """قواطع الدائرة مشتركة على مستوى العملية، فلا تنتقل حالتها من اختبار لآخر"""
+    retry._breakers.clear()
+    yield
+    retry._breakers.clear()
+
+
+@pytest.fixture
+def make_file(tmp_path):
+    """إنشاء ملف ببيانات عشوائية وإرجاع (المسار، البيانات)"""
+    def make(size, name='video.mp4'):
+        data = os.urandom(size)
+        path = tmp_path / name
+        path.write_bytes(data)
+        return str(path), data
+    return make
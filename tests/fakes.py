@@ -0,0 +1,239 @@
+"""
+بدائل محلية للخدمات الخارجية في الاختبارات وقياسات الأداء
+"""
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+from aiohttp import web
+from telethon import types
+from telethon.errors import FloodWaitError
+
+# الخادم الحقيقي يثبت البيانات المستلمة بمضاعفات 256 كيلوبايت عند انقطاع الطلب
+COMMIT_GRANULARITY = 256 * 1024
+
+UPLOAD_PATH = '/upload/youtube/v3/videos'
+SESSION_PATH = '/upload/session/{session_id}'
+
+
+class UploadSession:
+    def __init__(self, session_id, total_size, body, keep_data):
+        self.session_id = session_id
+        self.total_size = total_size
+        self.body = body
+        self.received = 0
+        self.data = bytearray() if keep_data else None
+        self.video_id = None
+
+
+class FakeUploadServer:
+    """
+    خادم aiohttp يحاكي videos.insert بالرفع القابل للاستئناف:
+    إنشاء الجلسة (POST) ثم أجزاء PUT مع Content-Range، ورد 308 مع ترويسة Range بآخر بايت ثُبت،
+    و201 مع مورد الفيديو عند اكتمال الملف.
+
+    keep_data: حفظ البيانات المستلمة للتحقق منها (يُعطل في قياسات الأداء للملفات الكبيرة)،
+    commit_limit: أقصى عدد بايتات يثبتها الخادم من كل طلب (يحاكي تثبيت جزء من الجزء المرسل)،
+    pause_at: يتوقف الخادم عن القراءة بعد تثبيت هذا العدد من البايتات حتى يُغلق الاتصال
+    (يحاكي انقطاع العملية أثناء الرفع)
+    """
+
+    def __init__(self, keep_data=True, commit_limit=None, pause_at=None):
+        self.keep_data = keep_data
+        self.commit_limit = commit_limit
+        self.pause_at = pause_at
+        self.sessions = {}
+        # رموز حالة تُرد على طلبات الأجزاء القادمة قبل قبولها (مثل 503)
+        self.chunk_failures = []
+        self.requests = []
+        self.paused = None
+        self._closing = None
+        self._runner = None
+        self._ids = itertools.count(1)
+        self.url = None
+
+    @property
+    def upload_url(self):
+        return self.url + UPLOAD_PATH
+
+    async def start(self, host='127.0.0.1', port=0):
+        self.paused = asyncio.Event()
+        self._closing = asyncio.Event()
+        app = web.Application(client_max_size=0)
+        app.router.add_post(UPLOAD_PATH, self._create)
+        app.router.add_put(SESSION_PATH, self._put)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f'http://{host}:{port}'
+        return self
+
+    async def stop(self):
+        if self._closing:
+            self._closing.set()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def session(self, video_id):
+        """جلسة الرفع التي أنتجت الفيديو video_id"""
+        return next(session for session in self.sessions.values() if session.video_id == video_id)
+
+    async def _create(self, request):
+        if request.query.get('uploadType') != 'resumable':
+            return web.Response(status=400, text='uploadType=resumable مطلوب')
+        session_id = str(next(self._ids))
+        total_size = int(request.headers['X-Upload-Content-Length'])
+        self.sessions[session_id] = UploadSession(session_id, total_size, await request.json(), self.keep_data)
+        self.requests.append(('create', session_id))
+        location = self.url + SESSION_PATH.format(session_id=session_id)
+        return web.Response(status=200, headers={'Location': location})
+
+    def _status(self, session):
+        if session.received == session.total_size:
+            if session.video_id is None:
+                session.video_id = f'video{session.session_id}'
+            resource = {'id': session.video_id, 'snippet': session.body.get('snippet', {})}
+            return web.json_response(resource, status=201)
+        headers = {'Range': f'bytes=0-{session.received - 1}'} if session.received else {}
+        return web.Response(status=308, headers=headers)
+
+    async def _put(self, request):
+        session = self.sessions.get(request.match_info['session_id'])
+        if session is None:
+            return web.Response(status=404)
+        content_range = request.headers.get('Content-Range', '')
+        self.requests.append(('put', session.session_id, content_range))
+
+        # bytes */total: استعلام عن الحالة دون بيانات
+        if content_range.startswith('bytes */'):
+            return self._status(session)
+
+        start = int(content_range.split(' ', 1)[1].split('-', 1)[0])
+        if self.chunk_failures:
+            await request.read()
+            return web.Response(status=self.chunk_failures.pop(0), headers={'Retry-After': '0'})
+        if start != session.received:
+            return web.Response(status=400, text=f'الموضع {start} لا يطابق المستلم {session.received}')
+
+        accepted = 0
+        async for piece in request.content.iter_chunked(COMMIT_GRANULARITY):
+            if self.commit_limit is not None:
+                piece = piece[:max(0, self.commit_limit - accepted)]
+            accepted += len(piece)
+            session.received += len(piece)
+            if session.data is not None:
+                session.data += piece
+            if self.pause_at is not None and session.received >= self.pause_at:
+                # تثبيت ما وصل بمضاعفات 256 كيلوبايت ثم التوقف حتى ينقطع الاتصال
+                committed = session.received // COMMIT_GRANULARITY * COMMIT_GRANULARITY
+                if session.data is not None:
+                    del session.data[committed:]
+                session.received = committed
+                self.pause_at = None
+                self.paused.set()
+                await self._closing.wait()
+                return web.Response(status=503)
+        return self._status(session)
+
+
+
+class FakeFilePartSender:
+    """
+    مرسل MTProto يرد على upload.getFile من بيانات في الذاكرة.
+    latency: زمن كل طلب، bandwidth: سرعة المرسل الواحد (بايت/ثانية)،
+    failures: موضع -> استثناء يُرفع مرة واحدة عند طلب ذلك الموضع
+    """
+
+    def __init__(self, data, latency=0.0, bandwidth=None, failures=None):
+        self.data = data
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.failures = failures if failures is not None else {}
+        self.auth_key = object()
+        self.offsets = []
+        self.disconnected = False
+
+    async def send(self, request):
+        self.offsets.append(request.offset)
+        error = self.failures.pop(request.offset, None)
+        if error is not None:
+            raise error
+        part = self.data[request.offset:request.offset + request.limit]
+        await asyncio.sleep(self.latency + (len(part) / self.bandwidth if self.bandwidth else 0))
+        return SimpleNamespace(bytes=part)
+
+    async def disconnect(self):
+        self.disconnected = True
+
+
+def use_fake_senders(downloader, make_sender):
+    """استبدال اتصالات MTProto في ParallelDownloader بمرسلين وهميين؛ تعيد قائمة المرسلين المنشئين"""
+    senders = []
+
+    async def create_sender(dc_id, auth_key):
+        sender = make_sender()
+        senders.append(sender)
+        return sender
+
+    downloader._create_sender = create_sender
+    return senders
+
+
+def fake_client(dc_id=2):
+    """عميل Telethon بالحد الأدنى الذي يقرؤه ParallelDownloader قبل فتح الاتصالات"""
+    return SimpleNamespace(session=SimpleNamespace(auth_key=object(), dc_id=dc_id))
+
+
+def fake_document(size, dc_id=2):
+    return types.Document(
+        id=1, access_hash=2, file_reference=b'', date=None, mime_type='video/mp4',
+        size=size, dc_id=dc_id, attributes=[]
+    )
+
+
+def flood_wait(seconds=0):
+    return FloodWaitError(request=None, capture=seconds)
+
+
+class FakeApplication:
+    """
+    بديل telegram.ext.Application لخادم webhook: يسجل التحديثات المعالجة بالترتيب.
+    handler: دالة غير متزامنة اختيارية تُستدعى لكل تحديث (لإبطاء المعالجة أو حجزها)
+    """
+
+    def __init__(self, handler=None):
+        self.handler = handler
+        self.processed = []
+        self.bot = SimpleNamespace(set_webhook=self._set_webhook)
+        self.webhook = None
+
+    async def _set_webhook(self, **kwargs):
+        self.webhook = kwargs
+
+    async def process_update(self, update):
+        if self.handler:
+            await self.handler(update)
+        self.processed.append((update.effective_chat.id, update.update_id))
+
+
+def text_update(update_id, chat_id, text='text'):
+    """تحديث رسالة نصية بصيغة JSON كما يرسلها تيليجرام (النص الذي يبدأ بـ / أمر)"""
+    message = {
+        'message_id': update_id,
+        'date': 0,
+        'chat': {'id': chat_id, 'type': 'private'},
+        'from': {'id': chat_id, 'is_bot': False, 'first_name': 'user'},
+        'text': text
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+    return {'update_id': update_id, 'message': message}
@@ -0,0 +1,55 @@
+import asyncio
+import datetime
+import pickle
+
+import pytest
+from google.oauth2.credentials import Credentials
+
+from core.youtube_utils import YouTubeUploader
+from utils.credential_store import CredentialStore, CredentialsUnavailableError
+from utils.retry import AUTH, classify_error
+from utils.session_manager import SessionManager
+
+
+@pytest.fixture
+def channel_token(tmp_path, monkeypatch):
+    """توكن القناة 'test' في مجلد مؤقت، مع منع أي مصادقة تفاعلية"""
+    path = tmp_path / 'test.pickle'
+    monkeypatch.setattr(SessionManager, '_credentials', {'test': CredentialStore(str(path))})
+
+    async def interactive(channel):
+        raise AssertionError("بدأت مصادقة تفاعلية")
+    monkeypatch.setattr(SessionManager, 'check_youtube_auth', interactive)
+    return path
+
+
+def make_uploader():
+    uploader = YouTubeUploader(channel='test', quota=object())
+    uploader._api_executor.shutdown()
+    return uploader
+
+
+def test_missing_token_raises_auth_error_without_interactive_flow(channel_token):
+    uploader = make_uploader()
+    with pytest.raises(CredentialsUnavailableError) as error:
+        asyncio.run(uploader._get_access_token())
+    assert classify_error(error.value) == AUTH
+    with pytest.raises(CredentialsUnavailableError):
+        asyncio.run(uploader.initialize())
+    assert uploader.youtube is None
+
+
+def test_saved_token_is_used_for_uploads(channel_token):
+    expiry = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) + datetime.timedelta(hours=1)
+    channel_token.write_bytes(pickle.dumps(Credentials(token='saved-token', expiry=expiry)))
+    assert asyncio.run(make_uploader()._get_access_token()) == 'saved-token'
+
+
+def test_failed_refresh_raises_auth_error(channel_token):
+    # توكن منتهي دون refresh_token لا يمكن تجديده
+    expired = datetime.datetime(2000, 1, 1)
+    channel_token.write_bytes(pickle.dumps(Credentials(token='old', expiry=expired)))
+    with pytest.raises(CredentialsUnavailableError):
+        asyncio.run(SessionManager.get_credentials('test'))
+    with pytest.raises(CredentialsUnavailableError):
+        asyncio.run(SessionManager.refresh_credentials('test'))
@@ -0,0 +1,138 @@
+import asyncio
+import sqlite3
+import time
+
+from core.job_store import (
+    JobStore,
+    STAGE_DONE,
+    STAGE_DOWNLOADING,
+    STAGE_PENDING,
+    STAGE_UPLOADING
+)
+
+SOURCE = {'type': 'link', 'link_info': {'type': 'public', 'channel_username': 'channel', 'message_id': 1}}
+
+
+def create(store, title, **fields):
+    job_id = store.create(chat_id=10, user_id=20, source=SOURCE, title=title, playlist_id=None)
+    if fields:
+        store.update(job_id, **fields)
+    return job_id
+
+
+def test_active_jobs_survive_restart(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    store = JobStore(db_path)
+    downloading = create(store, 'a', stage=STAGE_DOWNLOADING, downloaded_bytes=4096, total_bytes=8192)
+    create(store, 'b', stage=STAGE_DONE, video_url='https://youtu.be/x')
+    uploading = create(
+        store, 'c', stage=STAGE_UPLOADING, upload_uri='https://upload/session/1', uploaded_bytes=1024
+    )
+    store.close()
+
+    # عملية جديدة بعد التوقف ترى المهام غير المنتهية بحالتها الأخيرة
+    store = JobStore(db_path)
+    jobs = store.active_jobs()
+    assert [job['id'] for job in jobs] == [downloading, uploading]
+    assert jobs[0]['downloaded_bytes'] == 4096 and jobs[0]['source'] == SOURCE
+    assert jobs[1]['upload_uri'] == 'https://upload/session/1' and jobs[1]['uploaded_bytes'] == 1024
+    store.close()
+
+
+def test_expired_lease_moves_job_to_another_node(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.db'))
+    job_id = create(store, 'a')
+
+    assert store.claim('w1', lease_seconds=60)['id'] == job_id
+    # العقد ساري: لا تسحبها عقدة أخرى
+    assert store.claim('w2', lease_seconds=60) is None
+    assert store.queue_position() == 0
+
+    # توقفت w1 عن تجديد العقد
+    store.update(job_id, lease_expires=time.time() - 1)
+    assert store.queue_position(job_id) == 1
+    job = store.claim('w2', lease_seconds=60)
+    assert job['id'] == job_id and job['lease_owner'] == 'w2'
+    assert not store.renew_lease(job_id, 'w1', 60)
+    assert store.renew_lease(job_id, 'w2', 60)
+    assert store.lease_counts() == {'w2': 1}
+
+    store.release_lease(job_id, 'w2')
+    assert store.claim('w1', lease_seconds=60)['id'] == job_id
+    store.close()
+
+
+def test_deferred_job_is_not_claimed_before_not_before(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.db'))
+    deferred = create(store, 'a', not_before=time.time() + 3600)
+    ready = create(store, 'b')
+
+    assert store.claim('w1', lease_seconds=60)['id'] == ready
+    assert store.claim('w1', lease_seconds=60) is None
+    store.update(deferred, not_before=None)
+    assert store.claim('w1', lease_seconds=60)['id'] == deferred
+    store.close()
+
+
+def test_database_from_first_release_is_migrated(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER NOT NULL, user_id INTEGER,
+            stage TEXT NOT NULL, source TEXT NOT NULL, title TEXT NOT NULL, playlist_id TEXT,
+            file_path TEXT, total_bytes INTEGER, downloaded_bytes INTEGER NOT NULL DEFAULT 0,
+            upload_uri TEXT, uploaded_bytes INTEGER NOT NULL DEFAULT 0, video_url TEXT, error TEXT,
+            created_at REAL NOT NULL, updated_at REAL NOT NULL
+        );
+        INSERT INTO jobs (chat_id, stage, source, title, created_at, updated_at)
+        VALUES (1, 'pending', '{"type": "message"}', 'old', 0, 0);
+    """)
+    conn.close()
+
+    store = JobStore(db_path)
+    [job] = store.active_jobs()
+    assert job['title'] == 'old' and job['stage'] == STAGE_PENDING
+    assert job['lease_owner'] is None and job['channel'] is None
+    assert store.claim('w1', lease_seconds=60)['id'] == job['id']
+    store.close()
+
+
+def test_claim_waits_for_locked_database_off_the_event_loop(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    store = JobStore(db_path)
+    job_id = create(store, 'a')
+    # عملية أخرى تحجز قاعدة البيانات للكتابة
+    other = sqlite3.connect(db_path, isolation_level=None)
+    other.execute('BEGIN IMMEDIATE')
+
+    async def scenario():
+        claim = asyncio.ensure_future(store.run(store.claim, 'w1', 60))
+        ticks = 0
+        while ticks < 20:
+            await asyncio.sleep(0.01)
+            ticks += 1
+        # الحلقة بقيت تعمل أثناء انتظار السحب للقفل
+        assert not claim.done()
+        other.execute('COMMIT')
+        return await claim
+
+    job = asyncio.run(scenario())
+    assert job['id'] == job_id
+    other.close()
+    store.close()
+
+
+def test_submitted_writes_keep_their_order(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.db'))
+    job_id = create(store, 'a')
+    for offset in range(1, 101):
+        store.submit(store.update, job_id, downloaded_bytes=offset)
+
+    async def final_update():
+        await store.run(store.update, job_id, stage=STAGE_UPLOADING)
+
+    asyncio.run(final_update())
+    job = store.get(job_id)
+    assert (job['downloaded_bytes'], job['stage']) == (100, STAGE_UPLOADING)
+    store.close()
@@ -0,0 +1,55 @@
+import asyncio
+from types import SimpleNamespace
+
+from core.telegram_utils import TelegramDownloader
+
+
+class FakeClient:
+    """قناة برسائل محددة تسجل أرقام الرسائل المطلوبة في كل طلب"""
+
+    def __init__(self, messages):
+        self.messages = {message.id: message for message in messages}
+        self.requests = []
+
+    def is_connected(self):
+        return True
+
+    async def get_messages(self, peer, ids):
+        self.requests.append(list(ids))
+        return [self.messages.get(message_id) for message_id in ids]
+
+
+def message(message_id, grouped_id=None, video=True):
+    return SimpleNamespace(id=message_id, grouped_id=grouped_id, video=video, file=None, message=f'caption {message_id}')
+
+
+def make_downloader(messages):
+    downloader = TelegramDownloader.__new__(TelegramDownloader)
+    downloader.client = FakeClient(messages)
+
+    async def resolve_peer(name):
+        return name
+
+    downloader.resolve_peer = resolve_peer
+    return downloader
+
+
+def collect(downloader, message_ids):
+    spec = {'type': 'public', 'channel_username': 'channel', 'message_ids': message_ids}
+    videos = asyncio.run(downloader.collect_link_videos([spec]))
+    return [link_info['message_id'] for link_info, caption in videos]
+
+
+def test_plain_link_fetches_only_its_message():
+    downloader = make_downloader([message(49), message(50), message(51)])
+    assert collect(downloader, [50]) == [50]
+    assert downloader.client.requests == [[50]]
+
+
+def test_album_link_probes_neighbours_for_the_whole_album():
+    messages = [message(48), message(49, grouped_id=7), message(50, grouped_id=7, video=False),
+                message(51, grouped_id=7), message(52)]
+    downloader = make_downloader(messages)
+    assert collect(downloader, [50]) == [49, 51]
+    assert downloader.client.requests[0] == [50]
+    assert downloader.client.requests[1] == [message_id for message_id in range(41, 60) if message_id != 50]
@@ -0,0 +1,127 @@
+import asyncio
+import functools
+from types import SimpleNamespace
+
+from telethon import types
+from telethon.errors import BotMethodInvalidError
+
+from core import mirror
+from core.job_store import JobStore
+from core.mirror import ChannelMirror, MirrorMarks
+from core.telegram_utils import TelegramDownloader
+from core.worker import ROLE_ALL
+
+
+class BotClient:
+    """عميل بحساب بوت: يجلب الرسائل بأرقامها فقط ويرفض قراءة سجل المحادثة"""
+
+    def __init__(self, messages):
+        self.messages = {message.id: message for message in messages}
+        self.handlers = []
+
+    async def get_messages(self, peer, ids=None, **kwargs):
+        if ids is None:
+            raise BotMethodInvalidError(request=None)
+        return [self.messages.get(message_id) for message_id in ids]
+
+    def add_event_handler(self, handler, event):
+        self.handlers.append(handler)
+
+    def remove_event_handler(self, handler, event):
+        self.handlers.remove(handler)
+
+
+class FakeDownloader:
+    """قناة برسائل محددة؛ الأرقام غير الموجودة رسائل محذوفة"""
+
+    fetch_messages = TelegramDownloader.fetch_messages
+
+    def __init__(self, messages):
+        self.client = BotClient(messages)
+
+    async def start(self):
+        return True
+
+    async def resolve_peer(self, name):
+        return types.InputPeerChannel(channel_id=len(name), access_hash=0)
+
+    @staticmethod
+    def is_video(message):
+        return message.video
+
+    @staticmethod
+    def get_link_file_path(link_info):
+        return f"/tmp/{link_info['channel_username']}_{link_info['message_id']}.mp4"
+
+
+def message(message_id, video=False):
+    return SimpleNamespace(id=message_id, video=video, message=f'caption {message_id}', date=None)
+
+
+def make_mirror(tmp_path, monkeypatch, messages, rules):
+    db_path = str(tmp_path / 'jobs.db')
+    monkeypatch.setattr(mirror, 'MirrorMarks', functools.partial(MirrorMarks, db_path=db_path))
+    enqueued = []
+
+    async def enqueue(job):
+        enqueued.append(job['title'])
+
+    bot = SimpleNamespace(
+        telegram_downloader=FakeDownloader(messages),
+        jobs=JobStore(db_path),
+        role=ROLE_ALL,
+        youtube_initialized=True,
+        _enqueue_job=enqueue
+    )
+    return ChannelMirror(bot, rules), enqueued
+
+
+def test_catchup_crosses_deleted_message_gaps(tmp_path, monkeypatch):
+    # الرسائل 5 إلى 250 محذوفة: أكثر من نافذة طلب كاملة دون رسائل
+    messages = [message(1), message(3, video=True), message(4)] + \
+        [message(message_id, video=message_id == 290) for message_id in range(251, 301)]
+    channel_mirror, enqueued = make_mirror(
+        tmp_path, monkeypatch, messages, {'source': {'chat_id': 7, 'since': 2}}
+    )
+    channel_mirror._locks['source'] = asyncio.Lock()
+
+    asyncio.run(channel_mirror._advance('source'))
+
+    assert enqueued == ['caption 3', 'caption 290']
+    assert channel_mirror.marks.get('source') == 300
+    channel_mirror.bot.jobs.close()
+    channel_mirror.marks.close()
+
+
+def test_catchup_finds_posts_of_a_quiet_channel_without_new_events(tmp_path, monkeypatch):
+    messages = [message(message_id, video=True) for message_id in (10, 11)]
+    channel_mirror, enqueued = make_mirror(tmp_path, monkeypatch, messages, {'source': {'chat_id': 7, 'since': 10}})
+    channel_mirror._locks['source'] = asyncio.Lock()
+    asyncio.run(channel_mirror._advance('source'))
+    # النوافذ الخالية بعد آخر رسالة لا تُعد محذوفة فقد تأخذ أرقامها رسائل قادمة
+    assert channel_mirror.marks.get('source') == 11
+
+    # منشورات أثناء التوقف دون أي حدث جديد بعدها
+    client = channel_mirror.downloader.client
+    client.messages.update({message_id: message(message_id, video=True) for message_id in (12, 150)})
+    asyncio.run(channel_mirror._advance('source'))
+
+    assert enqueued == ['caption 10', 'caption 11', 'caption 12', 'caption 150']
+    assert channel_mirror.marks.get('source') == 150
+    channel_mirror.bot.jobs.close()
+    channel_mirror.marks.close()
+
+
+def test_invalid_title_template_is_rejected_at_start(tmp_path, monkeypatch):
+    channel_mirror, _ = make_mirror(tmp_path, monkeypatch, [message(1)], {
+        'broken': {'chat_id': 7, 'title': '{caption} {episode}'},
+        'valid': {'chat_id': 7, 'title': '{channel} #{message_id}'}
+    })
+
+    async def scenario():
+        await channel_mirror.start()
+        await channel_mirror.stop()
+
+    asyncio.run(scenario())
+    assert list(channel_mirror._locks) == ['valid']
+    channel_mirror.bot.jobs.close()
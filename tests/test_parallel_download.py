@@ -0,0 +1,75 @@
+import os
+import asyncio
+
+import pytest
+
+from core.parallel_download import ParallelDownloader
+from tests.fakes import FakeFilePartSender, fake_client, fake_document, flood_wait, use_fake_senders
+
+PART_SIZE = 64 * 1024
+
+
+@pytest.fixture(autouse=True)
+def reset_global_slots():
+    # السيمافور العام يرتبط بحلقة الأحداث التي أنشأته، وكل اختبار يعمل في حلقة جديدة
+    ParallelDownloader._global_slots = None
+    yield
+    ParallelDownloader._global_slots = None
+
+
+def download(data, path, make_sender, offsets, start_offset=0):
+    """تنزيل عبر 4 مرسلين وهميين؛ المواضع المؤكدة تُضاف إلى offsets. تعيد المرسلين"""
+    downloader = ParallelDownloader(fake_client(), connections=4, part_size=PART_SIZE)
+    senders = use_fake_senders(downloader, make_sender)
+    asyncio.run(downloader.download(
+        fake_document(len(data)), path, len(data),
+        start_offset=start_offset, offset_callback=offsets.append
+    ))
+    return senders
+
+
+def requested_offsets(senders):
+    return sorted(offset for sender in senders for offset in sender.offsets)
+
+
+def test_download_writes_every_part_and_commits_to_the_end(tmp_path):
+    data = os.urandom(10 * PART_SIZE + 1000)
+    path = str(tmp_path / 'video.mp4')
+    # FloodWait على جزء واحد يؤخر ذلك الجزء فقط ثم يُعاد طلبه
+    failures = {3 * PART_SIZE: flood_wait(0)}
+
+    offsets = []
+    senders = download(data, path, lambda: FakeFilePartSender(data, failures=failures), offsets)
+
+    with open(path, 'rb') as f:
+        assert f.read() == data
+    assert offsets == sorted(offsets)
+    assert offsets[-1] == len(data)
+    assert requested_offsets(senders).count(3 * PART_SIZE) == 2
+    assert len(senders) == 4 and all(sender.disconnected for sender in senders)
+
+
+def test_resume_offset_never_passes_a_missing_part(tmp_path):
+    data = os.urandom(12 * PART_SIZE)
+    path = str(tmp_path / 'video.mp4')
+    failed_part = 5
+
+    def slow_then_failing():
+        # الجزء 5 يفشل بخطأ غير قابل لإعادة المحاولة بينما تكتمل أجزاء بعده
+        return FakeFilePartSender(data, latency=0.005, failures={failed_part * PART_SIZE: RuntimeError('boom')})
+
+    committed = []
+    with pytest.raises(RuntimeError):
+        download(data, path, slow_then_failing, committed)
+    resume_from = committed[-1] if committed else 0
+    assert resume_from <= failed_part * PART_SIZE
+    with open(path, 'rb') as f:
+        assert f.read(resume_from) == data[:resume_from]
+
+    # عملية جديدة تستأنف من الموضع المؤكد فقط
+    offsets = []
+    senders = download(data, path, lambda: FakeFilePartSender(data), offsets, start_offset=resume_from)
+    assert requested_offsets(senders)[0] == resume_from
+    assert offsets[-1] == len(data)
+    with open(path, 'rb') as f:
+        assert f.read() == data
@@ -0,0 +1,83 @@
+import asyncio
+from types import SimpleNamespace
+
+from telethon import types
+
+from core.entity_cache import EntityCache
+from core.telegram_utils import TelegramDownloader
+
+CHAT_ID = 1234567890
+
+
+class FakeClient:
+    """
+    يحل معرفات المحادثات من جدول محدد. get_messages من محادثة عادية أو مستخدم يعيد رسالة بنفس
+    الرقم من صندوق رسائل البوت (كما يفعل messages.getMessages)
+    """
+
+    def __init__(self, entities, delays=None):
+        self.entities = entities
+        self.delays = delays or {}
+        self.resolved = []
+
+    async def get_entity(self, full_chat_id):
+        self.resolved.append(full_chat_id)
+        await asyncio.sleep(self.delays.get(full_chat_id, 0))
+        if full_chat_id not in self.entities:
+            raise ValueError(f'Could not find the input entity for {full_chat_id}')
+        return self.entities[full_chat_id]
+
+    async def get_messages(self, peer, ids):
+        source = 'group' if isinstance(peer, types.InputPeerChannel) else 'bot inbox'
+        return SimpleNamespace(id=ids, source=source, media=object())
+
+
+def make_downloader(tmp_path, client):
+    downloader = TelegramDownloader.__new__(TelegramDownloader)
+    downloader.client = client
+    downloader.entities = EntityCache(str(tmp_path / 'entities.db'))
+
+    async def start():
+        return True
+
+    downloader.start = start
+    return downloader
+
+
+def test_canonical_peer_wins_over_faster_alternative_formats(tmp_path):
+    client = FakeClient(
+        {
+            int(f'-100{CHAT_ID}'): types.InputPeerChannel(channel_id=CHAT_ID, access_hash=1),
+            -100 + CHAT_ID: types.InputPeerUser(user_id=CHAT_ID - 100, access_hash=2)
+        },
+        delays={int(f'-100{CHAT_ID}'): 0.05}
+    )
+    downloader = make_downloader(tmp_path, client)
+
+    message = asyncio.run(downloader.get_private_message(CHAT_ID, 5))
+    assert message.source == 'group'
+    assert client.resolved == [int(f'-100{CHAT_ID}')]
+    assert downloader.entities.get(f'c/{CHAT_ID}') == types.InputPeerChannel(channel_id=CHAT_ID, access_hash=1)
+    downloader.entities.close()
+
+
+def test_alternative_format_is_used_once_but_never_cached(tmp_path):
+    client = FakeClient({-100 + CHAT_ID: types.InputPeerUser(user_id=CHAT_ID - 100, access_hash=2)})
+    downloader = make_downloader(tmp_path, client)
+
+    asyncio.run(downloader.get_private_message(CHAT_ID, 5))
+    assert client.resolved[0] == int(f'-100{CHAT_ID}')
+    assert downloader.entities.get(f'c/{CHAT_ID}') is None
+    downloader.entities.close()
+
+
+def test_cached_peer_of_another_chat_is_dropped(tmp_path):
+    client = FakeClient({int(f'-100{CHAT_ID}'): types.InputPeerChannel(channel_id=CHAT_ID, access_hash=1)})
+    downloader = make_downloader(tmp_path, client)
+    # مدخل خزنته نسخة سابقة من صيغة بديلة
+    downloader.entities.put(f'c/{CHAT_ID}', types.InputPeerUser(user_id=CHAT_ID - 100, access_hash=2))
+
+    peer = asyncio.run(downloader._private_peer(CHAT_ID, 5))
+    assert peer == types.InputPeerChannel(channel_id=CHAT_ID, access_hash=1)
+    assert downloader.entities.get(f'c/{CHAT_ID}') == peer
+    downloader.entities.close()
@@ -0,0 +1,71 @@
+import asyncio
+
+from telegram.error import BadRequest
+
+from core import progress
+from core.progress import ProgressService
+
+
+class FakeMessage:
+    def __init__(self, chat_id, message_id=1, deleted=False):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.deleted = deleted
+        self.texts = []
+
+    async def edit_text(self, text, **kwargs):
+        if self.deleted:
+            raise BadRequest('Message to edit not found')
+        self.texts.append(text)
+        return self
+
+
+def test_edit_of_deleted_message_is_dropped():
+    async def scenario():
+        service = ProgressService(global_rate=100)
+        service.start()
+        try:
+            msg = FakeMessage(1, deleted=True)
+            service.report(msg, 'progress 10%')
+            # فشل التعديل لا يصل إلى المهمة
+            assert await service.edit(msg, 'done') is None
+            assert not service._pending and not service._shown
+
+            # فشل عرض التقدم ينسى الرسالة أيضاً
+            service.report(msg, 'progress 20%')
+            await asyncio.sleep(0.05)
+            assert not service._pending and not service._shown
+        finally:
+            await service.stop()
+
+    asyncio.run(scenario())
+
+
+def test_finished_messages_and_idle_chats_are_forgotten(monkeypatch):
+    monkeypatch.setattr(progress, '_CHAT_IDLE_SECONDS', 0.05)
+
+    async def scenario():
+        service = ProgressService(global_rate=100)
+        service.start()
+        try:
+            messages = [FakeMessage(chat_id) for chat_id in range(1, 21)]
+            for msg in messages:
+                service.report(msg, 'progress 50%')
+            await asyncio.sleep(0.05)
+            assert len(service._shown) == 20
+            assert messages[0].texts == ['progress 50%']
+
+            # انتهاء المهمة ينهي تتبع رسالتها
+            await service.edit(messages[0], 'done')
+            service.forget(messages[0])
+            assert len(service._shown) == 19
+
+            # محادثة جديدة بعد مدة الخمول تزيل المحادثات الخاملة وآخر تقدم عُرض فيها
+            await asyncio.sleep(0.1)
+            await service.edit(FakeMessage(99), 'queued')
+            assert list(service._chats) == [99]
+            assert not service._shown
+        finally:
+            await service.stop()
+
+    asyncio.run(scenario())
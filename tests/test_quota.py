@@ -0,0 +1,58 @@
+import functools
+import json
+
+import pytest
+
+from core import channel_pool
+from core.channel_pool import ChannelPool
+from core.quota import QuotaLedger
+from utils.session_manager import SessionManager
+
+
+@pytest.fixture
+def secrets(tmp_path, monkeypatch):
+    """ملف client_secrets لكل قناة: a وb في نفس المشروع وc في مشروع آخر"""
+    files = {}
+    for channel, project in (('a', 'project-1'), ('b', 'project-1'), ('c', 'project-2')):
+        path = tmp_path / f'{channel}.json'
+        path.write_text(json.dumps({'installed': {'project_id': project, 'client_id': f'{channel}-client'}}))
+        files[channel] = str(path)
+    monkeypatch.setattr(SessionManager, 'client_secrets_file', staticmethod(lambda channel: files[channel]))
+    monkeypatch.setattr(channel_pool, 'QuotaLedger', functools.partial(QuotaLedger, db_path=str(tmp_path / 'jobs.db')))
+    return tmp_path
+
+
+def test_ledger_is_shared_and_persisted_per_project(secrets):
+    pool = ChannelPool()
+    # القناة b تطلب السجل أولاً؛ الاستهلاك يُحفظ باسم المشروع لا باسم القناة
+    pool._ledger_for('b').charge('videos.insert')
+    assert pool._ledger_for('a') is pool._ledger_for('b')
+    assert pool._ledger_for('c') is not pool._ledger_for('a')
+    assert pool._ledger_for('a').snapshot()['project'] == 'project-1'
+    for ledger in pool.ledgers():
+        ledger.close()
+
+    # بعد إعادة التشغيل تطلب القناة a السجل أولاً وترى نفس الاستهلاك
+    pool = ChannelPool()
+    assert pool._ledger_for('a').used() == 1600
+    assert pool._ledger_for('c').used() == 0
+    for ledger in pool.ledgers():
+        ledger.close()
+
+
+def test_unreadable_secrets_fall_back_to_file_name(tmp_path, monkeypatch):
+    monkeypatch.setattr(SessionManager, 'client_secrets_file', staticmethod(lambda channel: str(tmp_path / 'missing.json')))
+    assert SessionManager.project_id('x') == 'missing'
+
+
+def test_submitted_charges_are_written_before_close(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    ledger = QuotaLedger(db_path=db_path, project='p')
+    for _ in range(3):
+        ledger.submit(ledger.charge, 'videos.list')
+    ledger.submit(ledger.charge, 'videos.insert')
+    ledger.close()
+
+    ledger = QuotaLedger(db_path=db_path, project='p')
+    assert ledger.used() == 1603
+    ledger.close()
@@ -0,0 +1,205 @@
+import os
+import asyncio
+import tracemalloc
+
+from config.config import UPLOAD_BUFFER_SIZE
+
+from core.resumable_upload import ResumableUploader, CHUNK_GRANULARITY, save_upload_state, upload_state_path
+from tests.fakes import FakeUploadServer
+
+BODY = {'snippet': {'title': 'test'}, 'status': {'privacyStatus': 'private'}}
+
+
+async def token():
+    return 'token'
+
+
+def make_uploader(server, chunk_size=2 * CHUNK_GRANULARITY):
+    return ResumableUploader(token, upload_url=server.upload_url, chunk_size=chunk_size)
+
+
+def test_upload_file_sends_every_chunk(make_file):
+    path, data = make_file(5 * CHUNK_GRANULARITY + 1234)
+
+    async def scenario():
+        async with FakeUploadServer() as server:
+            uploader = make_uploader(server)
+            progress = []
+
+            async def on_progress(sent, total):
+                progress.append(sent)
+
+            try:
+                response = await uploader.upload_file(path, BODY, progress_callback=on_progress)
+            finally:
+                await uploader.close()
+            session = server.session(response['id'])
+            assert bytes(session.data) == data
+            assert response['snippet'] == BODY['snippet']
+            # ثلاثة أجزاء: 512KB ثم 512KB ثم الباقي
+            assert progress == [2 * CHUNK_GRANULARITY, 4 * CHUNK_GRANULARITY]
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_uploads_keep_event_loop_responsive(make_file):
+    files = [make_file(8 * CHUNK_GRANULARITY, name=f'video{i}.mp4') for i in range(3)]
+
+    async def scenario():
+        async with FakeUploadServer() as server:
+            uploader = make_uploader(server)
+            ticks = []
+            done = asyncio.Event()
+
+            async def ticker():
+                while not done.is_set():
+                    ticks.append(asyncio.get_running_loop().time())
+                    await asyncio.sleep(0.001)
+
+            ticking = asyncio.create_task(ticker())
+            try:
+                responses = await asyncio.gather(*(uploader.upload_file(path, BODY) for path, _ in files))
+            finally:
+                done.set()
+                await ticking
+                await uploader.close()
+
+            for response, (_, data) in zip(responses, files):
+                assert bytes(server.session(response['id']).data) == data
+            # حلقة الأحداث استمرت في خدمة المهام الأخرى طوال الرفع
+            assert len(ticks) > 10
+
+    asyncio.run(scenario())
+
+
+def test_partial_commit_continues_from_range_header(make_file):
+    path, data = make_file(6 * CHUNK_GRANULARITY)
+
+    async def scenario():
+        # الخادم يثبت 300KB فقط من كل جزء ويرد 308 مع Range بآخر بايت ثبته
+        async with FakeUploadServer(commit_limit=300 * 1024) as server:
+            uploader = make_uploader(server)
+            try:
+                response = await uploader.upload_file(path, BODY)
+            finally:
+                await uploader.close()
+            assert bytes(server.session(response['id']).data) == data
+            starts = [request[2].split(' ')[1].split('-')[0] for request in server.requests if request[0] == 'put']
+            assert starts[:3] == ['0', str(300 * 1024), str(600 * 1024)]
+
+    asyncio.run(scenario())
+
+
+def test_server_error_queries_status_and_resends_chunk(make_file):
+    path, data = make_file(4 * CHUNK_GRANULARITY)
+
+    async def scenario():
+        async with FakeUploadServer() as server:
+            server.chunk_failures = [503]
+            uploader = make_uploader(server)
+            try:
+                response = await uploader.upload_file(path, BODY)
+            finally:
+                await uploader.close()
+            assert bytes(server.session(response['id']).data) == data
+            ranges = [request[2] for request in server.requests if request[0] == 'put']
+            assert ranges[:3] == [
+                f'bytes 0-{2 * CHUNK_GRANULARITY - 1}/{len(data)}',
+                f'bytes */{len(data)}',
+                f'bytes 0-{2 * CHUNK_GRANULARITY - 1}/{len(data)}'
+            ]
+
+    asyncio.run(scenario())
+
+
+def test_killed_upload_resumes_in_new_process(make_file):
+    path, data = make_file(8 * CHUNK_GRANULARITY + 777)
+
+    async def scenario():
+        async with FakeUploadServer(pause_at=3 * CHUNK_GRANULARITY + 100) as server:
+            # العملية الأولى تتوقف أثناء إرسال الجزء الثاني
+            first = make_uploader(server)
+            upload = asyncio.create_task(first.upload_file(path, BODY))
+            await server.paused.wait()
+            upload.cancel()
+            await asyncio.gather(upload, return_exceptions=True)
+            await first.close()
+            [session] = server.sessions.values()
+            committed = session.received
+            assert 0 < committed < len(data)
+
+            # عملية جديدة: لا يُمرر رابط الجلسة، فيُقرأ من ملف الحالة بجانب الملف
+            second = make_uploader(server)
+            try:
+                response = await second.upload_file(path, BODY)
+            finally:
+                await second.close()
+
+            assert len(server.sessions) == 1
+            assert bytes(session.data) == data
+            assert response['id'] == session.video_id
+            resumed = [request[2] for request in server.requests if request[0] == 'put']
+            assert f'bytes */{len(data)}' in resumed
+            assert f'bytes {committed}-' in resumed[resumed.index(f'bytes */{len(data)}') + 1]
+            assert not os.path.exists(upload_state_path(path))
+
+    asyncio.run(scenario())
+
+
+def test_expired_saved_session_starts_a_new_one(make_file):
+    path, data = make_file(3 * CHUNK_GRANULARITY)
+
+    async def scenario():
+        async with FakeUploadServer() as server:
+            uploader = make_uploader(server)
+            try:
+                stale = server.url + '/upload/session/gone'
+                save_upload_state(path, stale, len(data), CHUNK_GRANULARITY)
+                response = await uploader.upload_file(path, BODY)
+            finally:
+                await uploader.close()
+            assert bytes(server.session(response['id']).data) == data
+            assert len(server.sessions) == 1
+
+    asyncio.run(scenario())
+
+
+def test_upload_memory_is_bounded_by_read_window(tmp_path):
+    size = 128 * 1024 * 1024
+    path = str(tmp_path / 'sparse.mp4')
+    with open(path, 'wb') as f:
+        f.truncate(size)
+
+    async def scenario():
+        async with FakeUploadServer(keep_data=False) as server:
+            # جزء واحد بحجم الملف كاملاً
+            uploader = make_uploader(server, chunk_size=size)
+            tracemalloc.start()
+            try:
+                await uploader.upload_file(path, BODY)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+                await uploader.close()
+            assert server.sessions['1'].received == size
+            assert peak < 8 * UPLOAD_BUFFER_SIZE < size
+
+    asyncio.run(scenario())
+
+
+def test_session_alive_distinguishes_expired_sessions(make_file):
+    path, data = make_file(CHUNK_GRANULARITY)
+
+    async def scenario():
+        async with FakeUploadServer() as server:
+            uploader = make_uploader(server)
+            try:
+                session_uri = await uploader.create_session(BODY, len(data))
+                assert await uploader.session_alive(session_uri, len(data))
+                assert not await uploader.session_alive(server.url + '/upload/session/gone', len(data))
+            finally:
+                await uploader.close()
+            # الاستعلام لا ينشئ جلسات جديدة
+            assert len(server.sessions) == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from core.resumable_upload import ResumableUploadError
+from utils.retry import CircuitBreaker, CircuitOpenError, retry_async
+
+
+def open_breaker():
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=0)
+    breaker.record(ConnectionError('reset'))
+    assert breaker.is_open
+    return breaker
+
+
+def test_cancelled_probe_allows_another_probe():
+    breaker = open_breaker()
+
+    async def scenario():
+        probe = asyncio.create_task(retry_async(asyncio.Event().wait, 'probe', breaker=breaker))
+        await asyncio.sleep(0)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        # الطلب التالي يصبح طلب الاختبار بدلاً من رفضه إلى الأبد
+        async def succeed():
+            return 'ok'
+        assert await retry_async(succeed, 'probe', breaker=breaker) == 'ok'
+
+    asyncio.run(scenario())
+    assert not breaker.is_open
+
+
+def test_probe_in_progress_rejects_other_calls():
+    breaker = open_breaker()
+    with breaker.guard():
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+    assert not breaker.is_open
+
+
+def test_unexpected_errors_count_as_failures():
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=60)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            with breaker.guard():
+                raise RuntimeError('unexpected')
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_client_errors_mean_the_service_is_up():
+    breaker = open_breaker()
+    with pytest.raises(ResumableUploadError):
+        with breaker.guard():
+            raise ResumableUploadError('bad request', status=400)
+    assert not breaker.is_open
@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+
+from core.job_store import JobStore, STAGE_DONE, STAGE_UPLOADING
+from core.telegram_bot import UploadBot
+from core.upload_index import UploadIndex
+
+SOURCE = {'type': 'message', 'file_id': 'f'}
+
+
+class FakeUploader:
+    def __init__(self, playlist_failures=0):
+        self.playlist_failures = playlist_failures
+        self.playlist_calls = []
+
+    async def video_exists(self, video_id):
+        return True
+
+    async def add_to_playlist(self, video_id, playlist_id):
+        self.playlist_calls.append((video_id, playlist_id))
+        if self.playlist_failures:
+            self.playlist_failures -= 1
+            raise Exception('playlistItems.insert failed')
+
+
+class FakeProgress:
+    def __init__(self):
+        self.texts = []
+
+    async def edit(self, msg, text):
+        self.texts.append(text)
+
+    def forget(self, msg):
+        pass
+
+
+def make_bot(tmp_path, uploader):
+    db_path = str(tmp_path / 'jobs.db')
+    bot = SimpleNamespace(
+        jobs=JobStore(db_path),
+        uploads=UploadIndex(db_path),
+        channels=SimpleNamespace(for_job=lambda job: uploader, release=lambda job_id: None),
+        progress=FakeProgress()
+    )
+    bot._complete_job = lambda *args, **kwargs: UploadBot._complete_job(bot, *args, **kwargs)
+    return bot
+
+
+def create_job(bot):
+    job_id = bot.jobs.create(chat_id=1, user_id=1, source=SOURCE, title='t', playlist_id='PL1', stage=STAGE_UPLOADING)
+    bot.jobs.update(job_id, media_key='doc:1', total_bytes=10)
+    return job_id
+
+
+def test_playlist_failure_keeps_the_uploaded_video(tmp_path):
+    uploader = FakeUploader(playlist_failures=1)
+    bot = make_bot(tmp_path, uploader)
+    job_id = create_job(bot)
+
+    asyncio.run(UploadBot._complete_job(bot, job_id, None, 'video1'))
+
+    # الفيديو مسجل في فهرس الرفع والمهمة مكتملة رغم فشل الإضافة إلى قائمة التشغيل
+    job = bot.jobs.get(job_id)
+    assert job['stage'] == STAGE_DONE
+    assert job['video_url'].endswith('video1')
+    assert 'قائمة التشغيل' in job['error']
+    assert bot.uploads.find('doc:1') == {'video_id': 'video1', 'playlists': set()}
+    assert '⚠️' in bot.progress.texts[-1]
+
+    # إعادة إرسال نفس الفيديو تعيد محاولة الإضافة وحدها دون رفعه
+    retry_id = create_job(bot)
+    assert asyncio.run(UploadBot._reuse_existing_upload(bot, retry_id, None))
+    assert uploader.playlist_calls == [('video1', 'PL1'), ('video1', 'PL1')]
+    assert bot.uploads.find('doc:1')['playlists'] == {'PL1'}
+    assert bot.jobs.get(retry_id)['error'] is None
+    bot.jobs.close()
+    bot.uploads.close()
+
+
+def test_reused_video_already_in_playlist_skips_insert(tmp_path):
+    uploader = FakeUploader()
+    bot = make_bot(tmp_path, uploader)
+    asyncio.run(UploadBot._complete_job(bot, create_job(bot), None, 'video1'))
+
+    job_id = create_job(bot)
+    assert asyncio.run(UploadBot._reuse_existing_upload(bot, job_id, None))
+    assert uploader.playlist_calls == [('video1', 'PL1')]
+    assert bot.jobs.get(job_id)['stage'] == STAGE_DONE
+    bot.jobs.close()
+    bot.uploads.close()
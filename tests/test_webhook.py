@@ -0,0 +1,174 @@
+import random
+import asyncio
+
+import aiohttp
+import pytest
+from telegram import User
+from telegram.ext import Application, ExtBot
+
+from core import webhook
+from core.telegram_bot import UploadBot
+from core.webhook import SECRET_HEADER, WebhookServer
+from tests.fakes import FakeApplication, text_update
+from utils.auth_codes import AuthCodeWaiters
+
+
+@pytest.fixture(autouse=True)
+def local_listener(monkeypatch):
+    monkeypatch.setattr(webhook, 'WEBHOOK_LISTEN', '127.0.0.1')
+    monkeypatch.setattr(webhook, 'WEBHOOK_PORT', 0)
+    monkeypatch.setattr(webhook, 'WEBHOOK_URL', 'https://example.com')
+
+
+class Client:
+    """يرسل التحديثات إلى الخادم كما يفعل تيليجرام"""
+
+    def __init__(self, server):
+        host, port = server._runner.addresses[0][:2]
+        self.url = f'http://{host}:{port}{webhook.WEBHOOK_PATH}'
+        self.secret = server.secret_token
+        self.session = aiohttp.ClientSession()
+
+    async def post(self, update, secret=None):
+        headers = {SECRET_HEADER: self.secret if secret is None else secret}
+        async with self.session.post(self.url, json=update, headers=headers) as resp:
+            return resp.status
+
+    async def close(self):
+        await self.session.close()
+
+
+def test_rejects_updates_without_secret_token():
+    async def scenario():
+        application = FakeApplication()
+        server = WebhookServer(application, workers=2)
+        await server.start()
+        client = Client(server)
+        try:
+            assert await client.post(text_update(1, 10), secret='wrong') == 403
+            assert await client.post(text_update(2, 10)) == 200
+        finally:
+            await client.close()
+            await server.stop()
+        assert application.processed == [(10, 2)]
+        assert server.counters['rejected'] == 1
+        assert application.webhook['secret_token'] == server.secret_token
+
+    asyncio.run(scenario())
+
+
+def test_updates_of_each_chat_are_processed_in_order():
+    async def handler(update):
+        await asyncio.sleep(random.uniform(0, 0.005))
+
+    async def scenario():
+        application = FakeApplication(handler)
+        server = WebhookServer(application, workers=3)
+        await server.start()
+        client = Client(server)
+        try:
+            updates = [text_update(update_id, 100 + update_id % 5) for update_id in range(1, 61)]
+            statuses = []
+            for update in updates:
+                statuses.append(await client.post(update))
+        finally:
+            await client.close()
+            await server.stop()
+
+        assert statuses == [200] * len(updates)
+        assert len(application.processed) == len(updates)
+        for chat_id in range(100, 105):
+            ids = [update_id for chat, update_id in application.processed if chat == chat_id]
+            assert ids == sorted(ids)
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects_updates_until_drained(monkeypatch):
+    monkeypatch.setattr(webhook, 'WEBHOOK_QUEUE_SIZE', 2)
+    release = asyncio.Event()
+
+    async def handler(update):
+        await release.wait()
+
+    async def scenario():
+        application = FakeApplication(handler)
+        server = WebhookServer(application, workers=1)
+        await server.start()
+        client = Client(server)
+        try:
+            # الأول قيد المعالجة واثنان في الطابور، والرابع يُرفض ليعيد تيليجرام إرساله
+            statuses = [await client.post(text_update(update_id, 10)) for update_id in range(1, 5)]
+            assert statuses == [200, 200, 200, 503]
+            assert server.counters['dropped'] == 1
+
+            # أثناء الإيقاف تُرفض التحديثات الجديدة وتُعالج المستلمة
+            stopping = asyncio.create_task(server.stop())
+            await asyncio.sleep(0.05)
+            assert await client.post(text_update(5, 10)) == 503
+            release.set()
+            await stopping
+        finally:
+            await client.close()
+        assert application.processed == [(10, 1), (10, 2), (10, 3)]
+
+    asyncio.run(scenario())
+
+
+class AuthFlowHandlers:
+    """معالجات البوت الحقيقية المسجلة بـ setup_handlers، مع /auth ينتظر الرمز من رسالة لاحقة"""
+
+    def __init__(self, app):
+        self.app = app
+        self.waiters = AuthCodeWaiters()
+        self.codes = []
+
+    async def auth_command(self, update, context):
+        self.codes.append(await self.waiters.wait(update.effective_chat.id, timeout=5))
+
+    async def handle_text_message(self, update, context):
+        self.waiters.deliver(update.effective_chat.id, update.message.text)
+
+    def __getattr__(self, name):
+        async def ignore(*args):
+            pass
+        return ignore
+
+
+def test_auth_code_reaches_the_waiting_auth_command(monkeypatch):
+    # طلبات Bot API الوحيدة في المسار: التعريف بالبوت وتسجيل الـ webhook
+    async def get_me(self, *args, **kwargs):
+        self._bot_user = User(id=1, is_bot=True, first_name='bot', username='test_bot')
+        return self._bot_user
+
+    async def set_webhook(self, *args, **kwargs):
+        return True
+
+    monkeypatch.setattr(ExtBot, 'get_me', get_me)
+    monkeypatch.setattr(ExtBot, 'set_webhook', set_webhook)
+
+    async def scenario():
+        application = Application.builder().token('1:token').updater(None).build()
+        handlers = AuthFlowHandlers(application)
+        UploadBot.setup_handlers(handlers)
+        await application.initialize()
+        await application.start()
+        server = WebhookServer(application, workers=1)
+        await server.start()
+        client = Client(server)
+        try:
+            assert await client.post(text_update(1, 10, '/auth')) == 200
+            assert await client.post(text_update(2, 10, '4/code')) == 200
+            for _ in range(100):
+                if handlers.codes:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await client.close()
+            await server.stop()
+            await application.stop()
+            await application.shutdown()
+        # الرمز وصل عبر طابور المحادثة نفسه بينما /auth ينتظره
+        assert handlers.codes == ['4/code']
+
+    asyncio.run(scenario())
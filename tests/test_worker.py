@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+
+from core.job_store import JobStore, STAGE_DOWNLOADING, STAGE_UPLOADING
+from core.scheduler import STAGE_DOWNLOAD, STAGE_UPLOAD
+from core.telegram_bot import UploadBot
+from core.worker import WorkerNode
+
+LINK_SOURCE = {'type': 'link', 'link_info': {'type': 'public', 'channel_username': 'channel', 'message_id': 1}}
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.submitted = []
+
+    async def submit(self, job_id, msg, stage):
+        self.submitted.append((job_id, stage))
+        return 1
+
+
+def make_node(tmp_path):
+    jobs = JobStore(str(tmp_path / 'jobs.db'))
+    bot = SimpleNamespace(jobs=jobs, scheduler=FakeScheduler(), _scheduler_stage=UploadBot._scheduler_stage)
+    return WorkerNode(bot, node_id='w2'), jobs
+
+
+def test_upload_job_from_another_node_keeps_its_session(tmp_path):
+    node, jobs = make_node(tmp_path)
+    # توقفت العقدة w1 أثناء الرفع وملف المهمة على قرصها
+    job_id = jobs.create(chat_id=1, user_id=1, source=LINK_SOURCE, title='t', playlist_id=None)
+    jobs.update(
+        job_id, stage=STAGE_UPLOADING, file_path=str(tmp_path / 'missing.mp4'),
+        downloaded_bytes=1000, upload_uri='https://upload/session/1', uploaded_bytes=512
+    )
+
+    asyncio.run(node._submit(jobs.claim('w2', 60)))
+
+    job = jobs.get(job_id)
+    # يُعاد التنزيل إلى القرص فقط ثم يُستكمل الرفع من نفس الجلسة
+    assert node.bot.scheduler.submitted == [(job_id, STAGE_DOWNLOAD)]
+    assert job['stage'] == STAGE_UPLOADING
+    assert job['upload_uri'] == 'https://upload/session/1'
+    assert job['downloaded_bytes'] == 0
+    jobs.close()
+
+
+def test_upload_job_with_local_file_goes_straight_to_upload(tmp_path):
+    node, jobs = make_node(tmp_path)
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(b'data')
+    job_id = jobs.create(chat_id=1, user_id=1, source=LINK_SOURCE, title='t', playlist_id=None)
+    jobs.update(job_id, stage=STAGE_UPLOADING, file_path=str(path), upload_uri='https://upload/session/1')
+    downloading = jobs.create(chat_id=1, user_id=1, source=LINK_SOURCE, title='t', playlist_id=None)
+    jobs.update(downloading, stage=STAGE_DOWNLOADING)
+
+    asyncio.run(node._submit(jobs.claim('w2', 60)))
+    asyncio.run(node._submit(jobs.claim('w2', 60)))
+
+    assert node.bot.scheduler.submitted == [(job_id, STAGE_UPLOAD), (downloading, STAGE_DOWNLOAD)]
+    jobs.close()
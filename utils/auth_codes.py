@@ -0,0 +1,67 @@
+"""
+تسليم رموز مصادقة يوتيوب من رسائل المسؤول إلى عمليات المصادقة المنتظرة
+"""
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class AuthCancelledError(Exception):
+    """أُلغيت عملية المصادقة قبل وصول الرمز"""
+
+
+class AuthCodeWaiters:
+    """
+    كل عملية مصادقة تنتظر Future خاصاً بها ضمن طابور محادثة المسؤول،
+    ويُسلَّم كل رمز يصل إلى أقدم عملية منتظرة في تلك المحادثة فوراً دون استطلاع
+    """
+
+    def __init__(self):
+        self._waiters = {}  # chat_id -> deque[asyncio.Future]
+
+    def is_waiting(self, chat_id=None):
+        """هل توجد عملية مصادقة تنتظر رمزاً (في محادثة محددة أو في أي محادثة)"""
+        if chat_id is None:
+            return any(self._waiters.values())
+        return bool(self._waiters.get(chat_id))
+
+    async def wait(self, chat_id, timeout):
+        """
+        انتظار رمز من محادثة المسؤول؛ ترفع asyncio.TimeoutError عند انتهاء المهلة
+        و AuthCancelledError عند إلغاء العملية
+        """
+        future = asyncio.get_running_loop().create_future()
+        queue = self._waiters.setdefault(chat_id, deque())
+        queue.append(future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            # إزالة الانتظار عند انتهاء المهلة أو الإلغاء أو الاستلام
+            if future in queue:
+                queue.remove(future)
+            if not queue and self._waiters.get(chat_id) is queue:
+                del self._waiters[chat_id]
+
+    def deliver(self, chat_id, code):
+        """تسليم الرمز لأقدم عملية منتظرة في المحادثة، وإرجاع False إذا لم توجد"""
+        queue = self._waiters.get(chat_id)
+        while queue:
+            future = queue.popleft()
+            if not future.done():
+                future.set_result(code)
+                return True
+        return False
+
+    def cancel(self, chat_id):
+        """إلغاء جميع عمليات المصادقة المنتظرة في المحادثة وإرجاع عددها"""
+        queue = self._waiters.pop(chat_id, None) or ()
+        count = 0
+        for future in queue:
+            if not future.done():
+                future.set_exception(AuthCancelledError("تم إلغاء عملية المصادقة"))
+                count += 1
+        if count:
+            logger.info(f"تم إلغاء {count} عملية مصادقة منتظرة في المحادثة {chat_id}")
+        return count
@@ -10,7 +10,8 @@ from datetime import datetime, timedelta
 # إضافة المجلد الأساسي إلى مسار Python
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import DOWNLOAD_DIR, LOGS_DIR, APP_LOGS_DIR, SESSIONS_DIR
+from config.config import DOWNLOAD_DIR, LOGS_DIR, APP_LOGS_DIR, SESSIONS_DIR
+from core.job_store import JobStore
 
 logging.basicConfig(
     level=logging.INFO, 
@@ -28,9 +29,16 @@ def clean_temp_files(days_old=1):
     count = 0
     size = 0
     
+    # عدم حذف ملفات المهام غير المكتملة حتى يمكن استئنافها
+    job_store = JobStore()
+    active_files = job_store.active_files()
+    job_store.close()
+    
     logger.info(f"بدء تنظيف الملفات المؤقتة القديمة في {DOWNLOAD_DIR}")
     for file in os.listdir(DOWNLOAD_DIR):
         file_path = os.path.join(DOWNLOAD_DIR, file)
+        if file_path in active_files:
+            continue
         if os.path.isfile(file_path):
             # التحقق من عمر الملف
             file_age = now - os.path.getmtime(file_path)
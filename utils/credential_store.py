@@ -0,0 +1,144 @@
+"""
+حامل بيانات اعتماد يوتيوب في الذاكرة مع تجديد موحد وتجديد استباقي في الخلفية
+"""
+import os
+import pickle
+import datetime
+import asyncio
+import logging
+
+from google.auth.transport.requests import Request
+
+logger = logging.getLogger(__name__)
+
+# فترة الانتظار قبل إعادة محاولة التجديد الاستباقي بعد فشله (بالثواني)
+_REFRESH_RETRY_DELAY = 60
+
+
+class CredentialsUnavailableError(Exception):
+    """
+    لا يوجد توكن صالح أو قابل للتجديد للقناة: يلزم إعادة المصادقة عبر /auth في الواجهة.
+    يُصنف كخطأ مصادقة (401) في سياسة إعادة المحاولة
+    """
+    status = 401
+
+    def __init__(self, channel, reason):
+        super().__init__(f"لا تتوفر بيانات اعتماد يوتيوب صالحة للقناة {channel} ({reason})، يرجى المصادقة عبر /auth")
+        self.channel = channel
+
+
+class CredentialStore:
+    """
+    يحتفظ ببيانات الاعتماد في الذاكرة ولا يعيد قراءة ملف التوكن إلا إذا تغير وقت تعديله.
+    التجديد يتم في خيط منفصل، والمستدعون المتزامنون ينتظرون عملية تجديد واحدة
+    """
+
+    def __init__(self, token_path):
+        self.token_path = token_path
+        self._creds = None
+        self._mtime = None
+        self._refresh_task = None
+        self._background_task = None
+
+    def load(self):
+        """بيانات الاعتماد الحالية، مع إعادة تحميل الملف فقط عند تغيره على القرص"""
+        try:
+            mtime = os.stat(self.token_path).st_mtime_ns
+        except FileNotFoundError:
+            self._creds, self._mtime = None, None
+            return None
+        if mtime != self._mtime:
+            with open(self.token_path, 'rb') as token:
+                self._creds = pickle.load(token)
+            self._mtime = mtime
+            logger.info(f"تم تحميل بيانات الاعتماد من {self.token_path}")
+        return self._creds
+
+    def save(self, creds):
+        """حفظ بيانات الاعتماد بشكل ذري وتحديثها في الذاكرة"""
+        os.makedirs(os.path.dirname(self.token_path), exist_ok=True)
+        tmp_path = self.token_path + '.tmp'
+        with open(tmp_path, 'wb') as token:
+            pickle.dump(creds, token)
+        os.replace(tmp_path, self.token_path)
+        self._creds = creds
+        self._mtime = os.stat(self.token_path).st_mtime_ns
+        logger.info(f"تم حفظ بيانات الاعتماد في {self.token_path}")
+
+    @staticmethod
+    def seconds_left(creds):
+        """الثواني المتبقية حتى انتهاء صلاحية التوكن (None إذا كانت غير معروفة)"""
+        if not creds or not creds.expiry:
+            return None
+        # expiry في مكتبة google-auth بتوقيت UTC بدون منطقة زمنية
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return (creds.expiry - now).total_seconds()
+
+    async def get_valid(self, refresh_threshold):
+        """
+        بيانات اعتماد صالحة لمدة refresh_threshold ثانية على الأقل، بعد تجديدها إذا لزم الأمر.
+        تعيد None إذا لم يوجد توكن قابل للاستخدام أو التجديد
+        """
+        creds = self.load()
+        if not creds:
+            return None
+        left = self.seconds_left(creds)
+        if creds.valid and (left is None or left >= refresh_threshold):
+            return creds
+        if not creds.refresh_token:
+            return creds if creds.valid else None
+        logger.info("تجديد التوكن قبل انتهاء الصلاحية" if creds.valid else "تجديد التوكن منتهي الصلاحية")
+        return await self.refresh()
+
+    async def refresh(self):
+        """تجديد التوكن مرة واحدة مهما كان عدد المستدعين المتزامنين"""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._do_refresh())
+        task = self._refresh_task
+        return await asyncio.shield(task)
+
+    async def _do_refresh(self):
+        try:
+            creds = self.load()
+            if not creds or not creds.refresh_token:
+                raise Exception("لا يوجد توكن قابل للتجديد")
+            loop = asyncio.get_running_loop()
+            # creds.refresh طلب HTTP حاجب، لذلك يُنفذ خارج حلقة الأحداث
+            await loop.run_in_executor(None, creds.refresh, Request())
+            await loop.run_in_executor(None, self.save, creds)
+            logger.info("تم تجديد التوكن بنجاح")
+            return creds
+        finally:
+            self._refresh_task = None
+
+    def start_background_refresh(self, lead_time):
+        """تشغيل مهمة تجدد التوكن قبل انتهاء صلاحيته بـ lead_time ثانية"""
+        if self._background_task is None or self._background_task.done():
+            self._background_task = asyncio.create_task(self._background_refresh(lead_time))
+
+    async def stop_background_refresh(self):
+        if self._background_task:
+            self._background_task.cancel()
+            try:
+                await self._background_task
+            except asyncio.CancelledError:
+                pass
+            self._background_task = None
+
+    async def _background_refresh(self, lead_time):
+        while True:
+            delay = _REFRESH_RETRY_DELAY
+            try:
+                creds = self.load()
+                left = self.seconds_left(creds)
+                if creds and creds.refresh_token and left is not None:
+                    if left <= lead_time:
+                        logger.info("تجديد استباقي لتوكن يوتيوب")
+                        creds = await self.refresh()
+                        left = self.seconds_left(creds)
+                    delay = max(left - lead_time, _REFRESH_RETRY_DELAY)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"فشل التجديد الاستباقي لتوكن يوتيوب: {str(e)}")
+            await asyncio.sleep(delay)
@@ -0,0 +1,253 @@
+"""
+سياسة إعادة المحاولة المشتركة: تصنيف الأخطاء، تأخير أسي بارتعاش غير مترابط،
+واحترام أوقات الانتظار التي يحددها الخادم، مع قاطع دائرة لكل نقطة اتصال
+"""
+import time
+import random
+import asyncio
+import logging
+import contextlib
+
+import aiohttp
+from telethon.errors import FloodWaitError
+
+from config.config import (
+    MAX_RETRIES,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    MAX_FLOOD_WAIT,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+# أصناف الأخطاء
+RETRYABLE = 'retryable'    # أخطاء 5xx وانتهاء المهلة وانقطاع الاتصال وحدود المعدل المؤقتة
+QUOTA = 'quota'            # نفاد حصة YouTube API (403 quotaExceeded)
+AUTH = 'auth'              # توكن غير صالح (401): يُجدد التوكن ثم يُعاد الطلب مرة واحدة
+FLOOD_WAIT = 'flood_wait'  # FloodWait من تيليجرام: انتظار المدة المحددة
+FATAL = 'fatal'            # أخطاء لا تفيد إعادة المحاولة معها
+
+# أسباب 403 في YouTube API
+_QUOTA_REASONS = ('quotaExceeded', 'dailyLimitExceeded')
+_RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+
+
+class CircuitOpenError(Exception):
+    """قاطع الدائرة مفتوح: نقطة الاتصال متعطلة ولا تُرسل إليها طلبات حالياً"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"نقطة الاتصال {name} متوقفة مؤقتاً بعد أخطاء متتالية")
+        self.retry_after = retry_after
+
+
+def error_status(error):
+    """رمز حالة HTTP (أو رمز خطأ تيليجرام) إن وُجد"""
+    status = getattr(error, 'status', None)
+    if status is None:
+        # HttpError في googleapiclient
+        status = getattr(getattr(error, 'resp', None), 'status', None)
+    if status is None:
+        # RPCError في Telethon
+        status = getattr(error, 'code', None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(error):
+    """تصنيف الخطأ لتحديد طريقة التعامل معه"""
+    if isinstance(error, FloodWaitError):
+        return FLOOD_WAIT
+    if isinstance(error, (CircuitOpenError, asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return RETRYABLE
+
+    status = error_status(error)
+    if status is None:
+        # أخطاء aiohttp دون رد من الخادم (انقطاع الاتصال أو خطأ في جسم الرد)
+        return RETRYABLE if isinstance(error, aiohttp.ClientError) else FATAL
+
+    text = str(error)
+    content = getattr(error, 'content', None)
+    if isinstance(content, bytes):
+        text += content.decode('utf-8', 'replace')
+    if status == 401:
+        return AUTH
+    if status == 403:
+        if any(reason in text for reason in _QUOTA_REASONS):
+            return QUOTA
+        if any(reason in text for reason in _RATE_LIMIT_REASONS):
+            return RETRYABLE
+        return FATAL
+    if status in (408, 429) or status >= 500 or status == -503:
+        return RETRYABLE
+    return FATAL
+
+
+def retry_after(error):
+    """مدة الانتظار التي حددها الخادم (FloodWait أو ترويسة Retry-After) إن وُجدت"""
+    if isinstance(error, FloodWaitError):
+        return error.seconds
+    value = getattr(error, 'retry_after', None)
+    if value is None:
+        headers = getattr(error, 'headers', None) or getattr(error, 'resp', None)
+        if headers is not None:
+            try:
+                value = headers.get('Retry-After') or headers.get('retry-after')
+            except AttributeError:
+                value = None
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class Backoff:
+    """
+    تأخير أسي بارتعاش غير مترابط (decorrelated jitter): كل تأخير يُختار عشوائياً
+    بين base وثلاثة أضعاف التأخير السابق، فلا تتزامن محاولات المهام المختلفة
+    """
+
+    def __init__(self, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY):
+        self.base = base
+        self.cap = cap
+        self._delay = base
+
+    def next(self):
+        self._delay = min(self.cap, random.uniform(self.base, self._delay * 3))
+        return self._delay
+
+    def reset(self):
+        self._delay = self.base
+
+    def delay_for(self, error):
+        """التأخير قبل المحاولة التالية: ما حدده الخادم إن وُجد، وإلا التأخير الأسي"""
+        server_delay = retry_after(error)
+        if server_delay is not None:
+            return server_delay
+        return self.next()
+
+
+class CircuitBreaker:
+    """
+    قاطع دائرة لنقطة اتصال واحدة مشترك بين جميع المهام: بعد failure_threshold خطأ
+    قابل لإعادة المحاولة متتالٍ يُفتح القاطع فترفض الطلبات فوراً لمدة reset_timeout،
+    ثم يُسمح بطلب اختبار واحد يغلق القاطع عند نجاحه أو يعيد فتحه عند فشله
+    """
+
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def before_call(self):
+        """
+        ترفع CircuitOpenError إذا كان القاطع مفتوحاً ولم يحن وقت طلب الاختبار.
+        تعيد True إذا كان هذا الطلب هو طلب الاختبار
+        """
+        if self._opened_at is None:
+            return False
+        remaining = self._opened_at + self.reset_timeout - time.monotonic()
+        if remaining > 0 or self._probing:
+            raise CircuitOpenError(self.name, max(remaining, 1.0))
+        self._probing = True
+        logger.info(f"قاطع الدائرة {self.name}: إرسال طلب اختبار")
+        return True
+
+    def release(self, probe):
+        """انتهى الطلب دون نتيجة (أُلغي أو انتهت مهلته): يُسمح بطلب اختبار آخر"""
+        if probe and self._probing:
+            self._probing = False
+
+    @contextlib.contextmanager
+    def guard(self):
+        """
+        تحيط بطلب واحد: تسجل نتيجته أياً كان نوع الخطأ، وتحرر طلب الاختبار إذا أُلغي الطلب
+        حتى لا يبقى القاطع مفتوحاً إلى أن تُعاد العملية
+        """
+        probe = self.before_call()
+        try:
+            yield
+        except Exception as e:
+            self.record(e)
+            raise
+        except BaseException:
+            self.release(probe)
+            raise
+        self.record()
+
+    def record(self, error=None):
+        """
+        تسجيل نتيجة الطلب (None عند النجاح). رد الخادم بخطأ لا يتعلق بتوفر الخدمة (مثل 400)
+        يعني أنها تعمل، أما الأخطاء القابلة لإعادة المحاولة والأخطاء غير المعروفة فتُحتسب فشلاً
+        """
+        if isinstance(error, CircuitOpenError):
+            return
+        if error is None or (classify_error(error) != RETRYABLE and error_status(error) is not None):
+            if self._opened_at is not None:
+                logger.info(f"قاطع الدائرة {self.name}: عادت الخدمة للعمل")
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+            return
+
+        self._failures += 1
+        if self._probing or self._failures >= self.failure_threshold:
+            if self._opened_at is None or self._probing:
+                logger.warning(
+                    f"قاطع الدائرة {self.name}: إيقاف الطلبات لمدة {self.reset_timeout} ث "
+                    f"بعد {self._failures} خطأ متتالٍ"
+                )
+            self._opened_at = time.monotonic()
+            self._probing = False
+
+
+_breakers = {}
+
+
+def circuit_breaker(name):
+    """قاطع الدائرة المشترك لنقطة الاتصال name"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+async def retry_async(operation, description, max_attempts=MAX_RETRIES, breaker=None, on_auth_error=None, backoff=None):
+    """
+    تنفيذ operation (دالة غير متزامنة بدون معاملات) مع إعادة المحاولة حسب صنف الخطأ.
+    on_auth_error: دالة غير متزامنة تجدد التوكن عند خطأ 401 (يُعاد الطلب بعدها مرة واحدة)
+    """
+    backoff = backoff or Backoff()
+    auth_refreshed = False
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            with breaker.guard() if breaker else contextlib.nullcontext():
+                result = await operation()
+        except Exception as e:
+            kind = classify_error(e)
+            if kind == AUTH and on_auth_error and not auth_refreshed:
+                auth_refreshed = True
+                logger.warning(f"{description}: توكن غير صالح، سيتم تجديده وإعادة المحاولة")
+                await on_auth_error()
+                continue
+            if kind not in (RETRYABLE, FLOOD_WAIT) or attempt >= max_attempts:
+                raise
+            delay = backoff.delay_for(e)
+            if kind == FLOOD_WAIT and delay > MAX_FLOOD_WAIT:
+                raise
+            logger.warning(f"{description}: فشلت المحاولة {attempt} ({str(e)})، إعادة المحاولة بعد {delay:.1f} ث")
+            await asyncio.sleep(delay)
+        else:
+            return result
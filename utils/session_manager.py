@@ -1,14 +1,14 @@
 import os
-import pickle
+import re
 import logging
-import time
 import json
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
 from config.config import (
     YOUTUBE_CLIENT_SECRETS_FILE,
     YOUTUBE_TOKEN_PICKLE,
+    DEFAULT_YOUTUBE_CHANNEL,
+    YOUTUBE_CHANNELS_DIR,
     SCOPES,
     TELEGRAM_SESSION_PATH,
     TELEGRAM_BOT_TOKEN,
@@ -16,18 +16,24 @@ from config.config import (
 )
 import asyncio
 from telegram import Bot
+from utils.auth_codes import AuthCodeWaiters
+from utils.credential_store import CredentialStore, CredentialsUnavailableError
 
 logger = logging.getLogger(__name__)
 
 # ملف حفظ إعدادات المسؤول
 ADMIN_CONFIG_FILE = os.path.join(DATA_DIR, 'admin_config.json')
 
+# أسماء القنوات تُستخدم في أسماء الملفات وبيانات أزرار تيليجرام
+_CHANNEL_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,32}$')
+
 class SessionManager:
-    _last_token_check = 0
-    _token_check_interval = 1800  # 30 دقيقة
     _token_refresh_threshold = 300  # 5 دقائق قبل انتهاء الصلاحية
-    _waiting_for_code = False
-    _auth_code = None
+    _background_refresh_lead = 600  # التجديد الاستباقي في الخلفية قبل انتهاء الصلاحية بـ 10 دقائق
+    _credentials = {}  # اسم القناة -> CredentialStore
+    _refresher_running = False
+    _auth_code_timeout = 300  # مهلة انتظار رمز المصادقة (5 دقائق)
+    _auth_waiters = AuthCodeWaiters()
     _admin_chat_id = None
     _admin_password = "upluad-youtube-1234"  # كلمة المرور الافتراضية
     
@@ -91,11 +97,71 @@ class SessionManager:
             SessionManager._load_admin_config()
         return password == SessionManager._admin_password
 
+    @staticmethod
+    def is_valid_channel_name(name):
+        return bool(name and _CHANNEL_NAME_PATTERN.match(name))
+
+    @staticmethod
+    def token_path(channel=DEFAULT_YOUTUBE_CHANNEL):
+        """ملف توكن القناة (القناة الافتراضية تستخدم YOUTUBE_TOKEN_PICKLE)"""
+        if channel == DEFAULT_YOUTUBE_CHANNEL:
+            return YOUTUBE_TOKEN_PICKLE
+        return os.path.join(YOUTUBE_CHANNELS_DIR, f'{channel}.pickle')
+
+    @staticmethod
+    def client_secrets_file(channel=DEFAULT_YOUTUBE_CHANNEL):
+        """ملف client_secrets الخاص بالقناة إن وجد (مشروع Google مستقل بحصة مستقلة)، وإلا الملف العام"""
+        if channel != DEFAULT_YOUTUBE_CHANNEL:
+            path = os.path.join(YOUTUBE_CHANNELS_DIR, f'{channel}.json')
+            if os.path.exists(path):
+                return path
+        return YOUTUBE_CLIENT_SECRETS_FILE
+
+    @staticmethod
+    def project_id(channel=DEFAULT_YOUTUBE_CHANNEL):
+        """
+        معرف مشروع Google الذي تتبعه القناة من ملف client_secrets (يحسب يوتيوب الحصة لكل مشروع).
+        إذا تعذرت قراءة المعرف يُستخدم اسم ملف client_secrets
+        """
+        secrets_file = SessionManager.client_secrets_file(channel)
+        try:
+            with open(secrets_file, 'r') as f:
+                secrets = json.load(f)
+            client = secrets.get('installed') or secrets.get('web') or {}
+            project = client.get('project_id') or client.get('client_id')
+            if project:
+                return project
+        except Exception as e:
+            logger.warning(f"تعذر قراءة معرف المشروع من {secrets_file}: {str(e)}")
+        return os.path.splitext(os.path.basename(secrets_file))[0]
+
+    @staticmethod
+    def list_channels():
+        """القنوات التي لها توكن محفوظ"""
+        channels = [DEFAULT_YOUTUBE_CHANNEL] if os.path.exists(YOUTUBE_TOKEN_PICKLE) else []
+        if os.path.isdir(YOUTUBE_CHANNELS_DIR):
+            for name in sorted(os.listdir(YOUTUBE_CHANNELS_DIR)):
+                channel, ext = os.path.splitext(name)
+                if ext == '.pickle' and channel != DEFAULT_YOUTUBE_CHANNEL and SessionManager.is_valid_channel_name(channel):
+                    channels.append(channel)
+        return channels
+
+    @staticmethod
+    def _credential_store(channel):
+        """مخزن بيانات اعتماد القناة (يُنشأ عند أول استخدام مع تجديده في الخلفية إن كان مفعلاً)"""
+        store = SessionManager._credentials.get(channel)
+        if store is None:
+            store = CredentialStore(SessionManager.token_path(channel))
+            SessionManager._credentials[channel] = store
+            if SessionManager._refresher_running:
+                store.start_background_refresh(SessionManager._background_refresh_lead)
+        return store
+
     @staticmethod
     async def receive_auth_code(message_text, chat_id):
         """استلام رمز المصادقة من رسالة"""
         admin_chat_id = SessionManager.get_admin_chat_id()
-        if SessionManager._waiting_for_code and admin_chat_id == chat_id:
+        if admin_chat_id == chat_id and SessionManager._auth_waiters.is_waiting(chat_id):
             # تنظيف الرمز
             code = message_text.strip()
             
@@ -146,9 +212,9 @@ class SessionManager:
             # تسجيل معلومات الرمز للتشخيص
             logger.info(f"تم استلام رمز المصادقة: {code[:10]}... (الطول: {len(code)})")
             
-            # حفظ الرمز
-            SessionManager._auth_code = code
-            SessionManager._waiting_for_code = False
+            # تسليم الرمز مباشرة لعملية المصادقة المنتظرة
+            if not SessionManager._auth_waiters.deliver(chat_id, code):
+                return False
             
             # إعلام المستخدم
             try:
@@ -164,52 +230,36 @@ class SessionManager:
         return False
 
     @staticmethod
-    async def check_youtube_auth():
+    async def get_credentials(channel=DEFAULT_YOUTUBE_CHANNEL):
         """
-        التحقق من صلاحية جلسة يوتيوب وتجديدها إذا لزم الأمر
+        بيانات اعتماد صالحة من التوكن المحفوظ (مع تجديده إذا لزم الأمر) دون أي مصادقة تفاعلية،
+        لاستخدامها في الرفع والعقد العاملة. ترفع CredentialsUnavailableError إذا لم يوجد توكن صالح
         """
-        current_time = time.time()
-        
-        # التحقق من صلاحية التوكن بشكل دوري
-        if current_time - SessionManager._last_token_check < SessionManager._token_check_interval:
-            try:
-                creds = SessionManager._load_credentials()
-                if creds and creds.valid:
-                    return creds
-            except:
-                pass
+        try:
+            creds = await SessionManager._credential_store(channel).get_valid(SessionManager._token_refresh_threshold)
+        except Exception as e:
+            raise CredentialsUnavailableError(channel, f"فشل تجديد التوكن: {str(e)}") from e
+        if not creds:
+            raise CredentialsUnavailableError(channel, "لا يوجد توكن محفوظ")
+        return creds
 
-        SessionManager._last_token_check = current_time
+    @staticmethod
+    async def check_youtube_auth(channel=DEFAULT_YOUTUBE_CHANNEL):
+        """
+        التحقق من صلاحية جلسة يوتيوب للقناة وتجديدها إذا لزم الأمر، وبدء المصادقة التفاعلية
+        (رابط للمسؤول أو عبر التيرمنال) إذا لم يوجد توكن صالح. تُستخدم من الأمر /auth فقط
+        """
         creds = None
+        # تمييز رسائل المصادقة عند استخدام عدة قنوات
+        channel_label = "" if channel == DEFAULT_YOUTUBE_CHANNEL else f" (القناة: {channel})"
         
         try:
-            # محاولة تحميل التوكن الموجود
-            creds = SessionManager._load_credentials()
-            
-            if creds:
-                # التحقق من صلاحية التوكن
-                if creds.valid:
-                    # التحقق من وقت انتهاء الصلاحية
-                    if creds.expiry and (creds.expiry.timestamp() - current_time) < SessionManager._token_refresh_threshold:
-                        logger.info("تجديد التوكن قبل انتهاء الصلاحية")
-                        try:
-                            creds.refresh(Request())
-                            SessionManager._save_credentials(creds)
-                            logger.info("تم تجديد التوكن بنجاح")
-                        except Exception as e:
-                            logger.error(f"فشل تجديد التوكن: {str(e)}")
-                            creds = None
-                    return creds
-                elif creds.expired and creds.refresh_token:
-                    logger.info("تجديد التوكن منتهي الصلاحية")
-                    try:
-                        creds.refresh(Request())
-                        SessionManager._save_credentials(creds)
-                        logger.info("تم تجديد التوكن بنجاح")
-                        return creds
-                    except Exception as e:
-                        logger.error(f"فشل تجديد التوكن: {str(e)}")
-                        creds = None
+            # بيانات الاعتماد من الذاكرة مع تجديد موحد عند اقتراب انتهاء الصلاحية
+            try:
+                creds = await SessionManager._credential_store(channel).get_valid(SessionManager._token_refresh_threshold)
+            except Exception as e:
+                logger.error(f"فشل تجديد التوكن: {str(e)}")
+                creds = None
 
             # إذا لم يكن هناك توكن صالح ومعرف المحادثة الإدارية غير محدد
             if not creds:
@@ -218,12 +268,12 @@ class SessionManager:
                 # عرض رابط المصادقة في التيرمنال كخيار احتياطي
                 if admin_chat_id is None:
                     logger.info("معرف المحادثة الإدارية غير محدد، سيتم استخدام طريقة المصادقة عبر التيرمنال")
-                    return await SessionManager._terminal_auth()
+                    return await SessionManager._terminal_auth(channel)
                     
                 # إنشاء توكن جديد عبر البوت
-                logger.info("إنشاء توكن جديد عبر البوت")
+                logger.info(f"إنشاء توكن جديد عبر البوت للقناة {channel}")
                 flow = InstalledAppFlow.from_client_secrets_file(
-                    YOUTUBE_CLIENT_SECRETS_FILE, 
+                    SessionManager.client_secrets_file(channel), 
                     SCOPES,
                     redirect_uri='urn:ietf:wg:oauth:2.0:oob'  # استخدام OOB (Out-of-Band) للمصادقة
                 )
@@ -233,74 +283,63 @@ class SessionManager:
                 auth_url = flow.authorization_url()[0]
                 await bot.send_message(
                     chat_id=admin_chat_id,
-                    text=f"🔐 يرجى النقر على الرابط التالي للمصادقة مع يوتيوب:\n{auth_url}\n\nبعد المصادقة، سيتم عرض رمز تحقق على الشاشة. يرجى نسخ هذا الرمز وإرساله هنا."
+                    text=f"🔐 يرجى النقر على الرابط التالي للمصادقة مع يوتيوب{channel_label}:\n{auth_url}\n\nبعد المصادقة، سيتم عرض رمز تحقق على الشاشة. يرجى نسخ هذا الرمز وإرساله هنا."
                 )
                 
-                # انتظار الرد من المستخدم عبر البوت
-                SessionManager._waiting_for_code = True
-                SessionManager._auth_code = None
+                # انتظار الرد من المستخدم عبر البوت دون استطلاع
+                try:
+                    code = await SessionManager._auth_waiters.wait(admin_chat_id, SessionManager._auth_code_timeout)
+                except asyncio.TimeoutError:
+                    logger.error("انتهت مهلة انتظار رمز المصادقة")
+                    await bot.send_message(
+                        chat_id=admin_chat_id,
+                        text="⚠️ انتهت مهلة انتظار رمز المصادقة. يرجى إعادة المحاولة."
+                    )
+                    raise Exception("انتهت مهلة انتظار رمز المصادقة")
                 
-                # انتظار استلام الرمز
-                timeout_seconds = 300  # 5 دقائق
-                start_time = time.time()
-                while SessionManager._waiting_for_code:
-                    if time.time() - start_time > timeout_seconds:
-                        logger.error("انتهت مهلة انتظار رمز المصادقة")
-                        await bot.send_message(
-                            chat_id=admin_chat_id,
-                            text="⚠️ انتهت مهلة انتظار رمز المصادقة. يرجى إعادة المحاولة."
-                        )
-                        raise Exception("انتهت مهلة انتظار رمز المصادقة")
+                try:
+                    # تنظيف الرمز مرة أخرى للتأكد
+                    clean_code = code.strip()
+                    logger.info(f"محاولة استخدام رمز المصادقة للحصول على التوكن (طول الرمز: {len(clean_code)})")
                     
-                    # انتظار قصير
-                    await asyncio.sleep(1)
-                
-                # إذا استلمنا الرمز
-                if SessionManager._auth_code:
+                    # الحصول على التوكن باستخدام الرمز (طلب HTTP حاجب يُنفذ خارج حلقة الأحداث)
+                    loop = asyncio.get_running_loop()
                     try:
-                        # تنظيف الرمز مرة أخرى للتأكد
-                        clean_code = SessionManager._auth_code.strip()
-                        logger.info(f"محاولة استخدام رمز المصادقة للحصول على التوكن (طول الرمز: {len(clean_code)})")
-                        
-                        # الحصول على التوكن باستخدام الرمز
-                        try:
-                            flow.fetch_token(code=clean_code)
-                        except Exception as e:
-                            # محاولة مع إضافة معلمة redirect_uri بشكل صريح
-                            if "redirect_uri" in str(e):
-                                logger.info("محاولة مع إضافة redirect_uri بشكل صريح")
-                                flow.fetch_token(
-                                    code=clean_code,
-                                    redirect_uri='urn:ietf:wg:oauth:2.0:oob'
-                                )
-                        
-                        creds = flow.credentials
-                        
-                        # حفظ التوكن الجديد
-                        SessionManager._save_credentials(creds)
-                        
-                        # إرسال رسالة نجاح
-                        await bot.send_message(
-                            chat_id=admin_chat_id,
-                            text="✅ تم المصادقة مع يوتيوب بنجاح!"
-                        )
+                        await loop.run_in_executor(None, lambda: flow.fetch_token(code=clean_code))
                     except Exception as e:
-                        error_msg = str(e)
-                        logger.error(f"خطأ في المصادقة: {error_msg}")
-                        
-                        # إرسال رسالة خطأ مفصلة للمستخدم
-                        detailed_error = f"❌ خطأ في المصادقة: {error_msg}"
-                        if "invalid_grant" in error_msg:
-                            detailed_error += "\n\nيبدو أن رمز المصادقة غير صالح أو منتهي الصلاحية. يرجى المحاولة مرة أخرى باستخدام /auth"
-                            # إعادة تعيين حالة انتظار الرمز للسماح بمحاولة جديدة
-                            SessionManager._waiting_for_code = False
-                            SessionManager._auth_code = None
-                        
-                        await bot.send_message(
-                            chat_id=admin_chat_id,
-                            text=detailed_error
-                        )
-                        raise
+                        # محاولة مع إضافة معلمة redirect_uri بشكل صريح
+                        if "redirect_uri" not in str(e):
+                            raise
+                        logger.info("محاولة مع إضافة redirect_uri بشكل صريح")
+                        await loop.run_in_executor(None, lambda: flow.fetch_token(
+                            code=clean_code,
+                            redirect_uri='urn:ietf:wg:oauth:2.0:oob'
+                        ))
+                    
+                    creds = flow.credentials
+                    
+                    # حفظ التوكن الجديد
+                    SessionManager._save_credentials(creds, channel)
+                    
+                    # إرسال رسالة نجاح
+                    await bot.send_message(
+                        chat_id=admin_chat_id,
+                        text=f"✅ تم المصادقة مع يوتيوب بنجاح{channel_label}!"
+                    )
+                except Exception as e:
+                    error_msg = str(e)
+                    logger.error(f"خطأ في المصادقة: {error_msg}")
+                    
+                    # إرسال رسالة خطأ مفصلة للمستخدم
+                    detailed_error = f"❌ خطأ في المصادقة: {error_msg}"
+                    if "invalid_grant" in error_msg:
+                        detailed_error += "\n\nيبدو أن رمز المصادقة غير صالح أو منتهي الصلاحية. يرجى المحاولة مرة أخرى باستخدام /auth"
+                    
+                    await bot.send_message(
+                        chat_id=admin_chat_id,
+                        text=detailed_error
+                    )
+                    raise
             
             return creds
             
@@ -312,18 +351,28 @@ class SessionManager:
                     bot = Bot(token=TELEGRAM_BOT_TOKEN)
                     await bot.send_message(
                         chat_id=admin_chat_id,
-                        text=f"❌ خطأ في المصادقة مع يوتيوب: {str(e)}"
+                        text=f"❌ خطأ في المصادقة مع يوتيوب{channel_label}: {str(e)}"
                     )
                 except:
                     pass
             raise
 
     @staticmethod
-    async def _terminal_auth():
+    def is_waiting_for_code(chat_id=None):
+        """هل توجد عملية مصادقة تنتظر رمزاً من المحادثة"""
+        return SessionManager._auth_waiters.is_waiting(chat_id)
+
+    @staticmethod
+    def cancel_auth(chat_id):
+        """إلغاء عمليات المصادقة المنتظرة لرمز من المحادثة"""
+        return SessionManager._auth_waiters.cancel(chat_id)
+
+    @staticmethod
+    async def _terminal_auth(channel=DEFAULT_YOUTUBE_CHANNEL):
         """المصادقة عبر التيرمنال كخيار احتياطي"""
-        logger.info("إنشاء توكن جديد عبر التيرمنال")
+        logger.info(f"إنشاء توكن جديد عبر التيرمنال للقناة {channel}")
         flow = InstalledAppFlow.from_client_secrets_file(
-            YOUTUBE_CLIENT_SECRETS_FILE, 
+            SessionManager.client_secrets_file(channel), 
             SCOPES,
             redirect_uri='urn:ietf:wg:oauth:2.0:oob'  # استخدام OOB (Out-of-Band) للمصادقة
         )
@@ -331,7 +380,7 @@ class SessionManager:
         # عرض رابط المصادقة للمستخدم
         auth_url = flow.authorization_url()[0]
         print("\n" + "=" * 60)
-        print("🔐 يرجى النقر على الرابط التالي للمصادقة مع يوتيوب:")
+        print(f"🔐 يرجى النقر على الرابط التالي للمصادقة مع يوتيوب (القناة: {channel}):")
         print(auth_url)
         print("بعد المصادقة، سيتم عرض رمز تحقق على الشاشة. يرجى نسخ هذا الرمز وإدخاله هنا.")
         print("=" * 60 + "\n")
@@ -354,7 +403,7 @@ class SessionManager:
         creds = flow.credentials
         
         # حفظ التوكن الجديد
-        SessionManager._save_credentials(creds)
+        SessionManager._save_credentials(creds, channel)
         
         # طباعة رسالة نجاح
         print("✅ تم المصادقة مع يوتيوب بنجاح!")
@@ -362,20 +411,37 @@ class SessionManager:
         return creds
 
     @staticmethod
-    def _load_credentials():
-        """تحميل بيانات الاعتماد من الملف"""
-        if os.path.exists(YOUTUBE_TOKEN_PICKLE):
-            with open(YOUTUBE_TOKEN_PICKLE, 'rb') as token:
-                return pickle.load(token)
-        return None
+    def _load_credentials(channel=DEFAULT_YOUTUBE_CHANNEL):
+        """بيانات الاعتماد من الذاكرة (يُعاد قراءة الملف فقط إذا تغير)"""
+        return SessionManager._credential_store(channel).load()
 
     @staticmethod
-    def _save_credentials(creds):
+    def _save_credentials(creds, channel=DEFAULT_YOUTUBE_CHANNEL):
         """حفظ بيانات الاعتماد في الملف"""
-        os.makedirs(os.path.dirname(YOUTUBE_TOKEN_PICKLE), exist_ok=True)
-        with open(YOUTUBE_TOKEN_PICKLE, 'wb') as token:
-            pickle.dump(creds, token)
-            logger.info(f"تم حفظ بيانات الاعتماد في {YOUTUBE_TOKEN_PICKLE}")
+        SessionManager._credential_store(channel).save(creds)
+
+    @staticmethod
+    async def refresh_credentials(channel=DEFAULT_YOUTUBE_CHANNEL):
+        """تجديد التوكن الحالي خارج حلقة الأحداث (عملية تجديد واحدة للمستدعين المتزامنين)"""
+        try:
+            return await SessionManager._credential_store(channel).refresh()
+        except Exception as e:
+            raise CredentialsUnavailableError(channel, f"فشل تجديد التوكن: {str(e)}") from e
+
+    @staticmethod
+    def start_token_refresher():
+        """تشغيل التجديد الاستباقي لتوكنات جميع القنوات في الخلفية (مهمة مستقلة لكل قناة)"""
+        SessionManager._refresher_running = True
+        for channel in SessionManager.list_channels():
+            SessionManager._credential_store(channel)
+        for store in SessionManager._credentials.values():
+            store.start_background_refresh(SessionManager._background_refresh_lead)
+
+    @staticmethod
+    async def stop_token_refresher():
+        SessionManager._refresher_running = False
+        for store in list(SessionManager._credentials.values()):
+            await store.stop_background_refresh()
 
     @staticmethod
     def check_telegram_session():
@@ -15,8 +15,10 @@ if not logger.handlers:
     logger.addHandler(handler)
 
 class BotRestartHandler(FileSystemEventHandler):
-    def __init__(self, bot_process):
+    def __init__(self, bot_process, lock_file=None):
         self.bot_process = bot_process
+        # ملف قفل المشغل حسب الدور واسم العقدة (None إذا لم يأخذ قفلاً)
+        self.lock_file = lock_file
         self.last_restart = 0
         self.restart_cooldown = 1  # ثانية واحدة كحد أدنى بين عمليات إعادة التشغيل
         self.watched_extensions = ('.py', '.json', '.env')  # امتدادات الملفات التي سيتم مراقبتها
@@ -68,10 +70,10 @@ class BotRestartHandler(FileSystemEventHandler):
                                 return  # الخروج إذا لم نتمكن من إيقاف العملية
 
             # التأكد من إزالة ملف القفل
-            lock_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bot.lock')
+            lock_file = self.lock_file
             max_attempts = 5  # زيادة عدد المحاولات
             attempt = 0
-            while os.path.exists(lock_file) and attempt < max_attempts:
+            while lock_file and os.path.exists(lock_file) and attempt < max_attempts:
                 try:
                     # محاولة إغلاق أي مقابض ملفات مفتوحة (Windows فقط)
                     if os.name == 'nt':
@@ -88,17 +90,17 @@ class BotRestartHandler(FileSystemEventHandler):
                     logger.warning(f"محاولة {attempt} لإزالة ملف القفل فشلت: {e}")
                     time.sleep(3)  # زيادة وقت الانتظار بين المحاولات
             
-            if os.path.exists(lock_file):
+            if lock_file and os.path.exists(lock_file):
                 logger.error("فشلت جميع محاولات إزالة ملف القفل")
                 return  # الخروج إذا لم نتمكن من إزالة ملف القفل
 
             # إضافة تأخير قبل إعادة التشغيل
             time.sleep(3)  # انتظار 3 ثواني للتأكد من تحرير جميع الموارد
             
-            # إعادة تشغيل البوت
+            # إعادة تشغيل البوت بنفس الدور واسم العقدة
             logger.info("جاري إعادة تشغيل البوت...")
             try:
-                self.bot_process = subprocess.Popen([sys.executable, 'run_bot.py'])
+                self.bot_process = subprocess.Popen([sys.executable, 'run_bot.py', *sys.argv[1:]])
                 logger.info("✅ تم إعادة تشغيل البوت بنجاح")
                 logger.info("تم تفعيل نظام مراقبة الملفات")
             except Exception as e:
@@ -109,15 +111,15 @@ class BotRestartHandler(FileSystemEventHandler):
             # محاولة إعادة تشغيل البوت مرة أخرى بعد 5 ثواني
             time.sleep(5)
             try:
-                self.bot_process = subprocess.Popen([sys.executable, 'run_bot.py'])
+                self.bot_process = subprocess.Popen([sys.executable, 'run_bot.py', *sys.argv[1:]])
                 logger.info("✅ تم إعادة تشغيل البوت بنجاح بعد المحاولة الثانية")
                 logger.info("تم تفعيل نظام مراقبة الملفات بعد المحاولة الثانية")
             except Exception as e:
                 logger.critical(f"فشل في إعادة تشغيل البوت بعد المحاولة الثانية: {str(e)}")
 
 
-def start_watcher(bot_process):
-    event_handler = BotRestartHandler(bot_process)
+def start_watcher(bot_process, lock_file=None):
+    event_handler = BotRestartHandler(bot_process, lock_file)
     observer = Observer()
 
     # إضافة المجلدات للمراقبة